@@ -5,33 +5,145 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import atexit
+
+import click
+
 from flask import Flask
+import database
+import metrics
 from database import init_database, add_sample_data
 from routes import register_blueprints
 
 
-def create_app():
+def create_app(config=None):
     """
     Application factory function to create and configure Flask app.
-    
+
+    Args:
+        config: Optional mapping of settings overriding the defaults below
+
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
-    
+    app.config.update(
+        DATABASE=database.DATABASE,
+        DB_POOL_SIZE=database.POOL_SIZE,
+        DB_POOL_TIMEOUT=database.POOL_TIMEOUT,
+        DB_HEALTH_CHECK_INTERVAL=database.HEALTH_CHECK_INTERVAL,
+        DB_CACHE_SIZE_KB=database.CACHE_SIZE_KB,
+        DB_BUSY_TIMEOUT=database.BUSY_TIMEOUT,
+        # Apply pending migrations on startup (a single query when there are
+        # none); gunicorn runs this once before forking workers
+        INIT_DATABASE=True,
+        # Seed the demo books into an empty catalog (the dev server does)
+        SAMPLE_DATA=False,
+        BOOK_CACHE_SIZE=database.BOOK_CACHE_SIZE,
+        BOOK_CACHE_TTL=database.BOOK_CACHE_TTL,
+        # Optional shared cache backend (e.g. cache.RedisBackend) for multi-worker deployments
+        BOOK_CACHE_BACKEND=None,
+        # Serve catalog pages and short-term searches from an in-memory copy
+        # of the books table (about 160 bytes per book)
+        CATALOG_SNAPSHOT=True,
+        # Search result pages kept until the catalog next changes: at most
+        # this many pages and bytes of books; a size of 0 disables the cache
+        SEARCH_CACHE_SIZE=database.SEARCH_CACHE_SIZE,
+        SEARCH_CACHE_BYTES=database.SEARCH_CACHE_BYTES,
+        SEARCH_CACHE_TTL=database.SEARCH_CACHE_TTL,
+        # Background job workers run in this process; 0 leaves the queue to
+        # a separate `python -m services.job_queue` process
+        JOB_WORKERS=0,
+        # Function, SQL and request timers served at /metrics; off by default
+        METRICS_ENABLED=False,
+        # SQL statements slower than this are logged by library.metrics
+        SLOW_QUERY_MS=metrics.SLOW_QUERY_SECONDS * 1000,
+    )
+    if config:
+        app.config.update(config)
+
+    # Set up the connection pool shared by all database helpers
+    pool = database.configure_pool(
+        app.config['DATABASE'],
+        max_size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        health_check_interval=app.config['DB_HEALTH_CHECK_INTERVAL'],
+        cache_size_kb=app.config['DB_CACHE_SIZE_KB'],
+        busy_timeout=app.config['DB_BUSY_TIMEOUT'],
+    )
+    app.extensions['db_pool'] = pool
+    app.extensions['book_cache'] = database.configure_book_cache(
+        app.config['BOOK_CACHE_SIZE'],
+        app.config['BOOK_CACHE_TTL'],
+        backend=app.config['BOOK_CACHE_BACKEND'],
+    )
+    app.extensions['catalog_snapshot'] = database.configure_catalog_snapshot(app.config['CATALOG_SNAPSHOT'])
+    app.extensions['search_cache'] = database.configure_search_cache(
+        app.config['SEARCH_CACHE_SIZE'],
+        app.config['SEARCH_CACHE_TTL'],
+        max_bytes=app.config['SEARCH_CACHE_BYTES'],
+    )
+
+    if app.config['METRICS_ENABLED']:
+        metrics.enable(slow_query_seconds=app.config['SLOW_QUERY_MS'] / 1000)
+    else:
+        metrics.disable()
+    metrics.init_app(app)
+
+    # Hand back any connection a request left checked out
+    @app.teardown_appcontext
+    def release_db_connection(exception=None):
+        pool.release_thread_connection()
+
     # Initialize the database
-    init_database()
-    
+    if app.config['INIT_DATABASE']:
+        init_database()
+
     # Add sample data for testing and demonstration
-    add_sample_data()
-    
+    if app.config['SAMPLE_DATA']:
+        add_sample_data()
+
     # Register all route blueprints
     register_blueprints(app)
-    
+
+    register_commands(app)
+
+    if app.config['JOB_WORKERS']:
+        from services.job_queue import JobWorkerPool
+        workers = JobWorkerPool(workers=app.config['JOB_WORKERS'])
+        workers.start()
+        atexit.register(workers.stop, 5.0)
+        app.extensions['job_workers'] = workers
+
     return app
 
 
+def register_commands(app):
+    """
+    Add flask init-db, import-books <file>, export <table> and patron-stats
+    check|rebuild. Their modules are imported here, like the blueprints, so
+    importing app stays cheap.
+    """
+    from services.catalog_import import import_books_command
+    from services.export import export_command
+    from services.patron_stats import patron_stats_command
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(import_books_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(patron_stats_command)
+
+@click.command('init-db')
+@click.option('--sample-data', is_flag=True, help='Also add the sample books if the catalog is empty.')
+def init_db_command(sample_data):
+    """Apply pending schema migrations, e.g. before starting workers with INIT_DATABASE off."""
+    init_database()
+    if sample_data:
+        add_sample_data()
+    click.echo('Database is up to date.')
+
+
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app({'JOB_WORKERS': 2, 'SAMPLE_DATA': True})
     app.run(debug=True, host='0.0.0.0', port=5000)
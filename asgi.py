@@ -0,0 +1,14 @@
+"""
+ASGI entry point for production servers.
+
+    uvicorn asgi:app
+
+/api/late_fee and /api/search run on the event loop (routes/async_api.py);
+every other route is served by the same Flask app as wsgi.py, configured
+from the same LIBRARY_* environment variables.
+"""
+
+from routes.async_api import AsyncAPI
+from wsgi import app as flask_app
+
+app = AsyncAPI(flask_app)
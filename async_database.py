@@ -0,0 +1,71 @@
+"""
+Async Database Module - asyncio access to the database helpers
+Mirrors the database.py helpers as coroutines. SQLite calls are blocking, so
+each one runs on a small thread pool sized to the connection pool; an event
+loop can then keep thousands of requests waiting on the database while only
+POOL_SIZE threads actually use it. The iter_* streaming helpers are not
+mirrored: they keep a connection checked out between rows, and pooled
+connections belong to the thread that checked them out.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import database
+
+_executor = ThreadPoolExecutor(max_workers=database.POOL_SIZE, thread_name_prefix='db')
+
+def configure_executor(max_workers: int = database.POOL_SIZE) -> ThreadPoolExecutor:
+    """Replace the database thread pool; match max_workers to the connection pool size."""
+    global _executor
+    previous, _executor = _executor, ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+    previous.shutdown(wait=False)
+    return _executor
+
+async def run_in_db_thread(func: Callable, *args, **kwargs):
+    """
+    Run a blocking database or library_service function on the database thread pool.
+    Anything calling database.py helpers can be awaited this way.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def _offload(name: str) -> Callable:
+    # Look the helper up on each call so patches of database.<name> apply
+    sync = getattr(database, name)
+
+    @functools.wraps(sync)
+    async def helper(*args, **kwargs):
+        return await run_in_db_thread(getattr(database, name), *args, **kwargs)
+    return helper
+
+# Catalog reads
+get_all_books = _offload('get_all_books')
+get_books_page = _offload('get_books_page')
+get_book_count = _offload('get_book_count')
+search_books = _offload('search_books')
+fuzzy_search_books = _offload('fuzzy_search_books')
+get_book_by_id = _offload('get_book_by_id')
+get_book_by_isbn = _offload('get_book_by_isbn')
+get_books_by_ids = _offload('get_books_by_ids')
+get_books_by_isbns = _offload('get_books_by_isbns')
+search_books_by_isbn_prefix = _offload('search_books_by_isbn_prefix')
+
+# Patron reads
+get_patron_borrowed_books = _offload('get_patron_borrowed_books')
+get_patron_loan_summaries = _offload('get_patron_loan_summaries')
+get_patron_borrow_count = _offload('get_patron_borrow_count')
+get_patron_stats = _offload('get_patron_stats')
+
+# Writes
+insert_book = _offload('insert_book')
+insert_books = _offload('insert_books')
+insert_borrow_record = _offload('insert_borrow_record')
+update_book_availability = _offload('update_book_availability')
+update_borrow_record_return_date = _offload('update_borrow_record_return_date')
+
+# Jobs
+enqueue_job = _offload('enqueue_job')
+get_job = _offload('get_job')
@@ -0,0 +1,145 @@
+"""
+Benchmark - in-flight API calls on one process, async vs threaded
+
+Sends bursts of /api/late_fee and /api/search requests to the ASGI app
+(routes/async_api.py) with thousands of requests in flight at once on one
+event loop, and to the Flask app from a thread pool, where each in-flight
+request holds a thread. Reports requests per second, p50/p99 latency, the
+peak number of requests in flight and the threads used.
+
+Usage:
+    python -m benchmarks.async_api --books 10000 --in-flight 100 1000 5000 --sync-threads 8 64
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import database
+from app import create_app
+from benchmarks.suite import generate, percentile
+from routes.async_api import AsyncAPI
+
+
+def paths(books: int, patrons: int, requests: int, rng: random.Random) -> List[str]:
+    return [f'/api/late_fee/{100000 + rng.randrange(patrons):06d}/{rng.randint(1, books)}' if n % 2 else
+            f'/api/search?q={rng.choice(("river", "glass", "iron", "paper"))}&type=title&limit=20'
+            for n in range(requests)]
+
+
+def summarise(mode: str, latencies: List[float], elapsed: float, peak: int, threads: int, errors: int) -> dict:
+    latencies.sort()
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'peak_in_flight': peak,
+        'threads': threads,
+        'errors': errors,
+    }
+
+
+def run_async(app: AsyncAPI, urls: List[str], in_flight: int) -> dict:
+    latencies, state = [], {'now': 0, 'peak': 0, 'errors': 0}
+
+    async def one(url: str, gate: asyncio.Semaphore):
+        async with gate:
+            path, _, query = url.partition('?')
+            scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+                     'headers': [], 'root_path': '', 'scheme': 'http', 'server': ('bench', 80)}
+            status = {}
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status['code'] = message['status']
+
+            state['now'] += 1
+            state['peak'] = max(state['peak'], state['now'])
+            start = time.perf_counter()
+            await app(scope, receive, send)
+            latencies.append(time.perf_counter() - start)
+            state['now'] -= 1
+            state['errors'] += status.get('code', 500) >= 400
+
+    async def burst():
+        gate = asyncio.Semaphore(in_flight)
+        await asyncio.gather(*(one(url, gate) for url in urls))
+
+    start = time.perf_counter()
+    asyncio.run(burst())
+    elapsed = time.perf_counter() - start
+    return summarise(f'async, {in_flight} in flight', latencies, elapsed, state['peak'],
+                     database.POOL_SIZE, state['errors'])
+
+
+def run_threaded(flask_app, urls: List[str], threads: int) -> dict:
+    client = flask_app.test_client()
+    latencies, lock, state = [], threading.Lock(), {'now': 0, 'peak': 0, 'errors': 0}
+
+    def one(url: str):
+        with lock:
+            state['now'] += 1
+            state['peak'] = max(state['peak'], state['now'])
+        start = time.perf_counter()
+        try:
+            response = client.get(url)
+            response.get_data()
+            failed = response.status_code >= 400
+        except Exception:
+            # e.g. more threads than pooled connections, waiting past DB_POOL_TIMEOUT
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            state['now'] -= 1
+            state['errors'] += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(one, urls))
+    elapsed = time.perf_counter() - start
+    return summarise(f'threaded, {threads} threads', latencies, elapsed, state['peak'], threads, state['errors'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--sync-threads', type=int, nargs='+', default=[8, 64])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        database.configure_pool(path)
+        dataset = generate(args.books, rng)
+        flask_app = create_app({'DATABASE': path, 'SAMPLE_DATA': False})
+        # Failed requests are counted, not logged
+        flask_app.logger.disabled = True
+        urls = paths(args.books, dataset['patrons'], args.requests, rng)
+
+        results = [run_async(AsyncAPI(flask_app), urls, n) for n in args.in_flight]
+        results += [run_threaded(flask_app, urls, n) for n in args.sync_threads]
+        database.close_pool()
+
+    for result in results:
+        print(f"{result['mode']:<26} {result['ops_per_sec']:>8,.1f} req/s   p50 {result['p50_ms']:>8.2f} ms   "
+              f"p99 {result['p99_ms']:>8.2f} ms   peak in flight {result['peak_in_flight']:>5}   "
+              f"threads {result['threads']:>3}" + (f"   {result['errors']} errors" if result['errors'] else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark - kiosk checkout of a stack of books
+
+Times checking out (and returning) N books as one borrow_books_by_patron /
+return_books_by_patron call against N single borrow_book_by_patron /
+return_book_by_patron calls, and reports the median latency of each.
+
+Usage:
+    python -m benchmarks.bulk_checkout --books 10 --repeat 200
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import database
+from services.library_service import (
+    borrow_book_by_patron, borrow_books_by_patron, return_book_by_patron, return_books_by_patron
+)
+
+
+def setup_database(path: str, books: int):
+    database.configure_pool(path)
+    database.init_database()
+    database.insert_books([(f'Book {n}', f'Author {n}', f'{9780000000000 + n}', 1_000_000, 1_000_000)
+                           for n in range(1, books + 1)])
+
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000
+
+
+def run(books: int, repeat: int) -> dict:
+    book_ids = list(range(1, books + 1))
+    timings = {'bulk_borrow': [], 'bulk_return': [], 'single_borrow': [], 'single_return': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_database(os.path.join(tmp, 'bench.db'), books)
+        for n in range(repeat):
+            # A fresh patron per round; the loan limit does not apply to a patron's
+            # first checkout of up to 6 books, so larger stacks partly fail in both modes
+            patron_id = f'{100000 + n}'
+            start = time.perf_counter()
+            borrow_books_by_patron(patron_id, book_ids)
+            timings['bulk_borrow'].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            return_books_by_patron(patron_id, book_ids)
+            timings['bulk_return'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for book_id in book_ids:
+                borrow_book_by_patron(patron_id, book_id)
+            timings['single_borrow'].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for book_id in book_ids:
+                return_book_by_patron(patron_id, book_id)
+            timings['single_return'].append(time.perf_counter() - start)
+        database.configure_pool()
+
+    return {name: median_ms(samples) for name, samples in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    result = run(args.books, args.repeat)
+    print(f"{args.books}-book checkout: bulk {result['bulk_borrow']:.2f} ms, "
+          f"{args.books} single calls {result['single_borrow']:.2f} ms")
+    print(f"{args.books}-book return:   bulk {result['bulk_return']:.2f} ms, "
+          f"{args.books} single calls {result['single_return']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
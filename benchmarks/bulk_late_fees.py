@@ -0,0 +1,90 @@
+"""
+Benchmark - nightly late fee assessment
+
+Fills a scratch database with synthetic open loans, prices all of them with
+assess_late_fees, and compares against calling calculate_late_fee_for_book
+once per loan on a sample (extrapolated to the full set).
+
+Usage:
+    python -m benchmarks.bulk_late_fees --loans 10000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import database
+from services.library_service import assess_late_fees, calculate_late_fee_for_book
+
+
+def generate_loans(count: int, patrons: int, seed: int = 327):
+    rng = random.Random(seed)
+    now = datetime.now()
+    for n in range(count):
+        due = now - timedelta(days=rng.randint(-14, 40), seconds=rng.randint(0, 86399))
+        yield (f'{100000 + n % patrons}', n % 1000 + 1, database.to_epoch(due - timedelta(days=14)), database.to_epoch(due))
+
+
+def setup_database(path: str, loans: int, patrons: int):
+    database.configure_pool(path)
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        [(f'Book {i}', f'Author {i}', f'{i:013d}', 10 ** 6, 10 ** 6) for i in range(1, 1001)]
+    )
+    conn.executemany(
+        'INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)',
+        generate_loans(loans, patrons)
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(loans: int, patrons: int, sample: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        setup_database(os.path.join(tmp, 'bench.db'), loans, patrons)
+        setup_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        totals = assess_late_fees()
+        bulk_seconds = time.perf_counter() - start
+
+        # The per-loan path re-reads the patron's loans on every call
+        conn = database.get_db_connection()
+        pairs = conn.execute(
+            'SELECT patron_id, book_id FROM borrow_records WHERE return_date IS NULL LIMIT ?', (sample,)
+        ).fetchall()
+        conn.close()
+        start = time.perf_counter()
+        for pair in pairs:
+            calculate_late_fee_for_book(pair['patron_id'], pair['book_id'])
+        scalar_seconds = (time.perf_counter() - start) / max(len(pairs), 1) * loans
+        database.close_pool()
+
+    return {
+        'loans': loans,
+        'patrons': patrons,
+        'patrons_owing': len(totals),
+        'setup_seconds': round(setup_seconds, 1),
+        'bulk_seconds': round(bulk_seconds, 2),
+        'bulk_loans_per_sec': round(loans / bulk_seconds),
+        'scalar_seconds_estimated': round(scalar_seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--loans', type=int, default=10_000_000)
+    parser.add_argument('--patrons', type=int, default=500_000)
+    parser.add_argument('--sample', type=int, default=2000)
+    args = parser.parse_args()
+    print(run(args.loans, args.patrons, args.sample))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark - bulk catalog import throughput
+
+Writes a synthetic CSV catalog, imports it with services.catalog_import into
+a scratch database and reports rows per second. For comparison, a sample of
+the same rows is also added one at a time through add_book_to_catalog.
+
+Usage:
+    python -m benchmarks.catalog_import --rows 500000 --batch-size 5000
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import database
+from services.catalog_import import import_books, open_records
+from services.library_service import add_book_to_catalog
+
+
+def write_catalog(path: str, rows: int):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['title', 'author', 'isbn', 'total_copies'])
+        for n in range(rows):
+            writer.writerow([f'Title {n} of the collection', f'Author {n % 5000}', f'{9780000000000 + n}', 1 + n % 4])
+
+
+def run(rows: int, batch_size: int, single_rows: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'catalog.csv')
+        write_catalog(source, rows)
+
+        database.configure_pool(os.path.join(tmp, 'bulk.db'))
+        database.init_database()
+        start = time.perf_counter()
+        f, records = open_records(source)
+        with f:
+            report = import_books(records, batch_size=batch_size)
+        bulk_seconds = time.perf_counter() - start
+
+        database.configure_pool(os.path.join(tmp, 'single.db'))
+        database.init_database()
+        start = time.perf_counter()
+        for n in range(single_rows):
+            add_book_to_catalog(f'Title {n}', 'Author', f'{9780000000000 + n}', 1)
+        single_seconds = time.perf_counter() - start
+        database.configure_pool()
+
+    return {
+        'rows': rows,
+        'inserted': report.inserted,
+        'bulk_rows_per_sec': rows / bulk_seconds,
+        'single_rows_per_sec': single_rows / single_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--single-rows', type=int, default=2000, help='rows added one at a time for comparison')
+    args = parser.parse_args()
+
+    result = run(args.rows, args.batch_size, args.single_rows)
+    print(f"bulk import:         {result['inserted']} rows, {result['bulk_rows_per_sec']:,.0f} rows/s")
+    print(f"add_book_to_catalog: {result['single_rows_per_sec']:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark - memory and build time of the in-memory catalog snapshot
+
+Generates a synthetic catalog, then compares holding every book as the list
+of dict rows get_all_books returns against the columnar CatalogSnapshot:
+Python memory per book (tracemalloc) and time to load. Also reports the cost
+of an incremental refresh after a handful of borrows, and catalog page and
+short-term search latency from SQL and from the snapshot.
+
+Usage:
+    python -m benchmarks.catalog_snapshot --books 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import database
+from benchmarks.suite import generate
+
+
+def measure_load(load) -> dict:
+    """Seconds to run load(), and the Python memory held by its result (from a second, traced run)."""
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        result = load()
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return {'seconds': elapsed, 'bytes': held}
+
+
+def per_call_ms(op, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        op()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def build_snapshot():
+    snapshot = database.configure_catalog_snapshot()
+    conn = database.get_db_connection()
+    try:
+        snapshot.refresh(conn)
+    finally:
+        conn.close()
+    return snapshot
+
+
+def reads(snapshot_enabled: bool, cursor: str, repeat: int) -> dict:
+    database.configure_catalog_snapshot(snapshot_enabled)
+    # Warm up: builds the snapshot and its search text
+    database.search_books('zq', 'title', 20)
+    return {
+        'first_page_ms': per_call_ms(lambda: database.get_books_page(None, 50), repeat),
+        'next_page_ms': per_call_ms(lambda: database.get_books_page(cursor, 50), repeat),
+        'short_search_ms': per_call_ms(lambda: database.search_books('zq', 'title', 20), max(repeat // 50, 3)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_pool(os.path.join(tmp, 'bench.db'))
+        generate(args.books, random.Random(args.seed))
+
+        rows = measure_load(database.get_all_books)
+        columns = measure_load(build_snapshot)
+
+        snapshot = database.get_catalog_snapshot()
+        for book_id in range(1, 11):
+            database.update_book_availability(book_id, -1)
+        start = time.perf_counter()
+        database.get_books_page(None, 1)
+        refresh_ms = (time.perf_counter() - start) * 1000
+
+        cursor = database.get_books_page(None, 50)[1]
+        sql = reads(False, cursor, args.repeat)
+        in_memory = reads(True, cursor, args.repeat)
+        database.close_pool()
+
+    print(f"{args.books:,} books")
+    print(f"  dict rows   {rows['bytes'] / args.books:>7.0f} B/book   load {rows['seconds']:>6.2f} s")
+    print(f"  snapshot    {columns['bytes'] / args.books:>7.0f} B/book   build {columns['seconds']:>5.2f} s   "
+          f"({snapshot.builds} build, refresh after 10 borrows {refresh_ms:.2f} ms)")
+    for name, label in (('first_page_ms', 'first page'), ('next_page_ms', 'next page'),
+                        ('short_search_ms', 'search "zq"')):
+        print(f"  {label:<12} SQL {sql[name]:>8.3f} ms   snapshot {in_memory[name]:>8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
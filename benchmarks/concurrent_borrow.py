@@ -0,0 +1,89 @@
+"""
+Benchmark - concurrent checkout throughput
+
+Runs borrow_book_by_patron from several threads against a scratch database
+and reports borrows per second, plus how many loans were created for a
+single-copy book that every thread races for (anything above 1 is an
+oversell).
+
+Usage:
+    python -m benchmarks.concurrent_borrow --threads 8 --borrows 2000
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import database
+from services.library_service import borrow_book_by_patron
+
+
+def setup_database(path: str, books: int):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        [(f'Book {i}', f'Author {i}', f'{i:013d}', 1_000_000, 1_000_000) for i in range(1, books + 1)]
+    )
+    conn.execute(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ('Last Copy', 'Race Author', '9999999999999', 1, 1)
+    )
+    conn.commit()
+    conn.close()
+    return books + 1
+
+
+def run(threads: int, borrows: int, books: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        last_copy_id = setup_database(os.path.join(tmp, 'bench.db'), books)
+        per_thread = borrows // threads
+        barrier = threading.Barrier(threads)
+
+        def desk(index: int):
+            barrier.wait()
+            borrow_book_by_patron(f'{900000 + index}', last_copy_id)
+            for n in range(per_thread):
+                # A fresh patron per borrow keeps every call under the loan limit
+                patron_id = f'{(index * per_thread + n) % 900000 + 100000:06d}'
+                borrow_book_by_patron(patron_id, n % books + 1)
+
+        workers = [threading.Thread(target=desk, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        conn = database.get_db_connection()
+        last_copy_loans = conn.execute(
+            'SELECT COUNT(*) FROM borrow_records WHERE book_id = ?', (last_copy_id,)
+        ).fetchone()[0]
+        conn.close()
+        if hasattr(database, 'close_pool'):
+            database.close_pool()
+
+    return {
+        'threads': threads,
+        'borrows': per_thread * threads + threads,
+        'seconds': round(elapsed, 3),
+        'borrows_per_sec': round((per_thread * threads + threads) / elapsed, 1),
+        'last_copy_loans': last_copy_loans,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--borrows', type=int, default=2000)
+    parser.add_argument('--books', type=int, default=100)
+    args = parser.parse_args()
+    print(run(args.threads, args.borrows, args.books))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark - throughput and peak memory of table exports
+
+Generates a synthetic catalog and loan history, then streams the
+borrow_records table in every export format, plain and gzip-compressed,
+reporting rows per second, output size and (in a separate traced run) the
+peak Python memory, which should not grow with the table. Also times an
+incremental export of the last week's loans.
+
+Usage:
+    python -m benchmarks.export --books 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import database
+from benchmarks.suite import generate
+from services.export import FORMATS, export_chunks, gzip_chunks
+
+
+def consume(table: str, fmt: str, compress: bool, since=None) -> int:
+    chunks = export_chunks(table, fmt, since)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    return sum(len(chunk) for chunk in chunks)
+
+
+def measure(table: str, fmt: str, compress: bool, since=None) -> dict:
+    # Timed untraced: tracemalloc slows allocation-heavy code several times over
+    start = time.perf_counter()
+    size = consume(table, fmt, compress, since)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        consume(table, fmt, compress, since)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': elapsed, 'bytes': size, 'peak_kib': peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_pool(os.path.join(tmp, 'bench.db'))
+        loans = generate(args.books, random.Random(args.seed))['loans']
+
+        print(f"borrow_records: {loans:,} rows")
+        for fmt in FORMATS:
+            for compress in (False, True):
+                result = measure('borrow_records', fmt, compress)
+                label = fmt + (' + gzip' if compress else '')
+                print(f"  {label:<18} {loans / result['seconds']:>11,.0f} rows/s "
+                      f"{result['bytes'] / 2 ** 20:>9.1f} MiB   peak {result['peak_kib']:>7,.0f} KiB")
+
+        since = database.to_epoch(datetime.now() - timedelta(days=7))
+        result = measure('borrow_records', 'csv', False, since)
+        print(f"  last 7 days (csv)  {result['seconds'] * 1000:>8.1f} ms "
+              f"{result['bytes'] / 2 ** 20:>9.1f} MiB   peak {result['peak_kib']:>7,.0f} KiB")
+        database.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark - typo-tolerant search latency with and without the index
+
+Generates a synthetic catalog, then times fuzzy_search_books for misspelled
+author and title queries: served from the catalog snapshot's word and
+trigram indexes, and by scoring every book (the fallback with the snapshot
+disabled). Also reports the time to build the index.
+
+Usage:
+    python -m benchmarks.fuzzy_search --books 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import database
+from benchmarks.suite import generate, percentile
+
+QUERIES = ('okafr', 'lindqvst tanka', 'glas rivr', 'Haddda', 'nakamuar', 'wintr shadw', 'xyzzy')
+
+
+def time_queries(repeat: int) -> dict:
+    timings = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            database.fuzzy_search_books(query, 20)
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        timings[query] = percentile(samples, 50) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure_pool(os.path.join(tmp, 'bench.db'))
+        generate(args.books, random.Random(args.seed))
+
+        snapshot = database.configure_catalog_snapshot()
+        database.get_books_page()
+        start = time.perf_counter()
+        database.fuzzy_search_books('warm up', 1)
+        build = time.perf_counter() - start
+        indexed = time_queries(args.repeat)
+
+        database.configure_catalog_snapshot(False)
+        scanned = time_queries(1)
+        database.close_pool()
+
+    print(f"{args.books:,} books, index built in {build:.2f} s")
+    for query in QUERIES:
+        print(f"  {query!r:<18} index {indexed[query]:>9.2f} ms   scan {scanned[query]:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Microbenchmark - per-row cost of shaping borrow_records rows
+
+Compares the old ISO-text row handling (three datetime.fromisoformat calls
+and a datetime.now() per row, overdue check in Python) with the epoch
+columns, where overdue status and days overdue come from SQL and only the
+two returned datetimes are built.
+
+Usage:
+    python -m benchmarks.loan_row_parsing --rows 100000
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from database import _borrowed_book, to_epoch
+
+
+def iso_row_to_loan(record):
+    """Row handling as it was when the dates were stored as ISO text."""
+    return {
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'author': record['author'],
+        'borrow_date': datetime.fromisoformat(record['borrow_date']),
+        'due_date': datetime.fromisoformat(record['due_date']),
+        'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+    }
+
+
+def run(rows: int, repeat: int) -> dict:
+    now = datetime.now()
+    iso_rows, epoch_rows = [], []
+    for n in range(rows):
+        borrow = now - timedelta(days=n % 30, seconds=n)
+        due = borrow + timedelta(days=14)
+        base = {'book_id': n, 'title': f'Book {n}', 'author': 'Author'}
+        iso_rows.append(dict(base, borrow_date=borrow.isoformat(), due_date=due.isoformat()))
+        epoch_rows.append(dict(base, borrow_date=to_epoch(borrow), due_date=to_epoch(due),
+                               is_overdue=int(due < now), days_overdue=max((now - due).days, 0)))
+
+    iso = min(timeit.repeat(lambda: [iso_row_to_loan(r) for r in iso_rows], number=1, repeat=repeat))
+    epoch = min(timeit.repeat(lambda: [_borrowed_book(r) for r in epoch_rows], number=1, repeat=repeat))
+    return {
+        'rows': rows,
+        'iso_text_ns_per_row': round(iso / rows * 1e9),
+        'epoch_ns_per_row': round(epoch / rows * 1e9),
+        'speedup': round(iso / epoch, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(run(args.rows, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
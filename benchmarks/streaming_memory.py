@@ -0,0 +1,88 @@
+"""
+Benchmark - peak memory of large search responses
+
+Builds catalogs of increasing size where every book matches one author
+search, then measures with tracemalloc the peak Python memory of serving
+/api/search for all of them three ways: the old buffered response (full
+list + jsonify), the streamed JSON response and NDJSON. Streamed peaks
+should stay flat as the result grows.
+
+Usage:
+    python -m benchmarks.streaming_memory --sizes 10000 100000
+"""
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+from flask import jsonify
+
+import database
+from app import create_app
+from services.library_service import search_books_in_catalog
+
+
+def build_catalog(path: str, books: int):
+    database.configure_pool(path)
+    database.init_database()
+    database.insert_books([(f'Title {n} of a rather long series name', 'Prolific Author', f'{9780000000000 + n}', 1, 1)
+                           for n in range(books)])
+
+
+def peak_kib(consume) -> float:
+    tracemalloc.start()
+    try:
+        consume()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run(books: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_catalog(path, books)
+        app = create_app({'DATABASE': path})
+        client = app.test_client()
+
+        def buffered():
+            with app.test_request_context():
+                results = search_books_in_catalog('prolific', 'author', books)
+                jsonify({'results': results, 'count': len(results)}).get_data()
+
+        def streamed(url):
+            def consume():
+                response = client.get(url, buffered=False)
+                received = sum(len(chunk) for chunk in response.response)
+                response.close()
+                return received
+            return consume
+
+        result = {
+            'books': books,
+            'buffered_kib': peak_kib(buffered),
+            'json_stream_kib': peak_kib(streamed(f'/api/search?q=prolific&type=author&limit={books}')),
+            'ndjson_kib': peak_kib(streamed('/api/search?q=prolific&type=author&format=ndjson')),
+        }
+        database.configure_pool()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    # The JSON endpoint caps limit at SEARCH_MAX_LIMIT; lift it to compare like for like
+    import routes.api_routes
+    routes.api_routes.SEARCH_MAX_LIMIT = max(args.sizes)
+
+    for books in args.sizes:
+        result = run(books)
+        print(f"{result['books']:>8} results: buffered {result['buffered_kib']:>9,.0f} KiB | "
+              f"streamed JSON {result['json_stream_kib']:>6,.0f} KiB | NDJSON {result['ndjson_kib']:>6,.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Benchmark - load-testing suite for the service layer and Flask routes
+
+Generates a synthetic catalog and loan history at the chosen scale in a
+scratch database, then reports p50/p99 latency and operations per second for:
+
+    service  search_books_in_catalog, borrow_book_by_patron and
+             get_patron_status_report called directly
+    client   /catalog, /search and /api/* through the Flask test client
+    http     the same routes over real HTTP, served by a threaded werkzeug
+             server and driven by --threads concurrent clients
+
+Results are saved as JSON (with the current commit) so runs can be compared
+between commits with --compare.
+
+Usage:
+    python -m benchmarks.suite --scale 1k
+    python -m benchmarks.suite --scale 100k --out benchmarks/results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite --scale 100k --compare benchmarks/results/<older>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import database
+from app import create_app
+from services.library_service import borrow_book_by_patron, get_patron_status_report, search_books_in_catalog
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+WORDS = ('river', 'garden', 'winter', 'shadow', 'glass', 'harbor', 'silent', 'iron', 'paper', 'golden',
+         'northern', 'hidden', 'last', 'distant', 'broken', 'secret', 'ancient', 'little', 'empty', 'burning')
+SURNAMES = ('Okafor', 'Lindqvist', 'Moreau', 'Tanaka', 'Novak', 'Haddad', 'Silva', 'Kowalski', 'Byrne',
+            'Reyes', 'Nakamura', 'Abara', 'Fischer', 'Costa', 'Ivanova', 'Walsh')
+
+# Patron ids below this are used by the generated history; benchmark borrows
+# use fresh patrons above it so every call stays under the loan limit
+HISTORY_PATRONS = 500_000
+
+
+def generate(books: int, rng: random.Random) -> Dict:
+    """Fill the configured database with `books` books and about as many loans."""
+    database.init_database()
+    database.insert_books([
+        (f'The {rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {n}',
+         f'{rng.choice(SURNAMES)} {rng.choice(SURNAMES)}', f'{9780000000000 + n}', 3, 3)
+        for n in range(1, books + 1)
+    ])
+
+    patrons = max(books // 10, 100)
+    now = datetime.now()
+    loans = []
+    for n in range(books):
+        borrowed = now - timedelta(days=rng.randint(0, 365))
+        due = borrowed + timedelta(days=14)
+        # Roughly one loan in five is still out, some of those overdue
+        returned = None if n % 5 == 0 else database.to_epoch(borrowed + timedelta(days=rng.randint(1, 20)))
+        loans.append((f'{100000 + n % patrons:06d}', rng.randint(1, books),
+                      database.to_epoch(borrowed), database.to_epoch(due), returned))
+
+    conn = database.get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', loans)
+        conn.commit()
+    finally:
+        conn.close()
+    return {'books': books, 'loans': len(loans), 'patrons': patrons}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(group: str, name: str, operation: Callable[[int], bool], requests: int, threads: int = 1) -> Dict:
+    """Call operation(n) `requests` times across `threads` threads and summarise latencies."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(offset: int):
+        nonlocal errors
+        local, failed = [], 0
+        for n in range(offset, requests, threads):
+            start = time.perf_counter()
+            try:
+                ok = operation(n)
+            except Exception:
+                ok = False
+            local.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    start = time.perf_counter()
+    if threads == 1:
+        worker(0)
+    else:
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'group': group,
+        'name': name,
+        'threads': threads,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def route_paths(rng: random.Random, books: int, patrons: int) -> Dict[str, Callable[[int], str]]:
+    """Request paths per benchmarked route, varied by request number."""
+    words = [rng.choice(WORDS) for _ in range(64)]
+    names = [rng.choice(SURNAMES) for _ in range(64)]
+    return {
+        '/catalog': lambda n: '/catalog',
+        '/search': lambda n: f'/search?q={words[n % 64]}&type=title',
+        '/api/books': lambda n: '/api/books?limit=50',
+        '/api/search': lambda n: f'/api/search?q={names[n % 64]}&type=author&limit=50',
+        '/api/late_fee': lambda n: f'/api/late_fee/{100000 + n % patrons:06d}/{n % books + 1}',
+    }
+
+
+def service_benchmarks(rng: random.Random, books: int, patrons: int, requests: int) -> List[Dict]:
+    words = [rng.choice(WORDS) for _ in range(64)]
+    return [
+        measure('service', 'search_books_in_catalog',
+                lambda n: search_books_in_catalog(words[n % 64], 'title', 50) is not None, requests),
+        measure('service', 'borrow_book_by_patron',
+                lambda n: borrow_book_by_patron(f'{HISTORY_PATRONS + n:06d}', n % books + 1)[0], requests),
+        measure('service', 'get_patron_status_report',
+                lambda n: get_patron_status_report(f'{100000 + n % patrons:06d}') is not None, requests),
+    ]
+
+
+def client_benchmarks(app, paths: Dict[str, Callable[[int], str]], requests: int) -> List[Dict]:
+    client = app.test_client()
+
+    def get(path_for):
+        def operation(n):
+            response = client.get(path_for(n))
+            response.get_data()
+            return response.status_code < 400
+        return operation
+
+    return [measure('client', route, get(path_for), requests) for route, path_for in paths.items()]
+
+
+def http_get(base: str, path_for: Callable[[int], str]) -> Callable[[int], bool]:
+    """Operation fetching base + path_for(n) over HTTP."""
+    def operation(n):
+        with urllib.request.urlopen(base + path_for(n), timeout=30) as response:
+            response.read()
+            return response.status < 400
+    return operation
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def http_benchmarks(app, paths: Dict[str, Callable[[int], str]], requests: int, threads: int) -> List[Dict]:
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    base = f'http://127.0.0.1:{server.server_port}'
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    try:
+        return [measure('http', route, http_get(base, path_for), requests, threads)
+                for route, path_for in paths.items()]
+    finally:
+        server.shutdown()
+        serving.join()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(books: int, requests: int, threads: int, seed: int, groups: List[str]) -> Dict:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        database.configure_pool(path)
+        started = time.perf_counter()
+        dataset = generate(books, rng)
+        dataset['generate_seconds'] = round(time.perf_counter() - started, 1)
+
+        app = create_app({'DATABASE': path})
+        paths = route_paths(rng, books, dataset['patrons'])
+        results = []
+        if 'service' in groups:
+            results += service_benchmarks(rng, books, dataset['patrons'], requests)
+        if 'client' in groups:
+            results += client_benchmarks(app, paths, requests)
+        if 'http' in groups:
+            results += http_benchmarks(app, paths, requests, threads)
+        database.close_pool()
+
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'seed': seed,
+        'dataset': dataset,
+        'results': results,
+    }
+
+
+def compare(report: Dict, baseline: Dict):
+    """Print the throughput and p99 change of each benchmark against a baseline report."""
+    before = {(r['group'], r['name']): r for r in baseline['results']}
+    print(f"\nChange against {baseline.get('commit') or 'baseline'}:")
+    for result in report['results']:
+        old = before.get((result['group'], result['name']))
+        if old is None:
+            continue
+        ops = (result['ops_per_sec'] / old['ops_per_sec'] - 1) * 100
+        p99 = (result['p99_ms'] / old['p99_ms'] - 1) * 100 if old['p99_ms'] else 0.0
+        print(f"  {result['group']:<8} {result['name']:<26} ops/sec {ops:+7.1f}%   p99 {p99:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--requests', type=int, default=500, help='calls per benchmark')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent HTTP clients')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--groups', nargs='+', choices=('service', 'client', 'http'),
+                        default=['service', 'client', 'http'])
+    parser.add_argument('--out', help='JSON report path (default benchmarks/results/<commit>-<scale>.json)')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    report = run(SCALES[args.scale], args.requests, args.threads, args.seed, args.groups)
+    report['scale'] = args.scale
+    dataset = report['dataset']
+    print(f"{dataset['books']:,} books, {dataset['loans']:,} loans, {dataset['patrons']:,} patrons "
+          f"(generated in {dataset['generate_seconds']}s)")
+    for result in report['results']:
+        print(f"  {result['group']:<8} {result['name']:<26} {result['ops_per_sec']:>9,.1f} ops/sec   "
+              f"p50 {result['p50_ms']:>8.2f} ms   p99 {result['p99_ms']:>8.2f} ms"
+              + (f"   {result['errors']} errors" if result['errors'] else ''))
+
+    out = args.out or os.path.join('benchmarks', 'results', f"{report['commit'] or 'run'}-{args.scale}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Saved {out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark - production server throughput by worker count
+
+Builds a synthetic catalog (see benchmarks.suite), serves it with gunicorn
+using gunicorn.conf.py at each worker count, and drives a read-heavy mix of
+/catalog, /search and /api/* requests from concurrent HTTP clients. Reports
+requests per second and p50/p99 latency for each worker count.
+
+Usage:
+    python -m benchmarks.workers --workers 1 4 8 --books 100000 --clients 32
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import database
+from benchmarks.suite import generate, http_get, measure, route_paths
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_ready(base: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            with urllib.request.urlopen(base + '/api/books?limit=1', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def run(path: str, workers: int, port: int, paths, requests: int, clients: int) -> dict:
+    env = dict(os.environ, LIBRARY_DATABASE=path, LIBRARY_WORKERS=str(workers),
+               LIBRARY_BIND=f'127.0.0.1:{port}')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_ready(base, process)
+        routes = list(paths.values())
+        # Spread consecutive requests over the routes for a mixed load
+        mixed = lambda n: routes[n % len(routes)](n // len(routes))
+        result = measure('gunicorn', f'{workers} workers', http_get(base, mixed), requests, clients)
+    finally:
+        process.terminate()
+        process.wait()
+    result['workers'] = workers
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        database.configure_pool(path)
+        dataset = generate(args.books, rng)
+        database.close_pool()
+        paths = route_paths(rng, args.books, dataset['patrons'])
+
+        for workers in args.workers:
+            result = run(path, workers, args.port, paths, args.requests, args.clients)
+            print(f"{workers:>2} workers: {result['ops_per_sec']:>8,.1f} req/s   "
+                  f"p50 {result['p50_ms']:>7.2f} ms   p99 {result['p99_ms']:>7.2f} ms"
+                  + (f"   {result['errors']} errors" if result['errors'] else ''))
+
+
+if __name__ == '__main__':
+    main()
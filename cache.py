@@ -0,0 +1,288 @@
+"""
+Cache Module - Read-through caching for hot database lookups
+Values are kept in a size-bounded, TTL-limited store in front of SQLite.
+Writers invalidate the keys they change; derived results that no single key
+covers (search pages) are cached per data version instead.
+"""
+
+import json
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Returned by stores on a miss, since None is a value worth caching ("no such book")
+MISSING = object()
+
+def approximate_size(value: Any) -> int:
+    """
+    Rough memory footprint in bytes of a value built from dicts, lists,
+    tuples and scalars. Dict keys are not counted: row dicts share them.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(map(approximate_size, value.values()))
+    elif isinstance(value, (list, tuple)):
+        size += sum(map(approximate_size, value))
+    return size
+
+class LocalCache:
+    """
+    In-process LRU store with a time-to-live per entry.
+
+    Holds at most `max_entries` values, and with `max_bytes` at most that
+    many bytes of values as measured by `sizeof`. Going over either evicts
+    the least recently used; a value larger than max_bytes on its own is
+    not stored. Entries older than `ttl` seconds read as missing.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic,
+                 max_bytes: Optional[int] = None, sizeof: Callable[[Any], int] = approximate_size):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._clock = clock
+        self._sizeof = sizeof
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at, size = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.bytes -= size
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, self._clock() + self.ttl, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self.bytes -= self._entries.popitem(last=False)[1][2]
+                self.evictions += 1
+
+    def delete(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self.bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+class InMemorySharedBackend:
+    """
+    Local stand-in for a shared key/value server such as Redis or memcached.
+
+    Keys are strings and values are stored as serialized text with an
+    expiry, the way a network cache holds them. Use it in tests and
+    single-process runs in place of RedisBackend.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= self._clock():
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._data[key] = (value, self._clock() + ttl)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """
+    Shared backend over a redis-py style client (get/set(ex=)/delete/scan_iter).
+
+    The client is passed in, so redis is only needed by deployments that use it.
+    Every key is namespaced with `prefix`.
+    """
+
+    def __init__(self, client, prefix: str = 'library:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(1, math.ceil(ttl)))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        names = list(self.client.scan_iter(match=self.prefix + '*'))
+        if names:
+            self.client.delete(*names)
+
+
+class SharedCache:
+    """
+    Store over a shared backend, so several worker processes see one cache
+    and one worker's invalidation reaches them all. Values must be JSON-serializable.
+    """
+
+    evictions = 0  # the server evicts on its own; it does not report them
+
+    def __init__(self, backend, ttl: float = 60.0):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, key: Hashable) -> Any:
+        value = self.backend.get(str(key))
+        return MISSING if value is None else json.loads(value)
+
+    def set(self, key: Hashable, value: Any):
+        self.backend.set(str(key), json.dumps(value), self.ttl)
+
+    def delete(self, *keys: Hashable):
+        self.backend.delete(*(str(key) for key in keys))
+
+    def clear(self):
+        self.backend.clear()
+
+
+class ReadThroughCache:
+    """
+    Read-through cache with hit/miss/eviction counters over a LocalCache or SharedCache store.
+
+    A value loaded while an invalidation was in progress is returned but not
+    stored, so a slow reader cannot put back data a writer just replaced.
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else LocalCache()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader() and caching its result on a miss."""
+        value = self.store.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self.store.set(key, value)
+        return value
+
+    def invalidate(self, *keys: Hashable):
+        """Drop keys whose data has changed."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(keys)
+            self.store.delete(*keys)
+
+    def clear(self):
+        """Drop every entry, for writes that cannot name the keys they change."""
+        with self._lock:
+            self._generation += 1
+            self.store.clear()
+
+    def stats(self) -> Dict:
+        """Counters for monitoring: hits, misses, hit_rate, evictions, invalidations, size and bytes."""
+        lookups = self.hits + self.misses
+        local = isinstance(self.store, LocalCache)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.store.evictions,
+            'invalidations': self.invalidations,
+            'size': len(self.store) if local else None,
+            'max_entries': getattr(self.store, 'max_entries', None),
+            'bytes': self.store.bytes if local and self.store.max_bytes is not None else None,
+            'max_bytes': getattr(self.store, 'max_bytes', None),
+        }
+
+
+class VersionedCache(ReadThroughCache):
+    """
+    Read-through cache for results derived from a whole data set, such as
+    search pages, that a writer cannot invalidate key by key.
+
+    Callers pass the data version they read along with each key. Entries
+    only hit for the version they were computed at, and the first lookup
+    at a newer version drops every entry (one invalidation). Versions must
+    be ordered; lookups at an older version bypass the cache.
+    """
+
+    def __init__(self, store=None):
+        super().__init__(store)
+        self.version = None
+
+    def get_or_load(self, version: Hashable, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the value cached for key at version, calling loader() on a miss."""
+        if version != self.version:
+            with self._lock:
+                if self.version is None or version > self.version:
+                    self._generation += 1
+                    self.store.clear()
+                    if self.version is not None:
+                        self.invalidations += 1
+                    self.version = version
+            if version != self.version:
+                # A reader that saw an older version than the cache has moved
+                # on to: answer it straight from the loader, leaving the store
+                # and the version alone
+                self.misses += 1
+                return loader()
+        return super().get_or_load((version, key), loader)
+
+    def clear(self):
+        super().clear()
+        self.version = None
+
+    def stats(self) -> Dict:
+        return dict(super().stats(), version=self.version)
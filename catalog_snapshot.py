@@ -0,0 +1,288 @@
+"""
+Catalog Snapshot Module - Read-optimized in-memory copy of the books table
+Books are held column by column: ids, copy counts and ISBNs in typed arrays,
+titles and authors as interned strings, plus the (title, id) listing order as
+an array of positions. That is a fraction of the memory of one dict per book,
+and catalog pages are answered with a binary search instead of a query.
+
+The snapshot follows the book_changes table (migration 10): every write to a
+book stamps it with the next change number, so refresh() only re-reads the
+books changed since the last call.
+"""
+
+import heapq
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+from fuzzy_search import FuzzyIndex
+
+# Re-read everything instead of patching when more than this share of the
+# catalog changed at once (e.g. after a bulk import)
+REBUILD_FRACTION = 0.25
+
+# Between entries of the search text; a term containing it cannot match
+_SEPARATOR = '\x00'
+
+_COLUMNS = 'id, title, author, isbn, total_copies, available_copies'
+
+def _packable(isbn: str) -> bool:
+    """Whether an ISBN survives a round trip through f'{int(isbn):013d}'."""
+    return len(isbn) == 13 and isbn.isascii() and isbn.isdigit()
+
+class CatalogSnapshot:
+    """
+    Columnar copy of the books table, refreshed incrementally.
+
+    Columns are indexed by position, in id order; `order` lists positions in
+    (title, id) order, matching get_books_page. All methods are thread-safe.
+    """
+
+    def __init__(self, batch_size: int = 10000):
+        self.batch_size = batch_size
+        self.builds = 0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.seq = -1
+        self.ids = array('q')
+        self.total_copies = array('i')
+        self.available_copies = array('i')
+        # 13-digit ISBNs as integers; anything else is kept in _other_isbns with -1 here
+        self.isbns = array('q')
+        self._other_isbns: Dict[int, str] = {}
+        self.titles: List[str] = []
+        self.authors: List[str] = []
+        self.order = array('i')
+        self._search_texts: Dict[str, Tuple[str, array]] = {}
+        self._fuzzy_index: Optional[FuzzyIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def clear(self):
+        """Forget every book; the next refresh() rebuilds from scratch."""
+        with self._lock:
+            self._clear()
+
+    def refresh(self, conn):
+        """Bring the snapshot up to date with the database behind `conn`."""
+        with self._lock:
+            latest = conn.execute('SELECT COALESCE(MAX(change_seq), 0) FROM book_changes').fetchone()[0]
+            if self.seq < 0:
+                self._build(conn, latest)
+            elif latest > self.seq:
+                self._apply_changes(conn, latest)
+
+    def page(self, position: Optional[Tuple[str, int]], limit: int) -> Tuple[List[Dict], bool]:
+        """Books after the (title, id) position in listing order, and whether more follow."""
+        with self._lock:
+            start = 0 if position is None else self._order_index(position[0], position[1], after=True)
+            positions = self.order[start:start + limit + 1]
+            return [self._book(p) for p in positions[:limit]], len(positions) > limit
+
+    def get(self, book_id: int) -> Optional[Dict]:
+        """A book by ID, or None."""
+        with self._lock:
+            position = self._position(book_id)
+            return None if position is None else self._book(position)
+
+    def books(self, book_ids) -> List[Dict]:
+        """The given books, in the order given, skipping unknown IDs."""
+        with self._lock:
+            positions = (self._position(book_id) for book_id in book_ids)
+            return [self._book(p) for p in positions if p is not None]
+
+    def search(self, term: str, field: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Case-insensitive substring match on title or author, in (title, id) order."""
+        needle = term.lower()
+        if _SEPARATOR in needle:
+            return []
+        with self._lock:
+            text, starts = self._search_text(field)
+            found: List[Dict] = []
+            at = text.find(needle)
+            while at >= 0 and (limit is None or len(found) < limit):
+                index = bisect_right(starts, at) - 1
+                if offset:
+                    offset -= 1
+                else:
+                    found.append(self._book(self.order[index]))
+                # At most one hit per book: carry on from the next one
+                at = text.find(needle, starts[index + 1]) if index + 1 < len(starts) else -1
+            return found
+
+    def fuzzy_search(self, term: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Typo-tolerant search on title and author words, closest first, then in (title, id) order."""
+        with self._lock:
+            if self._fuzzy_index is None:
+                self._fuzzy_index = FuzzyIndex()
+                for position in range(len(self.ids)):
+                    self._fuzzy_index.add(position, self.titles[position], self.authors[position])
+            found: List[int] = []
+            wanted = None if limit is None else offset + limit
+            matches = self._fuzzy_index.matches(term)
+            for distance in sorted(matches):
+                if wanted is not None and len(found) >= wanted:
+                    break
+                found += self._first_listed(matches[distance], None if wanted is None else wanted - len(found))
+            return [self._book(p) for p in found[offset:]]
+
+    # Building and patching
+
+    def _build(self, conn, latest: int):
+        self._clear()
+        intern = sys.intern
+        # latest was read first: anything written meanwhile is re-read by the next refresh
+        cursor = conn.execute(f'SELECT {_COLUMNS} FROM books ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            ids, titles, authors, isbns, totals, availables = zip(*rows)
+            first = len(self.ids)
+            self.ids.extend(ids)
+            self.titles.extend(map(intern, titles))
+            self.authors.extend(map(intern, authors))
+            self.isbns.extend(int(isbn) if _packable(isbn) else -1 for isbn in isbns)
+            self._other_isbns.update((first + n, isbn) for n, isbn in enumerate(isbns) if not _packable(isbn))
+            self.total_copies.extend(totals)
+            self.available_copies.extend(availables)
+        self._sort_order()
+        self.seq = latest
+        self.builds += 1
+
+    def _apply_changes(self, conn, latest: int):
+        changed = conn.execute(f'''
+            SELECT c.book_id, {', '.join('b.' + column for column in _COLUMNS.split(', '))}
+            FROM book_changes c LEFT JOIN books b ON b.id = c.book_id
+            WHERE c.change_seq > ?
+        ''', (self.seq,)).fetchall()
+        if len(changed) > REBUILD_FRACTION * max(len(self.ids), 1):
+            self._build(conn, latest)
+            return
+
+        intern = sys.intern
+        # New books in id order, so each one can be appended
+        for change in sorted(changed, key=lambda change: change[0]):
+            row = tuple(change)[1:]
+            position = self._position(change[0])
+            if row[0] is None or (position is None and self.ids and change[0] < self.ids[-1]):
+                # Deleted, or a gap being filled: positions would shift, so start over
+                self._build(conn, latest)
+                return
+            if position is None:
+                self._append(row, intern)
+                self._insert_order(len(self.ids) - 1)
+                self._search_texts.clear()
+                if self._fuzzy_index is not None:
+                    self._fuzzy_index.add(len(self.ids) - 1, row[1], row[2])
+                continue
+            if row[1] != self.titles[position]:
+                del self.order[self._order_index(self.titles[position], row[0])]
+                self.titles[position] = intern(row[1])
+                self._insert_order(position)
+                self._search_texts.clear()
+                self._fuzzy_index = None
+            if row[2] != self.authors[position]:
+                self.authors[position] = intern(row[2])
+                self._search_texts.pop('author', None)
+                self._fuzzy_index = None
+            self._set_isbn(position, row[3])
+            self.total_copies[position] = row[4]
+            self.available_copies[position] = row[5]
+        self.seq = latest
+        self.refreshes += 1
+
+    def _append(self, row, intern):
+        book_id, title, author, isbn, total, available = row
+        self.ids.append(book_id)
+        self.titles.append(intern(title))
+        self.authors.append(intern(author))
+        self.isbns.append(-1)
+        self._set_isbn(len(self.ids) - 1, isbn)
+        self.total_copies.append(total)
+        self.available_copies.append(available)
+
+    def _set_isbn(self, position: int, isbn: str):
+        if _packable(isbn):
+            self.isbns[position] = int(isbn)
+            self._other_isbns.pop(position, None)
+        else:
+            self.isbns[position] = -1
+            self._other_isbns[position] = isbn
+
+    def _sort_order(self):
+        # Positions are in id order and the sort is stable, so ties stay in id order
+        self.order = array('i', sorted(range(len(self.ids)), key=self.titles.__getitem__))
+
+    def _insert_order(self, position: int):
+        self.order.insert(self._order_index(self.titles[position], self.ids[position]), position)
+
+    # Lookups
+
+    def _position(self, book_id: int) -> Optional[int]:
+        ids = self.ids
+        lo, hi = 0, len(ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ids[mid] < book_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(ids) and ids[lo] == book_id else None
+
+    def _order_index(self, title: str, book_id: int, after: bool = False) -> int:
+        """Index in `order` of (title, id), or of the first entry after it."""
+        key = (title, book_id)
+        order, titles, ids = self.order, self.titles, self.ids
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            p = order[mid]
+            entry = (titles[p], ids[p])
+            if entry < key or (after and entry == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _search_text(self, field: str) -> Tuple[str, array]:
+        """
+        One lower-cased string of every title (or author) in listing order, and
+        where each entry starts. A single str.find scans the whole catalog at C
+        speed; built on first search and again after titles or authors change.
+        """
+        if field not in self._search_texts:
+            column = self.titles if field == 'title' else self.authors
+            entries = [column[p].lower() for p in self.order]
+            starts, at = array('i'), 0
+            for entry in entries:
+                starts.append(at)
+                at += len(entry) + 1
+            self._search_texts[field] = _SEPARATOR.join(entries), starts
+        return self._search_texts[field]
+
+    def _first_listed(self, positions: Set[int], count: Optional[int]) -> List[int]:
+        """The first count (or all) of positions in listing order."""
+        if len(positions) * 64 > len(self.order):
+            # A large share of the catalog: walk the listing until enough are found
+            return list(islice((p for p in self.order if p in positions), count))
+        key = lambda p: (self.titles[p], self.ids[p])
+        return sorted(positions, key=key) if count is None else heapq.nsmallest(count, positions, key=key)
+
+    def _book(self, position: int) -> Dict:
+        isbn = self.isbns[position]
+        return {
+            'id': self.ids[position],
+            'title': self.titles[position],
+            'author': self.authors[position],
+            'isbn': f'{isbn:013d}' if isbn >= 0 else self._other_isbns[position],
+            'total_copies': self.total_copies[position],
+            'available_copies': self.available_copies[position],
+        }
@@ -3,158 +3,1048 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import atexit
+import base64
+import json
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from cache import LocalCache, ReadThroughCache, SharedCache, VersionedCache
+from catalog_snapshot import CatalogSnapshot
+from fuzzy_search import rank_books
+from isbn import isbn_prefix, normalize_isbn
+from migrations import rebuild_patron_stats as _rebuild_patron_stats, run_migrations
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Connection pool configuration
+POOL_SIZE = 8
+POOL_TIMEOUT = 5.0
+# How long a statement waits for another process's write lock
+BUSY_TIMEOUT = 5.0
+HEALTH_CHECK_INTERVAL = 30.0
+CACHE_SIZE_KB = 8192
+
+# Rows fetched per round trip by the streaming iter_* helpers
+STREAM_BATCH_SIZE = 500
+
+# Book lookup cache configuration
+BOOK_CACHE_SIZE = 1024
+BOOK_CACHE_TTL = 60.0
+
+# Search result cache configuration
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_BYTES = 32 * 1024 * 1024
+SEARCH_CACHE_TTL = 300.0
+
+class PooledConnection(sqlite3.Connection):
+    """
+    SQLite connection handed out by a ConnectionPool.
+
+    Calling close() returns the connection to its pool instead of closing it,
+    so existing helpers can keep their get_db_connection()/close() pairs.
+    """
+
+    def execute(self, sql, parameters=()):
+        if not metrics.ENABLED:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe_sql(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, parameters):
+        if not metrics.ENABLED:
+            return super().executemany(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            metrics.observe_sql(sql, time.perf_counter() - start)
+
+    def commit(self):
+        # Inside transaction() the unit of work commits once on exit
+        if getattr(self, '_tx_depth', 0):
+            return
+        super().commit()
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            super().close()
+        else:
+            pool.release(self)
+
+    def discard(self):
+        """Really close the underlying SQLite connection."""
+        self._pool = None
+        super().close()
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections.
+
+    Nested acquisitions on the same thread share one checked-out connection.
+    Released connections are kept idle (most recently used first) and
+    health-checked before being handed out again. PRAGMAs are applied once
+    when a connection is opened.
+    """
+
+    def __init__(self, database: str, max_size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL, cache_size_kb: int = CACHE_SIZE_KB,
+                 busy_timeout: float = BUSY_TIMEOUT):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.health_check_interval = health_check_interval
+        self.cache_size_kb = cache_size_kb
+        self._idle: List[PooledConnection] = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def size(self) -> int:
+        """Number of open connections (idle and in use)."""
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        """Number of connections waiting in the pool."""
+        return len(self._idle)
+
+    def acquire(self) -> PooledConnection:
+        """Check out a connection, reusing the one already held by this thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn._depth += 1
+            return conn
+        conn = self._checkout()
+        conn._depth = 1
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Give a connection back; it returns to the pool once every nested user is done."""
+        conn._depth -= 1
+        if conn._depth > 0:
+            return
+        if getattr(self._local, 'conn', None) is conn:
+            self._local.conn = None
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.discard()
+            else:
+                conn._last_used = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def thread_connection(self) -> Optional[PooledConnection]:
+        """The connection this thread has checked out, if any."""
+        return getattr(self._local, 'conn', None)
+
+    def release_thread_connection(self):
+        """Return the connection held by the current thread, however deeply nested."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn._depth = 1
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; connections still in use are closed when released."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().discard()
+                self._size -= 1
+            self._cond.notify_all()
+
+    def close_idle(self):
+        """
+        Close idle connections but keep the pool open. A pre-forking server
+        calls this before each fork so no SQLite connection is shared with a
+        worker process; workers open their own on first use.
+        """
+        with self._cond:
+            while self._idle:
+                self._idle.pop().discard()
+                self._size -= 1
+
+    def _checkout(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError('Connection pool is closed.')
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError('Timed out waiting for a database connection.')
+                self._cond.wait(remaining)
+
+        if conn is not None and self._is_healthy(conn):
+            return conn
+        if conn is not None:
+            conn.discard()
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout, check_same_thread=False,
+                               factory=PooledConnection)
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        conn._pool = self
+        conn._tx_depth = 0
+        conn._stale_cache_keys = set()
+        conn._last_used = time.monotonic()
+        return conn
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if time.monotonic() - conn._last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: PooledConnection):
+        with self._cond:
+            self._size -= 1
+            conn.discard()
+            self._cond.notify()
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def configure_pool(database: Optional[str] = None, **options) -> ConnectionPool:
+    """Replace the module connection pool, closing the previous one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(database or DATABASE, **options)
+        get_book_cache().clear()
+        _clear_catalog_snapshot()
+        _clear_search_cache()
+        return _pool
+
+def get_pool() -> ConnectionPool:
+    """Get the module connection pool, creating one for DATABASE if needed."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE)
+    return _pool
+
+def close_pool():
+    """Close the module connection pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    get_book_cache().clear()
+    _clear_catalog_snapshot()
+    _clear_search_cache()
+
+atexit.register(close_pool)
+
+_book_cache = ReadThroughCache(LocalCache(BOOK_CACHE_SIZE, BOOK_CACHE_TTL))
+
+def configure_book_cache(max_entries: int = BOOK_CACHE_SIZE, ttl: float = BOOK_CACHE_TTL,
+                         backend=None) -> ReadThroughCache:
+    """
+    Replace the cache in front of get_book_by_id/get_book_by_isbn.
+
+    With a shared backend (cache.RedisBackend, or cache.InMemorySharedBackend
+    as a local stand-in) every worker process reads and invalidates one cache;
+    otherwise each process keeps its own LRU of max_entries books.
+    """
+    global _book_cache
+    store = SharedCache(backend, ttl) if backend is not None else LocalCache(max_entries, ttl)
+    _book_cache = ReadThroughCache(store)
+    return _book_cache
+
+def get_book_cache() -> ReadThroughCache:
+    """Get the book lookup cache."""
+    return _book_cache
+
+_catalog_snapshot: Optional[CatalogSnapshot] = None
+
+def configure_catalog_snapshot(enabled: bool = True) -> Optional[CatalogSnapshot]:
+    """
+    Serve catalog pages and short-term searches from an in-memory CatalogSnapshot.
+
+    The snapshot is built on first use and brought up to date before every
+    read, re-reading only the books changed since (see catalog_snapshot.py).
+    """
+    global _catalog_snapshot
+    _catalog_snapshot = CatalogSnapshot() if enabled else None
+    return _catalog_snapshot
+
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """Get the catalog snapshot, or None if it is disabled."""
+    return _catalog_snapshot
+
+def _clear_catalog_snapshot():
+    if _catalog_snapshot is not None:
+        _catalog_snapshot.clear()
+
+def _fresh_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """The up-to-date snapshot, or None if disabled or inside a transaction, which must see its own writes."""
+    snapshot = _catalog_snapshot
+    if snapshot is None or _in_transaction():
+        return None
+    conn = get_db_connection()
+    try:
+        snapshot.refresh(conn)
+    finally:
+        conn.close()
+    return snapshot
+
+_search_cache: Optional[VersionedCache] = VersionedCache(
+    LocalCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, max_bytes=SEARCH_CACHE_BYTES))
+
+def configure_search_cache(max_entries: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL,
+                           max_bytes: Optional[int] = SEARCH_CACHE_BYTES) -> Optional[VersionedCache]:
+    """
+    Replace the cache of search results, an LRU of at most max_entries
+    result pages and max_bytes of books; max_entries=0 disables it.
+
+    Pages are cached per catalog version (see get_catalog_version), so any
+    change to the books table, from any process, retires them all.
+    """
+    global _search_cache
+    _search_cache = VersionedCache(LocalCache(max_entries, ttl, max_bytes=max_bytes)) if max_entries else None
+    return _search_cache
+
+def get_search_cache() -> Optional[VersionedCache]:
+    """Get the search result cache, or None if it is disabled."""
+    return _search_cache
+
+def _clear_search_cache():
+    if _search_cache is not None:
+        _search_cache.clear()
+
+def get_catalog_version() -> int:
+    """
+    Number that grows with every committed change to the books table: the
+    latest change number stamped on book_changes by its triggers, so inserts,
+    borrows, returns and edits all bump it, whichever process makes them.
+    """
+    conn = get_db_connection()
+    try:
+        version = conn.execute('SELECT COALESCE(MAX(change_seq), 0) FROM book_changes').fetchone()[0]
+    finally:
+        conn.close()
+    return version
+
+def cached_search(key: Tuple, loader: Callable[[], List[Dict]]) -> List[Dict]:
+    """
+    Return the search results cached under key for the current catalog
+    version, calling loader() on a miss. Key must identify the results,
+    e.g. (search type, normalized term, limit, offset). The cache is
+    bypassed inside a transaction, which must see its own writes.
+    """
+    cache = _search_cache
+    if cache is None or _in_transaction():
+        return loader()
+    # Copies, so a caller editing its results cannot change the cached page
+    return [dict(book) for book in cache.get_or_load(get_catalog_version(), key, loader)]
+
+def _in_transaction() -> bool:
+    conn = get_pool().thread_connection()
+    return conn is not None and (conn._tx_depth > 0 or conn.in_transaction)
+
+def _invalidate_books(conn, *keys: str):
+    """Drop changed books from the cache; with no keys, drop every book."""
+    if keys:
+        get_book_cache().invalidate(*keys)
+    else:
+        get_book_cache().clear()
+        keys = (None,)
+    if conn._tx_depth:
+        # Readers on other threads can reload the old row until we commit,
+        # so drop the keys again once the transaction ends
+        conn._stale_cache_keys.update(keys)
+
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+    """Get a database connection from the pool. close() hands it back."""
+    return get_pool().acquire()
+
+@contextmanager
+def transaction():
+    """
+    Run a unit of work in a single BEGIN IMMEDIATE transaction.
+
+    Helpers called inside the block on the same thread share its connection
+    and their commit() calls are deferred, so the whole block commits once on
+    exit. An exception rolls everything back; callers can also call
+    rollback() on the yielded connection to abandon the work.
+    """
+    conn = get_db_connection()
+    if conn._tx_depth:
+        # Already inside a unit of work: join it
+        conn._tx_depth += 1
+        try:
+            yield conn
+        finally:
+            conn._tx_depth -= 1
+            conn.close()
+        return
+
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn._tx_depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn._tx_depth = 0
+            conn.rollback()
+            raise
+        conn._tx_depth = 0
+        conn.commit()
+    finally:
+        conn._tx_depth = 0
+        if None in conn._stale_cache_keys:
+            get_book_cache().clear()
+        elif conn._stale_cache_keys:
+            get_book_cache().invalidate(*conn._stale_cache_keys)
+        conn._stale_cache_keys.clear()
+        conn.close()
 
 def init_database():
-    """Initialize the database with required tables."""
+    """Initialize the database by applying any pending schema migrations."""
     conn = get_db_connection()
-    
-    # Create books table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT UNIQUE NOT NULL,
-            total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
-        )
-    ''')
-    
-    # Create borrow_records table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS borrow_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patron_id TEXT NOT NULL,
-            book_id INTEGER NOT NULL,
-            borrow_date TEXT NOT NULL,
-            due_date TEXT NOT NULL,
-            return_date TEXT,
-            FOREIGN KEY (book_id) REFERENCES books (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    try:
+        run_migrations(conn)
+    finally:
+        conn.close()
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
-    book_count = conn.execute('SELECT COUNT(*) as count FROM books').fetchone()['count']
-    
-    if book_count == 0:
-        # Add sample books
-        sample_books = [
-            ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
-            ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
-            ('1984', 'George Orwell', '9780451524935', 1)
-        ]
-        
-        for title, author, isbn, copies in sample_books:
+    try:
+        has_books = conn.execute('SELECT EXISTS (SELECT 1 FROM books)').fetchone()[0]
+
+        if not has_books:
+            # Add sample books
+            sample_books = [
+                ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
+                ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
+                ('1984', 'George Orwell', '9780451524935', 1)
+            ]
+
+            for title, author, isbn, copies in sample_books:
+                conn.execute('''
+                    INSERT INTO books (title, author, isbn, total_copies, available_copies)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (title, author, isbn, copies, copies))
+
+            # Make 1984 unavailable by adding a borrow record
             conn.execute('''
-                INSERT INTO books (title, author, isbn, total_copies, available_copies)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (title, author, isbn, copies, copies))
-        
-        # Make 1984 unavailable by adding a borrow record
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', ('123456', 3, 
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
-        
-        # Update available copies for 1984
-        conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
-        
-        conn.commit()
-    
-    conn.close()
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', ('123456', 3, 
+                  to_epoch(datetime.now() - timedelta(days=5)),
+                  to_epoch(datetime.now() + timedelta(days=9))))
+
+            # Update available copies for 1984
+            conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
+
+            conn.commit()
+            get_book_cache().clear()
+    finally:
+        conn.close()
 
 # Helper Functions for Database Operations
 
+def to_epoch(value: datetime) -> int:
+    """Convert a naive local datetime to the integer Unix time stored in borrow_records."""
+    return int(value.timestamp())
+
+def from_epoch(value: Optional[int]) -> Optional[datetime]:
+    """Convert a stored Unix time back to a naive local datetime."""
+    return None if value is None else datetime.fromtimestamp(value)
+
 def get_all_books() -> List[Dict]:
     """Get all books from the database."""
+    return list(iter_all_books())
+
+def iter_all_books(batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield every book in title order, reading batch_size rows at a time."""
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
-    conn.close()
-    return [dict(book) for book in books]
+    try:
+        yield from _iter_rows(conn.execute('SELECT * FROM books ORDER BY title'), batch_size)
+    finally:
+        conn.close()
+
+# Columns of the tables that can be exported, in export order
+EXPORT_COLUMNS = {
+    'books': ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies'),
+    'borrow_records': ('id', 'patron_id', 'book_id', 'borrow_date', 'due_date', 'return_date'),
+}
+
+def iter_export_batches(table: str, since: Optional[int] = None,
+                        batch_size: int = STREAM_BATCH_SIZE) -> Iterator[List[tuple]]:
+    """
+    Yield every row of an EXPORT_COLUMNS table as plain tuples, batch_size
+    rows at a time, in id order.
+
+    With since (Unix time), only the borrow_records borrowed or returned at
+    or after it are read, from the borrow and return date indexes.
+    """
+    columns = EXPORT_COLUMNS.get(table)
+    if columns is None:
+        raise ValueError(f"Cannot export table {table!r}")
+    if since is not None and table != 'borrow_records':
+        raise ValueError("Only borrow_records can be exported since a time")
+
+    select = f'SELECT {", ".join(columns)} FROM {table}'
+    conn = get_db_connection()
+    try:
+        if since is None:
+            cursor = conn.execute(select + ' ORDER BY id')
+        else:
+            # Ids from two disjoint index range scans; SQLite keeps an IN list
+            # sorted, so the rows are then read by rowid already in id order.
+            # (ORDER BY on a UNION ALL makes it scan the whole table instead.)
+            cursor = conn.execute(f'''
+                {select} WHERE id IN (
+                    SELECT id FROM borrow_records WHERE borrow_date >= ?
+                    UNION ALL
+                    SELECT id FROM borrow_records WHERE return_date >= ? AND borrow_date < ?
+                )
+                ORDER BY id
+            ''', (since, since, since))
+        # Tuples are all the writers need, and much cheaper than Row or dict objects
+        cursor.row_factory = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        conn.close()
+
+def _iter_rows(cursor, batch_size: int) -> Iterator[Dict]:
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row)
+
+def encode_cursor(title: str, book_id: int) -> str:
+    """Encode a (title, id) keyset position as an opaque URL-safe token."""
+    raw = json.dumps([title, book_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """Decode a token from encode_cursor(); returns None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        title, book_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(title, str) or not isinstance(book_id, int):
+        return None
+    return title, book_id
+
+def get_books_page(cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Get one page of books ordered by (title, id).
+
+    Seeks past the cursor position on idx_books_title instead of using OFFSET,
+    so every page costs the same. Returns the books and the cursor for the
+    next page (None on the last page). With the catalog snapshot enabled the
+    page is read from memory instead.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    snapshot = _fresh_catalog_snapshot()
+    if snapshot is not None:
+        books, more = snapshot.page(position, limit)
+        next_cursor = encode_cursor(books[-1]['title'], books[-1]['id']) if more else None
+        return books, next_cursor
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
-    """Get a specific book by ID."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
-    conn.close()
+    try:
+        if position is None:
+            books = conn.execute(
+                'SELECT * FROM books ORDER BY title, id LIMIT ?', (limit + 1,)
+            ).fetchall()
+        else:
+            books = conn.execute('''
+                SELECT * FROM books WHERE (title, id) > (?, ?)
+                ORDER BY title, id LIMIT ?
+            ''', (position[0], position[1], limit + 1)).fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(books[-1]['title'], books[-1]['id'])
+    return [dict(book) for book in books], next_cursor
+
+def get_book_count() -> int:
+    """Get the number of books in the catalog from the maintained counter."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'book_count'").fetchone()
+    finally:
+        conn.close()
+    return row['value'] if row else 0
+
+def search_books(search_term: str, field: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+    """
+    Case-insensitive substring search on books.title or books.author.
+
+    Terms of three or more characters are answered from the trigram index and
+    ranked with prefix matches first, then by bm25 relevance. Shorter terms
+    cannot use trigrams and fall back to a LIKE scan ordered by title, or to
+    the catalog snapshot's in-memory scan when it is enabled.
+    """
+    return list(iter_search_books(search_term, field, limit, offset))
+
+def iter_search_books(search_term: str, field: str, limit: Optional[int] = None, offset: int = 0,
+                      batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield the results of search_books as they are read, batch_size rows at a time."""
+    if field not in ('title', 'author'):
+        raise ValueError(f"Cannot search on field {field!r}")
+
+    if len(search_term) < 3:
+        snapshot = _fresh_catalog_snapshot()
+        if snapshot is not None:
+            yield from snapshot.search(search_term, field, limit, offset)
+            return
+
+    like_term = search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    limit = -1 if limit is None else limit
+    conn = get_db_connection()
+    try:
+        cursor = None
+        if len(search_term) >= 3:
+            match = '{%s} : "%s"' % (field, search_term.replace('"', '""'))
+            try:
+                cursor = conn.execute(f'''
+                    SELECT b.* FROM books_fts
+                    JOIN books b ON b.id = books_fts.rowid
+                    WHERE books_fts MATCH ?
+                    ORDER BY b.{field} LIKE ? ESCAPE '\\' DESC, bm25(books_fts), b.title
+                    LIMIT ? OFFSET ?
+                ''', (match, like_term + '%', limit, offset))
+            except sqlite3.OperationalError:
+                # No FTS5 in this SQLite build
+                cursor = None
+        if cursor is None:
+            cursor = conn.execute(f'''
+                SELECT * FROM books WHERE {field} LIKE ? ESCAPE '\\'
+                ORDER BY title LIMIT ? OFFSET ?
+            ''', ('%' + like_term + '%', limit, offset))
+        yield from _iter_rows(cursor, batch_size)
+    finally:
+        conn.close()
+
+def fuzzy_search_books(search_term: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+    """
+    Typo-tolerant search on the words of titles and authors (see fuzzy_search.py),
+    closest matches first, then by title.
+
+    Served from the catalog snapshot's word and n-gram indexes; with the
+    snapshot disabled, or inside a transaction, every book is scored instead.
+    """
+    snapshot = _fresh_catalog_snapshot()
+    if snapshot is not None:
+        return snapshot.fuzzy_search(search_term, limit, offset)
+    return rank_books(search_term, iter_all_books(), limit, offset)
+
+def get_book_by_id(book_id: int) -> Optional[Dict]:
+    """
+    Get a specific book by ID.
+    Served from the book cache, except inside a transaction, which must see its own writes.
+    """
+    if _in_transaction():
+        return _load_book('id', book_id)
+    book = get_book_cache().get_or_load(f'book:{book_id}', lambda: _load_book('id', book_id))
     return dict(book) if book else None
 
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
-    """Get a specific book by ISBN."""
+    """
+    Get a specific book by ISBN: ISBN-10 or ISBN-13, with or without hyphens.
+    The cache maps normalized ISBNs to IDs, so each book is cached once.
+    """
+    if _in_transaction():
+        book_id = _load_book_id(isbn)
+        return _load_book('id', book_id) if book_id is not None else None
+    book_id = get_book_cache().get_or_load(_isbn_cache_key(isbn), lambda: _load_book_id(isbn))
+    return get_book_by_id(book_id) if book_id is not None else None
+
+def get_books_by_isbns(isbns: List[str]) -> Dict[str, Dict]:
+    """
+    Get several books by ISBN in one query, e.g. a batch of barcode scans.
+    Keyed by the ISBNs as given; ones with no book are left out.
+    """
+    if not isbns:
+        return {}
+    wanted = {isbn: normalize_isbn(isbn) or isbn for isbn in isbns}
+    conn = get_db_connection()
+    try:
+        books = conn.execute('''
+            SELECT w.value AS wanted, b.* FROM json_each(?) w
+            JOIN book_isbn_keys k ON k.isbn_key = w.value
+            JOIN books b ON b.id = k.book_id
+            UNION ALL
+            SELECT w.value AS wanted, b.* FROM json_each(?) w
+            JOIN books b ON b.isbn = w.value
+            WHERE NOT EXISTS (SELECT 1 FROM book_isbn_keys WHERE isbn_key = w.value)
+        ''', (json.dumps(list(set(wanted.values()))),) * 2).fetchall()
+    finally:
+        conn.close()
+    found = {book['wanted']: {key: book[key] for key in book.keys() if key != 'wanted'} for book in books}
+    return {isbn: found[key] for isbn, key in wanted.items() if key in found}
+
+def search_books_by_isbn_prefix(prefix: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+    """
+    Books whose normalized ISBN-13 starts with prefix (hyphens allowed, e.g.
+    '978-0-306' for one publisher), in ISBN order. An index range scan on
+    book_isbn_keys; books whose ISBN fails the checksum are not included.
+    """
+    digits = isbn_prefix(prefix)
+    if digits is None:
+        return []
+    # Every key starting with digits sorts in [digits, digits + ':'), ':' following '9'
+    conn = get_db_connection()
+    try:
+        books = conn.execute('''
+            SELECT b.* FROM book_isbn_keys k JOIN books b ON b.id = k.book_id
+            WHERE k.isbn_key >= ? AND k.isbn_key < ?
+            ORDER BY k.isbn_key LIMIT ? OFFSET ?
+        ''', (digits, digits + ':', -1 if limit is None else limit, offset)).fetchall()
+    finally:
+        conn.close()
+    return [dict(book) for book in books]
+
+def get_books_by_ids(book_ids: List[int]) -> Dict[int, Dict]:
+    """Get several books in one query, keyed by ID. Missing IDs are left out."""
+    if not book_ids:
+        return {}
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
-    conn.close()
+    try:
+        books = conn.execute(
+            'SELECT * FROM books WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(list(book_ids)),)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {book['id']: dict(book) for book in books}
+
+def _load_book(column: str, value) -> Optional[Dict]:
+    conn = get_db_connection()
+    try:
+        book = conn.execute(f'SELECT * FROM books WHERE {column} = ?', (value,)).fetchone()
+    finally:
+        conn.close()
     return dict(book) if book else None
 
+def _isbn_cache_key(isbn: str) -> str:
+    return f'isbn:{normalize_isbn(isbn) or isbn}'
+
+def _load_book_id(isbn: str) -> Optional[int]:
+    key = normalize_isbn(isbn)
+    conn = get_db_connection()
+    try:
+        if key is not None:
+            book = conn.execute('SELECT book_id AS id FROM book_isbn_keys WHERE isbn_key = ?', (key,)).fetchone()
+        else:
+            # Not a valid ISBN: only an exact match on the stored value
+            book = conn.execute('SELECT id FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    finally:
+        conn.close()
+    return book['id'] if book else None
+
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
-        FROM borrow_records br 
-        JOIN books b ON br.book_id = b.id 
-        WHERE br.patron_id = ? AND br.return_date IS NULL
-        ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
-    conn.close()
+    try:
+        now = to_epoch(datetime.now())
+        records = conn.execute('''
+            SELECT br.book_id, br.borrow_date, br.due_date, b.title, b.author,
+                   br.due_date < :now AS is_overdue,
+                   MAX((:now - br.due_date) / 86400, 0) AS days_overdue
+            FROM borrow_records br 
+            JOIN books b ON br.book_id = b.id 
+            WHERE br.patron_id = :patron_id AND br.return_date IS NULL
+            ORDER BY br.borrow_date
+        ''', {'patron_id': patron_id, 'now': now}).fetchall()
+    finally:
+        conn.close()
     
-    borrowed_books = []
+    return [_borrowed_book(record) for record in records]
+
+def _borrowed_book(record) -> Dict:
+    """Shape a loan row; overdue status and whole days overdue come from SQL."""
+    return {
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'author': record['author'],
+        'borrow_date': from_epoch(record['borrow_date']),
+        'due_date': from_epoch(record['due_date']),
+        'is_overdue': bool(record['is_overdue']),
+        'days_overdue': record['days_overdue']
+    }
+
+def get_patron_loan_summaries(patron_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Get open loans for several patrons in a single query.
+
+    Returns a dict keyed by patron ID with 'borrowed_books' (same entries as
+    get_patron_borrowed_books) and 'borrow_count' (all open loans, as
+    get_patron_borrow_count reads them). Patrons without loans are included
+    with empty summaries.
+    """
+    summaries = {patron_id: {'borrowed_books': [], 'borrow_count': 0} for patron_id in patron_ids}
+    if not summaries:
+        return summaries
+
+    conn = get_db_connection()
+    try:
+        records = conn.execute('''
+            SELECT br.patron_id, br.book_id, br.borrow_date, br.due_date, b.title, b.author,
+                   (SELECT open_loans FROM patron_stats s WHERE s.patron_id = br.patron_id) AS open_loans,
+                   br.due_date < :now AS is_overdue,
+                   MAX((:now - br.due_date) / 86400, 0) AS days_overdue
+            FROM borrow_records br
+            LEFT JOIN books b ON br.book_id = b.id
+            WHERE br.patron_id IN (SELECT value FROM json_each(:patron_ids)) AND br.return_date IS NULL
+            ORDER BY br.patron_id, br.borrow_date
+        ''', {'patron_ids': json.dumps(list(summaries)), 'now': to_epoch(datetime.now())}).fetchall()
+    finally:
+        conn.close()
+
     for record in records:
-        borrowed_books.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
-        })
-    
-    return borrowed_books
+        summary = summaries[record['patron_id']]
+        # Every row carries the patron's patron_stats counter
+        summary['borrow_count'] = record['open_loans']
+        if record['title'] is None:
+            # Loan of a book no longer in the catalog: counted but not listed
+            continue
+        summary['borrowed_books'].append(_borrowed_book(record))
+    return summaries
+
+def iter_late_fee_totals(now: datetime, batch_size: int = 10000):
+    """
+    Stream per-patron late fee totals for every open loan, computed in SQL.
+
+    Overdue loans are found with a range scan on the open-loans due-date
+    index. The fee expression mirrors late_fee_for_days in
+    services/library_service.py, so the results match the per-book
+    calculation priced at the same `now`.
+
+    Yields:
+        (patron_id, total_late_fees, overdue_books) for patrons owing fees
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            WITH overdue AS (
+                SELECT patron_id, (:now - due_date) / 86400 AS days
+                FROM borrow_records
+                WHERE return_date IS NULL AND due_date <= :now - 86400
+            )
+            SELECT patron_id,
+                   SUM(MIN(CASE WHEN days <= 7 THEN days * 0.50 ELSE 3.50 + (days - 7) * 1.00 END, 15.00)) AS total,
+                   COUNT(*) AS books
+            FROM overdue
+            GROUP BY +patron_id  -- unary + keeps the planner on the due-date range scan
+        ''', {'now': to_epoch(now)})
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row['patron_id'], row['total'], row['books']
+    finally:
+        conn.close()
 
 def get_patron_borrow_count(patron_id: str) -> int:
-    """Get the number of books currently borrowed by a patron."""
+    """Get the number of books currently borrowed by a patron, from the patron_stats counter."""
+    conn = get_db_connection()
+    try:
+        stats = conn.execute('''
+            SELECT open_loans FROM patron_stats WHERE patron_id = ?
+        ''', (patron_id,)).fetchone()
+    finally:
+        conn.close()
+    return stats['open_loans'] if stats else 0
+
+def get_patron_stats(patron_id: str) -> Dict:
+    """
+    Get a patron's loan counters: open_loans, plus overdue_loans and
+    outstanding_fees as priced at fees_as_of (Unix time, None if never priced).
+    """
+    conn = get_db_connection()
+    try:
+        stats = conn.execute('SELECT * FROM patron_stats WHERE patron_id = ?', (patron_id,)).fetchone()
+    finally:
+        conn.close()
+    if not stats:
+        return {'patron_id': patron_id, 'open_loans': 0, 'overdue_loans': 0, 'outstanding_fees': 0.0, 'fees_as_of': None}
+    return dict(stats)
+
+def check_patron_stats() -> List[Dict]:
+    """
+    Compare every patron's open_loans counter with a count of borrow_records.
+
+    Returns:
+        One dict (patron_id, open_loans, actual) per patron whose counter is wrong
+    """
     conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
-    conn.close()
-    return count
+    try:
+        mismatches = conn.execute('''
+            WITH actual AS (
+                SELECT patron_id, COUNT(*) AS open_loans FROM borrow_records
+                WHERE return_date IS NULL GROUP BY patron_id
+            )
+            SELECT a.patron_id, COALESCE(s.open_loans, 0) AS open_loans, a.open_loans AS actual
+            FROM actual a LEFT JOIN patron_stats s ON s.patron_id = a.patron_id
+            WHERE s.open_loans IS NOT a.open_loans
+            UNION ALL
+            SELECT s.patron_id, s.open_loans, 0 FROM patron_stats s
+            WHERE s.open_loans != 0 AND s.patron_id NOT IN (SELECT patron_id FROM actual)
+        ''').fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in mismatches]
+
+def rebuild_patron_stats(now: Optional[datetime] = None) -> int:
+    """
+    Recompute patron_stats from borrow_records, pricing fees at `now`.
+
+    Returns:
+        The number of patrons with open loans
+    """
+    with transaction() as conn:
+        _rebuild_patron_stats(conn, to_epoch(now or datetime.now()))
+        return conn.execute('SELECT COUNT(*) FROM patron_stats').fetchone()[0]
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             INSERT INTO books (title, author, isbn, total_copies, available_copies)
             VALUES (?, ?, ?, ?, ?)
         ''', (title, author, isbn, total_copies, available_copies))
         conn.commit()
+        # Forget cached "not found" answers for the new book
+        _invalidate_books(conn, _isbn_cache_key(isbn), f'book:{cursor.lastrowid}')
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
 
+def insert_books(books: List[Tuple[str, str, str, int, int]]) -> int:
+    """
+    Insert many books with one executemany, skipping any whose ISBN already exists.
+
+    Args:
+        books: (title, author, isbn, total_copies, available_copies) tuples
+
+    Returns:
+        The number of books inserted
+    """
+    conn = get_db_connection()
+    try:
+        search_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+        ).fetchone()
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM books').fetchone()[0]
+        # Index, key and stamp the batch in one statement each below instead of row by row
+        conn.execute("INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('fts_deferred', 1)")
+        cursor = conn.executemany('''
+            INSERT OR IGNORE INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        ''', books)
+        inserted = cursor.rowcount
+        if search_index:
+            conn.execute('''
+                INSERT INTO books_fts (rowid, title, author)
+                SELECT id, title, author FROM books WHERE id > ?
+            ''', (last_id,))
+        keys = ((normalize_isbn(isbn), book_id) for book_id, isbn in
+                conn.execute('SELECT id, isbn FROM books WHERE id > ?', (last_id,)).fetchall())
+        conn.executemany('INSERT OR IGNORE INTO book_isbn_keys (isbn_key, book_id) VALUES (?, ?)',
+                         [key for key in keys if key[0] is not None])
+        conn.execute('''
+            INSERT INTO book_changes (book_id, change_seq)
+            SELECT id, (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM book_changes) FROM books WHERE id > ?
+        ''', (last_id,))
+        conn.execute("DELETE FROM catalog_meta WHERE key = 'fts_deferred'")
+        conn.commit()
+        _invalidate_books(conn)
+        return inserted
+    except BaseException:
+        if not conn._tx_depth:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def get_import_checkpoint(name: str) -> Optional[Dict]:
+    """Get the saved progress (rows_done, finished) of a named import."""
+    conn = get_db_connection()
+    try:
+        checkpoint = conn.execute('SELECT * FROM import_checkpoints WHERE name = ?', (name,)).fetchone()
+    finally:
+        conn.close()
+    return dict(checkpoint) if checkpoint else None
+
+def save_import_checkpoint(name: str, rows_done: int, finished: bool = False):
+    """Record how many source rows of a named import are committed."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            INSERT INTO import_checkpoints (name, rows_done, finished, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE
+            SET rows_done = excluded.rows_done, finished = excluded.finished, updated_at = excluded.updated_at
+        ''', (name, rows_done, int(finished), to_epoch(datetime.now())))
+        conn.commit()
+    finally:
+        conn.close()
+
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
     conn = get_db_connection()
@@ -162,7 +1052,22 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def insert_borrow_records(patron_id: str, book_ids: List[int], borrow_date: datetime, due_date: datetime) -> bool:
+    """Insert one borrow record per book, all with the same dates."""
+    conn = get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+            VALUES (?, ?, ?, ?)
+        ''', [(patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)) for book_id in book_ids])
         conn.commit()
         conn.close()
         return True
@@ -171,13 +1076,45 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         return False
 
 def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+    Returns False without changing anything if the book is missing or the count would go negative.
+    """
     conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
+        cursor = conn.execute('''
+            UPDATE books SET available_copies = available_copies + ?
+            WHERE id = ? AND available_copies + ? >= 0
+        ''', (change, book_id, change))
         conn.commit()
+        _invalidate_books(conn, f'book:{book_id}')
+        conn.close()
+        return cursor.rowcount == 1
+    except Exception as e:
+        conn.close()
+        return False
+
+def update_books_availability(book_ids: List[int], change: int) -> bool:
+    """
+    Update the available copies of several books by the same amount in one statement.
+    Returns False without changing anything if any book is missing or would go negative.
+    """
+    conn = get_db_connection()
+    try:
+        # A savepoint undoes a partial update without ending an enclosing transaction()
+        conn.execute('SAVEPOINT update_books_availability')
+        cursor = conn.execute('''
+            UPDATE books SET available_copies = available_copies + :change
+            WHERE id IN (SELECT value FROM json_each(:book_ids)) AND available_copies + :change >= 0
+        ''', {'change': change, 'book_ids': json.dumps(list(book_ids))})
+        if cursor.rowcount != len(set(book_ids)):
+            conn.execute('ROLLBACK TO update_books_availability')
+            conn.execute('RELEASE update_books_availability')
+            conn.close()
+            return False
+        conn.execute('RELEASE update_books_availability')
+        conn.commit()
+        _invalidate_books(conn, *(f'book:{book_id}' for book_id in book_ids))
         conn.close()
         return True
     except Exception as e:
@@ -192,10 +1129,161 @@ def update_borrow_record_return_date(patron_id: str, book_id: int, return_date:
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
+        ''', (to_epoch(return_date), patron_id, book_id))
         conn.commit()
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
+
+def update_borrow_records_return_date(patron_id: str, book_ids: List[int], return_date: datetime) -> bool:
+    """Update the return date for a patron's open borrow records of several books."""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE borrow_records
+            SET return_date = ?
+            WHERE patron_id = ? AND book_id IN (SELECT value FROM json_each(?)) AND return_date IS NULL
+        ''', (to_epoch(return_date), patron_id, json.dumps(list(book_ids))))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+# Background job queue (see services/job_queue.py)
+
+def enqueue_job(kind: str, payload: Dict, dedup_key: Optional[str] = None) -> Tuple[int, bool]:
+    """
+    Add a job to the queue.
+
+    A job whose dedup_key is already queued, running or done is not added
+    again. A failed one is queued for another try.
+
+    Returns:
+        tuple: (job_id, created: bool)
+    """
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO jobs (kind, payload, dedup_key, created_at, updated_at, run_after)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dedup_key) DO UPDATE
+            SET status = 'queued', attempts = 0, error = NULL, updated_at = excluded.updated_at,
+                run_after = excluded.run_after
+            WHERE jobs.status = 'failed'
+        ''', (kind, json.dumps(payload), dedup_key, now, now, now))
+        created = cursor.rowcount == 1
+        if dedup_key is None:
+            job_id = cursor.lastrowid
+        else:
+            job_id = conn.execute('SELECT id FROM jobs WHERE dedup_key = ?', (dedup_key,)).fetchone()['id']
+        conn.commit()
+    finally:
+        conn.close()
+    return job_id, created
+
+def claim_job(lease_seconds: float) -> Optional[Dict]:
+    """
+    Atomically take the oldest runnable job and lease it to the caller.
+
+    The returned job's 'attempts' value identifies this lease; pass it back to
+    finish_job or retry_job so a worker whose lease expired cannot overwrite
+    a later attempt.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        job = conn.execute('''
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, lease_expires_at = ?, updated_at = ?
+            WHERE id = (
+                SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ?
+                ORDER BY run_after, id LIMIT 1
+            )
+            RETURNING *
+        ''', (now + lease_seconds, now, now)).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    return _job(job) if job else None
+
+def finish_job(job_id: int, attempt: int, status: str, result: Optional[Dict] = None,
+               error: Optional[str] = None) -> bool:
+    """Record the outcome ('done' or 'failed') of a leased job attempt."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE jobs SET status = ?, result = ?, error = ?, lease_expires_at = NULL, updated_at = ?
+            WHERE id = ? AND status = 'running' AND attempts = ?
+        ''', (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, attempt))
+        conn.commit()
+    finally:
+        conn.close()
+    return cursor.rowcount == 1
+
+def retry_job(job_id: int, attempt: int, delay: float, error: str) -> bool:
+    """Put a leased job back in the queue to run again after `delay` seconds."""
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE jobs SET status = 'queued', error = ?, lease_expires_at = NULL, updated_at = ?, run_after = ?
+            WHERE id = ? AND status = 'running' AND attempts = ?
+        ''', (error, now, now + delay, job_id, attempt))
+        conn.commit()
+    finally:
+        conn.close()
+    return cursor.rowcount == 1
+
+def record_job_result(job_id: int, attempt: int, result: Dict) -> bool:
+    """
+    Save a result on a leased job that is still running, e.g. a charge made
+    before the rest of the handler ran. A later attempt sees it in 'result'.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE jobs SET result = ?, updated_at = ?
+            WHERE id = ? AND status = 'running' AND attempts = ?
+        ''', (json.dumps(result), time.time(), job_id, attempt))
+        conn.commit()
+    finally:
+        conn.close()
+    return cursor.rowcount == 1
+
+def requeue_expired_jobs() -> int:
+    """Return jobs whose worker died mid-run (lease expired) to the queue."""
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE jobs SET status = 'queued', lease_expires_at = NULL, updated_at = ?, run_after = ?
+            WHERE status = 'running' AND lease_expires_at < ?
+        ''', (now, now, now))
+        conn.commit()
+    finally:
+        conn.close()
+    return cursor.rowcount
+
+def get_job(job_id: int) -> Optional[Dict]:
+    """Get a job by ID."""
+    conn = get_db_connection()
+    try:
+        job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _job(job) if job else None
+
+def _job(row) -> Dict:
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+
+# Per-function timers for /metrics; a flag check per call while metrics are off
+metrics.instrument_module(__name__, exclude=('to_epoch', 'from_epoch', 'encode_cursor', 'decode_cursor'))
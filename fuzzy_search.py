@@ -0,0 +1,186 @@
+"""
+Fuzzy Search Module - typo-tolerant matching on the words of titles and authors
+A book matches a query when every query word is within max_edits() of some
+word in its title or author, so "fitzgerld" finds Fitzgerald. FuzzyIndex maps
+each distinct word to the books containing it and each bigram and trigram to
+the words containing it, so only words sharing enough of them with a query
+word are compared, and matching books are found with set intersections
+rather than by scoring every book.
+"""
+
+import heapq
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_WORD = re.compile(r'[^\W\d_]+')
+
+def words(text: str) -> List[str]:
+    """Lower-cased alphabetic words of text; digits and punctuation separate words."""
+    return _WORD.findall(text.lower())
+
+def max_edits(word: str) -> int:
+    """Typos tolerated in a query word: none below 3 letters, one up to 5, then two."""
+    return 0 if len(word) < 3 else 1 if len(word) < 6 else 2
+
+def ngrams(word: str, n: int) -> Set[str]:
+    """Distinct n-letter substrings of word padded with '$' at both ends."""
+    padded = f'${word}$'
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """
+    Edits (insertions, deletions, substitutions and swaps of adjacent letters)
+    turning a into b, or None as soon as it is certain to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    if a == b:
+        return 0
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return None
+        before, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else None
+
+def book_distance(query_words: List[str], book_words: Iterable[str],
+                  seen: Optional[Dict[Tuple[str, str], Optional[int]]] = None) -> Optional[int]:
+    """
+    Total edits matching every query word to its closest book word, or None if
+    one has no match. Pass the same `seen` dict across books to compute each
+    (query word, book word) distance once.
+    """
+    seen = {} if seen is None else seen
+    book_words = set(book_words)
+    total = 0
+    for word in query_words:
+        best = None
+        for candidate in book_words:
+            key = word, candidate
+            if key not in seen:
+                seen[key] = edit_distance(word, candidate, max_edits(word))
+            distance = seen[key]
+            if distance is not None and (best is None or distance < best):
+                best = distance
+        if best is None:
+            return None
+        total += best
+    return total
+
+class FuzzyIndex:
+    """
+    Word -> book positions and n-gram -> word inverted indexes.
+
+    Positions are whatever the caller numbers its books with; add() them in
+    increasing order.
+    """
+
+    def __init__(self):
+        self.vocabulary: List[str] = []
+        self._word_ids: Dict[str, int] = {}
+        self._postings: List[array] = []
+        # n -> n-gram -> IDs of the words containing it
+        self._grams: Dict[int, Dict[str, array]] = {2: {}, 3: {}}
+
+    def add(self, position: int, *texts: str):
+        """Index the words of texts as belonging to the book at position."""
+        for word in {word for text in texts for word in words(text)}:
+            word_id = self._word_ids.get(word)
+            if word_id is None:
+                word_id = self._word_ids[word] = len(self.vocabulary)
+                self.vocabulary.append(word)
+                self._postings.append(array('i'))
+                for n, grams in self._grams.items():
+                    for gram in ngrams(word, n):
+                        grams.setdefault(gram, array('i')).append(word_id)
+            self._postings[word_id].append(position)
+
+    def similar_words(self, word: str) -> Dict[int, int]:
+        """IDs of the indexed words within max_edits(word) of word, with their distances."""
+        limit = max_edits(word)
+        if limit == 0:
+            word_id = self._word_ids.get(word)
+            return {} if word_id is None else {word_id: 0}
+
+        # Each edit destroys at most four of the word's trigrams (a swap of
+        # adjacent letters; other edits three) or three of its bigrams, so a
+        # word within `limit` edits shares the rest. Use trigrams when that
+        # guarantees at least one shared gram, else the bigrams, which always
+        # do for words of 3 letters or more; scanning for a shared gram is
+        # then certain not to miss a match.
+        n, grams = 3, ngrams(word, 3)
+        needed = len(grams) - 4 * limit
+        if needed < 1:
+            n, grams = 2, ngrams(word, 2)
+            needed = max(1, len(grams) - 3 * limit)
+        shared = Counter()
+        index = self._grams[n]
+        for gram in grams:
+            shared.update(index.get(gram, ()))
+        similar = {}
+        for word_id, count in shared.items():
+            if count >= needed:
+                distance = edit_distance(word, self.vocabulary[word_id], limit)
+                if distance is not None:
+                    similar[word_id] = distance
+        return similar
+
+    def matches(self, query: str) -> Dict[int, Set[int]]:
+        """Positions of the books matching every word of query, grouped by total distance."""
+        query_words = list(dict.fromkeys(words(query)))
+        per_word = [self.similar_words(word) for word in query_words]
+        if not per_word or not all(per_word):
+            return {}
+
+        # Set intersections per pair of distances: each query word contributes
+        # at most three groups (0 to 2 edits), so there are only a few
+        found = self._by_distance(per_word[0])
+        for similar in per_word[1:]:
+            groups = self._by_distance(similar)
+            combined: Dict[int, Set[int]] = {}
+            for distance, positions in found.items():
+                for extra, more in groups.items():
+                    both = positions & more
+                    if both:
+                        combined.setdefault(distance + extra, set()).update(both)
+            found = combined
+        return found
+
+    def _by_distance(self, similar: Dict[int, int]) -> Dict[int, Set[int]]:
+        """Books containing the similar words, grouped by their closest word's distance."""
+        groups: Dict[int, Set[int]] = {}
+        seen: Set[int] = set()
+        for distance in sorted(set(similar.values())):
+            positions = set()
+            for word_id, word_distance in similar.items():
+                if word_distance == distance:
+                    positions.update(self._postings[word_id])
+            positions -= seen
+            seen |= positions
+            groups[distance] = positions
+        return groups
+
+
+def rank_books(query: str, books: Iterable[Dict], limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+    """Score every book against query without an index; closest first, then by (title, id)."""
+    query_words = list(dict.fromkeys(words(query)))
+    if not query_words:
+        return []
+    scored, seen = [], {}
+    for book in books:
+        distance = book_distance(query_words, words(book['title']) + words(book['author']), seen)
+        if distance is not None:
+            scored.append((distance, book['title'], book['id'], book))
+    if limit is None:
+        scored.sort(key=lambda match: match[:3])
+    else:
+        scored = heapq.nsmallest(offset + limit, scored, key=lambda match: match[:3])
+    return [match[3] for match in scored[offset:]]
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for serving wsgi:app with several worker processes.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is preloaded in the master, so migrations and seeding run once;
+each worker then opens its own SQLite connections after the fork. SQLite
+runs in WAL mode with a busy timeout (LIBRARY_DB_BUSY_TIMEOUT), so readers
+in all workers proceed while one of them writes. Each worker keeps its own
+book cache, so a write made in one worker may be served stale by another for
+up to LIBRARY_BOOK_CACHE_TTL seconds unless a shared BOOK_CACHE_BACKEND is set.
+
+Background jobs are not run by the web workers; start
+`python -m services.job_queue` alongside.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('LIBRARY_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('LIBRARY_WORKERS', min(multiprocessing.cpu_count(), 8)))
+# Threads per worker share that worker's connection pool
+worker_class = 'gthread'
+threads = int(os.environ.get('LIBRARY_THREADS', 4))
+preload_app = True
+timeout = 30
+accesslog = os.environ.get('LIBRARY_ACCESS_LOG')
+
+
+def pre_fork(server, worker):
+    # SQLite connections must not cross a fork; close the master's before each one
+    import database
+    database.get_pool().close_idle()
+
+
+def post_fork(server, worker):
+    # Workers start with empty metrics rather than the master's startup calls
+    import metrics
+    metrics.REGISTRY.reset()
@@ -0,0 +1,55 @@
+"""
+ISBN Module - ISBN normalization
+Books are matched on a normalized key: the ISBN-13 with hyphens and spaces
+removed and its check digit verified, with ISBN-10s converted to their 978
+ISBN-13. Migration 11 computes the same key in SQL for the book_isbn_keys
+index, so the two must stay in step.
+"""
+
+import operator
+from typing import Optional
+
+def clean_isbn(value: str) -> str:
+    """Strip spaces and hyphens, e.g. '0-306-40615-2' -> '0306406152'."""
+    return value.strip().upper().replace('-', '').replace(' ', '')
+
+def isbn13_check_digit(first12: str) -> str:
+    """Check digit completing 12 ISBN-13 digits."""
+    # Summing the ASCII codes is much faster than int() per digit; '0' is 48
+    total = sum(first12[0::2].encode()) + 3 * sum(first12[1::2].encode()) - 48 * 24
+    return str((10 - total % 10) % 10)
+
+def is_valid_isbn10(isbn: str) -> bool:
+    """Whether a cleaned value is an ISBN-10 with a correct check digit (X for 10)."""
+    if len(isbn) != 10 or not (isbn[:9].isdigit() and isbn.isascii()) or not (isbn[9].isdigit() or isbn[9] == 'X'):
+        return False
+    total = sum(map(operator.mul, map(int, isbn[:9]), range(10, 1, -1)))
+    return (total + (10 if isbn[9] == 'X' else int(isbn[9]))) % 11 == 0
+
+def is_valid_isbn13(isbn: str) -> bool:
+    """Whether a cleaned value is an ISBN-13 with a correct check digit."""
+    return len(isbn) == 13 and isbn.isdigit() and isbn.isascii() and isbn13_check_digit(isbn[:12]) == isbn[12]
+
+def isbn10_to_isbn13(isbn10: str) -> str:
+    """The 978 ISBN-13 of a cleaned ISBN-10."""
+    first12 = '978' + isbn10[:9]
+    return first12 + isbn13_check_digit(first12)
+
+def normalize_isbn(value: str) -> Optional[str]:
+    """
+    The normalized key of an ISBN-10 or ISBN-13, hyphenated or not, or None
+    if it is not a valid ISBN.
+    """
+    isbn = clean_isbn(value)
+    if is_valid_isbn13(isbn):
+        return isbn
+    if is_valid_isbn10(isbn):
+        return isbn10_to_isbn13(isbn)
+    return None
+
+def isbn_prefix(value: str) -> Optional[str]:
+    """The leading digits of an ISBN-13, e.g. a group or publisher range such as '978-0-306', or None."""
+    prefix = clean_isbn(value)
+    if not prefix or len(prefix) > 13 or not (prefix.isdigit() and prefix.isascii()):
+        return None
+    return prefix
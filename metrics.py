@@ -0,0 +1,262 @@
+"""
+Metrics Module - Timers, counters and slow-query logging
+Collects per-function and per-SQL-statement timings plus per-request spans,
+and renders them in the Prometheus text exposition format for /metrics.
+
+Everything is off until enable() is called (METRICS_ENABLED in the app
+config). While disabled, an instrumented function costs one flag check.
+"""
+
+import bisect
+import functools
+import inspect
+import logging
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('library.metrics')
+
+ENABLED = False
+
+# Statements slower than this are logged as warnings
+SLOW_QUERY_SECONDS = 0.1
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Database time spent by the current request, for its span
+_request_span: ContextVar[Optional[Dict]] = ContextVar('request_span', default=None)
+
+class Histogram:
+    """Bucketed durations for one metric/label set."""
+
+    __slots__ = ('buckets', 'count', 'sum')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class Registry:
+    """Thread-safe store of histograms and counters, keyed by metric name and labels."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict, float]]]] = []
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, labels: Tuple[Tuple[str, str], ...], seconds: float):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, labels: Tuple[Tuple[str, str], ...] = (), amount: float = 1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def add_collector(self, collect: Callable[[], Iterable[Tuple[str, str, Dict, float]]]):
+        """Register a callback yielding (name, type, labels, value) samples at scrape time."""
+        self._collectors.append(collect)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        return self._histograms.get(name, {}).get(tuple(sorted(labels.items())))
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, 'histogram')
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ('+Inf',), histogram.buckets):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {histogram.sum!r}')
+                    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, 'counter')
+                for labels, value in sorted(series.items()):
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        seen = set()
+        for collect in self._collectors:
+            for name, kind, labels, value in collect():
+                if name not in seen:
+                    seen.add(name)
+                    self._header(lines, name, kind)
+                lines.append(f'{name}{_labels(tuple(sorted(labels.items())))} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines: List[str], name: str, kind: str):
+        if name in self._help:
+            lines.append(f'# HELP {name} {self._help[name]}')
+        lines.append(f'# TYPE {name} {kind}')
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = Registry()
+REGISTRY.describe('library_function_duration_seconds', 'Time spent in database.py and library_service functions.')
+REGISTRY.describe('library_function_errors_total', 'Calls that raised, by function.')
+REGISTRY.describe('library_sql_duration_seconds', 'SQL statement execution time (to the first row), by statement.')
+REGISTRY.describe('library_sql_slow_queries_total', 'Statements slower than the slow-query threshold.')
+REGISTRY.describe('library_http_request_duration_seconds', 'Flask request time, by endpoint.')
+REGISTRY.describe('library_http_request_db_seconds', 'Time each request spent executing SQL.')
+
+
+def enable(slow_query_seconds: Optional[float] = None):
+    """Start collecting metrics."""
+    global ENABLED, SLOW_QUERY_SECONDS
+    if slow_query_seconds is not None:
+        SLOW_QUERY_SECONDS = slow_query_seconds
+    ENABLED = True
+
+def disable():
+    """Stop collecting metrics; instrumented code goes back to a flag check."""
+    global ENABLED
+    ENABLED = False
+
+
+# Function timers
+
+def timed(func: Callable, name: Optional[str] = None) -> Callable:
+    """
+    Wrap a function so each call is timed when metrics are enabled.
+    Generator functions are timed from the call until the generator finishes.
+    """
+    labels = (('function', name or func.__name__), ('module', func.__module__))
+
+    if inspect.isgeneratorfunction(func):
+        def timed_generator(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from func(*args, **kwargs)
+            except BaseException:
+                REGISTRY.increment('library_function_errors_total', labels)
+                raise
+            finally:
+                REGISTRY.observe('library_function_duration_seconds', labels, time.perf_counter() - start)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            return timed_generator(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                REGISTRY.increment('library_function_errors_total', labels)
+                raise
+            finally:
+                REGISTRY.observe('library_function_duration_seconds', labels, time.perf_counter() - start)
+
+    wrapper.__timed__ = True
+    return wrapper
+
+def instrument_module(module_name: str, exclude: Tuple[str, ...] = ()):
+    """
+    Replace every public function defined in a module with a timed() wrapper.
+
+    Call it at the end of the module, before anything imports its functions.
+    Context-manager factories and coroutine functions are left alone, since
+    timing them here would only measure creating the context manager or
+    coroutine. Pass small per-row helpers in `exclude` to keep them unwrapped.
+    """
+    namespace = vars(sys.modules[module_name])
+    for name, value in list(namespace.items()):
+        if (name.startswith('_') or name in exclude or not inspect.isfunction(value) or value.__module__ != module_name
+                or getattr(value, '__timed__', False) or inspect.iscoroutinefunction(value)):
+            continue
+        if inspect.isgeneratorfunction(getattr(value, '__wrapped__', None)):
+            continue
+        namespace[name] = timed(value)
+
+
+# SQL timing
+
+_WHITESPACE = re.compile(r'\s+')
+
+def observe_sql(sql: str, seconds: float):
+    """Record one statement's execution time and log it if slow."""
+    statement = _WHITESPACE.sub(' ', sql).strip()
+    REGISTRY.observe('library_sql_duration_seconds', (('statement', statement[:160]),), seconds)
+    span = _request_span.get()
+    if span is not None:
+        span['db'] += seconds
+        span['queries'] += 1
+    if seconds >= SLOW_QUERY_SECONDS:
+        REGISTRY.increment('library_sql_slow_queries_total')
+        logger.warning('Slow query (%.1f ms): %s', seconds * 1000, statement)
+
+
+# Flask request spans
+
+def init_app(app):
+    """
+    Time every request of a Flask app and add a Server-Timing header to the response.
+    A streamed body is still being produced when the span closes, so its
+    queries are counted in the SQL metrics but not in the request's span.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def start_span():
+        if ENABLED:
+            g.metrics_span = {'start': time.perf_counter(), 'db': 0.0, 'queries': 0}
+            _request_span.set(g.metrics_span)
+
+    @app.after_request
+    def finish_span(response):
+        span = g.pop('metrics_span', None)
+        if span is None:
+            return response
+        _request_span.set(None)
+        elapsed = time.perf_counter() - span['start']
+        labels = (('endpoint', request.endpoint or 'unmatched'), ('method', request.method),
+                  ('status', str(response.status_code)))
+        REGISTRY.observe('library_http_request_duration_seconds', labels, elapsed)
+        REGISTRY.observe('library_http_request_db_seconds', labels[:2], span['db'])
+        response.headers.add('Server-Timing', f"db;dur={span['db'] * 1000:.2f};desc=\"{span['queries']} queries\"")
+        response.headers.add('Server-Timing', f"app;dur={elapsed * 1000:.2f}")
+        return response
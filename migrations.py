@@ -0,0 +1,461 @@
+"""
+Schema migrations for the Library Management System
+Each migration runs once, in version order, and is recorded in schema_version
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, name: str):
+    """Register a function as the migration script for a schema version."""
+    def register(apply):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f"Migration {version} is registered out of order")
+        MIGRATIONS.append(Migration(version, name, apply))
+        return apply
+    return register
+
+def get_schema_version(conn) -> int:
+    """Get the highest applied migration version (0 for a new database)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+def run_migrations(conn) -> List[int]:
+    """
+    Apply every pending migration, each in its own transaction.
+
+    The version is re-read after taking the write lock, so two processes
+    starting together do not apply the same migration twice. PRAGMA
+    user_version mirrors the latest applied version, so checking an
+    up-to-date database costs a single query.
+
+    Returns:
+        The versions applied by this call
+    """
+    applied = []
+    latest = MIGRATIONS[-1].version
+    # Fast path: one read of the database header on an up-to-date database
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= latest:
+        return applied
+    if get_schema_version(conn) >= latest:
+        # Migrated before user_version was kept in step with schema_version
+        conn.execute(f'PRAGMA user_version = {latest}')
+        conn.commit()
+        return applied
+
+    for step in MIGRATIONS:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if step.version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+            step.apply(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                (step.version, step.name, datetime.now().isoformat())
+            )
+            conn.execute(f'PRAGMA user_version = {int(step.version)}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(step.version)
+    return applied
+
+# Migration scripts
+
+@migration(1, 'initial schema')
+def _initial_schema(conn):
+    # Create books table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            isbn TEXT UNIQUE NOT NULL,
+            total_copies INTEGER NOT NULL,
+            available_copies INTEGER NOT NULL
+        )
+    ''')
+
+    # Create borrow_records table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS borrow_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+
+@migration(2, 'catalog listing index and counters')
+def _catalog_listing(conn):
+    # Index used for ordered, keyset-paginated catalog listing
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_title ON books (title)')
+
+    # Running row counts, so listing pages never needs COUNT(*)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO catalog_meta (key, value)
+        SELECT 'book_count', COUNT(*) FROM books
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS catalog_meta_book_insert AFTER INSERT ON books BEGIN
+            UPDATE catalog_meta SET value = value + 1 WHERE key = 'book_count';
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS catalog_meta_book_delete AFTER DELETE ON books BEGIN
+            UPDATE catalog_meta SET value = value - 1 WHERE key = 'book_count';
+        END
+    ''')
+
+@migration(3, 'title/author full-text search index')
+def _search_index(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+    ).fetchone()
+    if exists:
+        return
+
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE books_fts USING fts5(
+                title, author,
+                content='books', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # No FTS5 in this SQLite build; search_books() falls back to LIKE
+        return
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    # Index any books that existed before the search index did
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+
+@migration(4, 'borrow_records indexes')
+def _borrow_record_indexes(conn):
+    # Open loans by patron, in borrow order: covers the borrowed-books list,
+    # the loan count and the return lookup without touching returned loans
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_patron
+        ON borrow_records (patron_id, borrow_date, book_id)
+        WHERE return_date IS NULL
+    ''')
+    # Loan history of a book
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_book
+        ON borrow_records (book_id)
+    ''')
+
+@migration(5, 'borrow_records dates as integer epoch seconds')
+def _borrow_record_epoch_dates(conn):
+    # Existing rows hold local-time ISO text from datetime.isoformat();
+    # 'utc' converts them to true Unix time, as datetime.timestamp() does
+    conn.execute('''
+        CREATE TABLE borrow_records_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO borrow_records_new (id, patron_id, book_id, borrow_date, due_date, return_date)
+        SELECT id, patron_id, book_id,
+               CAST(strftime('%s', borrow_date, 'utc') AS INTEGER),
+               CAST(strftime('%s', due_date, 'utc') AS INTEGER),
+               CAST(strftime('%s', return_date, 'utc') AS INTEGER)
+        FROM borrow_records
+    ''')
+    conn.execute('DROP TABLE borrow_records')
+    conn.execute('ALTER TABLE borrow_records_new RENAME TO borrow_records')
+
+    # Recreate the migration 4 indexes dropped with the old table
+    conn.execute('''
+        CREATE INDEX idx_borrow_records_open_patron
+        ON borrow_records (patron_id, borrow_date, book_id)
+        WHERE return_date IS NULL
+    ''')
+    conn.execute('CREATE INDEX idx_borrow_records_book ON borrow_records (book_id)')
+    # Open loans by due date, for overdue range scans
+    conn.execute('''
+        CREATE INDEX idx_borrow_records_open_due
+        ON borrow_records (due_date, patron_id)
+        WHERE return_date IS NULL
+    ''')
+
+@migration(6, 'background job queue')
+def _job_queue(conn):
+    # Payment/refund work queued by the API and run by services.job_queue workers.
+    # Times are Unix seconds; dedup_key makes re-submitting the same work a no-op.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            dedup_key TEXT UNIQUE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            run_after REAL NOT NULL,
+            lease_expires_at REAL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_queued
+        ON jobs (run_after, id) WHERE status = 'queued'
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_running_lease
+        ON jobs (lease_expires_at) WHERE status = 'running'
+    ''')
+
+@migration(7, 'catalog import checkpoints')
+def _import_checkpoints(conn):
+    # Rows of each named import already committed, saved in the same
+    # transaction as the batch so a resumed import neither skips nor repeats rows
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            name TEXT PRIMARY KEY,
+            rows_done INTEGER NOT NULL,
+            finished INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL
+        )
+    ''')
+
+@migration(8, 'deferrable search indexing for bulk loads')
+def _deferrable_search_index(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'books_fts_insert'"
+    ).fetchone()
+    if not exists:
+        return
+    # Bulk loads set catalog_meta.fts_deferred inside their transaction and
+    # index the whole batch with one INSERT ... SELECT, which is several times
+    # faster than a trigger firing per row. Other connections never see the flag.
+    conn.execute('DROP TRIGGER books_fts_insert')
+    conn.execute('''
+        CREATE TRIGGER books_fts_insert AFTER INSERT ON books
+        WHEN (SELECT value FROM catalog_meta WHERE key = 'fts_deferred') IS NOT 1 BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+
+# Late fees owed on one patron's open loans as of `now` (Unix seconds); the fee
+# expression mirrors late_fee_for_days in services/library_service.py
+_PATRON_FEES = '''
+    SELECT COUNT(*), COALESCE(SUM(MIN(CASE WHEN days <= 7 THEN days * 0.50
+                                           ELSE 3.50 + (days - 7) * 1.00 END, 15.00)), 0), {now}
+    FROM (SELECT ({now} - due_date) / 86400 AS days FROM borrow_records
+          WHERE patron_id = {patron} AND return_date IS NULL AND due_date <= {now} - 86400)
+'''
+
+def rebuild_patron_stats(conn, now: int):
+    """Recompute every patron_stats row from borrow_records, pricing fees at `now`."""
+    conn.execute('DELETE FROM patron_stats')
+    conn.execute('''
+        INSERT INTO patron_stats (patron_id, open_loans)
+        SELECT patron_id, COUNT(*) FROM borrow_records WHERE return_date IS NULL GROUP BY patron_id
+    ''')
+    conn.execute(
+        'UPDATE patron_stats SET (overdue_loans, outstanding_fees, fees_as_of) = (%s)'
+        % _PATRON_FEES.format(now=':now', patron='patron_stats.patron_id'),
+        {'now': now}
+    )
+
+@migration(9, 'per-patron loan counters')
+def _patron_stats(conn):
+    # open_loans is kept exact by the triggers below. overdue_loans and
+    # outstanding_fees grow with time, so they are a snapshot priced at
+    # fees_as_of, refreshed whenever the patron's open loans change.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patron_stats (
+            patron_id TEXT PRIMARY KEY,
+            open_loans INTEGER NOT NULL DEFAULT 0,
+            overdue_loans INTEGER NOT NULL DEFAULT 0,
+            outstanding_fees REAL NOT NULL DEFAULT 0,
+            fees_as_of INTEGER
+        ) WITHOUT ROWID
+    ''')
+
+    now = "CAST(strftime('%s', 'now') AS INTEGER)"
+    refresh_fees = ('UPDATE patron_stats SET (overdue_loans, outstanding_fees, fees_as_of) = (%s) '
+                    'WHERE patron_id = {patron}' % _PATRON_FEES)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patron_stats_loan_insert AFTER INSERT ON borrow_records
+        WHEN new.return_date IS NULL BEGIN
+            INSERT INTO patron_stats (patron_id, open_loans) VALUES (new.patron_id, 1)
+            ON CONFLICT (patron_id) DO UPDATE SET open_loans = open_loans + 1;
+            -- Back-dated loans can be overdue from the start
+            {refresh_fees.format(now=now, patron='new.patron_id')}
+              AND new.due_date <= {now} - 86400;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patron_stats_loan_return AFTER UPDATE OF return_date ON borrow_records
+        WHEN (old.return_date IS NULL) <> (new.return_date IS NULL) BEGIN
+            UPDATE patron_stats
+            SET open_loans = open_loans + CASE WHEN new.return_date IS NULL THEN 1 ELSE -1 END
+            WHERE patron_id = old.patron_id;
+            {refresh_fees.format(now=now, patron='old.patron_id')};
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patron_stats_loan_delete AFTER DELETE ON borrow_records
+        WHEN old.return_date IS NULL BEGIN
+            UPDATE patron_stats SET open_loans = open_loans - 1 WHERE patron_id = old.patron_id;
+            {refresh_fees.format(now=now, patron='old.patron_id')};
+        END
+    ''')
+    rebuild_patron_stats(conn, int(datetime.now().timestamp()))
+
+@migration(10, 'catalog change counter')
+def _book_changes(conn):
+    # Each book's latest change number: every insert, update or delete stamps
+    # the book with MAX(change_seq) + 1, so a cached copy of the catalog
+    # (catalog_snapshot.py) can re-read only the books changed since it was
+    # built. One row per book, so the table never grows past the catalog.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_changes (
+            book_id INTEGER PRIMARY KEY,
+            change_seq INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_book_changes_seq ON book_changes (change_seq)')
+
+    stamp = '''
+        INSERT INTO book_changes (book_id, change_seq)
+        VALUES ({book}, (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM book_changes))
+        ON CONFLICT (book_id) DO UPDATE SET change_seq = excluded.change_seq;
+    '''
+    # Bulk loads stamp their whole batch at once, like the search index (migration 8)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS book_changes_insert AFTER INSERT ON books
+        WHEN (SELECT value FROM catalog_meta WHERE key = 'fts_deferred') IS NOT 1 BEGIN
+            {stamp.format(book='new.id')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS book_changes_update AFTER UPDATE ON books BEGIN
+            {stamp.format(book='new.id')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS book_changes_delete AFTER DELETE ON books BEGIN
+            {stamp.format(book='old.id')}
+        END
+    ''')
+
+def _isbn_key_sql(column: str) -> str:
+    """
+    SELECT yielding the normalized ISBN key of `column` (see isbn.normalize_isbn),
+    or no row if it is not a valid ISBN-10 or ISBN-13.
+    """
+    digit = lambda n: f'CAST(substr(d, {n}, 1) AS INTEGER)'
+    isbn13_sum = ' + '.join(f'{3 if n % 2 == 0 else 1} * {digit(n)}' for n in range(1, 13))
+    isbn10_sum = ' + '.join(f'{11 - n} * {digit(n)}' for n in range(1, 10))
+    # 978 followed by the first nine ISBN-10 digits, at ISBN-13 positions 4-12
+    converted_sum = '38 + ' + ' + '.join(f'{3 if n % 2 else 1} * {digit(n)}' for n in range(1, 10))
+    return f'''
+        SELECT isbn_key FROM (SELECT CASE
+            WHEN length(d) = 13 AND d GLOB '{'[0-9]' * 13}'
+                 AND (10 - ({isbn13_sum}) % 10) % 10 = {digit(13)}
+            THEN d
+            WHEN length(d) = 10 AND d GLOB '{'[0-9]' * 9}[0-9X]'
+                 AND ({isbn10_sum} + CASE substr(d, 10, 1) WHEN 'X' THEN 10 ELSE {digit(10)} END) % 11 = 0
+            THEN '978' || substr(d, 1, 9) || ((10 - ({converted_sum}) % 10) % 10)
+        END AS isbn_key FROM (SELECT replace(replace(upper(trim({column})), '-', ''), ' ', '') AS d))
+        WHERE isbn_key IS NOT NULL
+    '''
+
+@migration(11, 'normalized ISBN keys')
+def _isbn_keys(conn):
+    # One row per book with a valid ISBN, keyed by its normalized ISBN-13, so
+    # '0-306-40615-2' finds the book stored as '9780306406157' and ISBN
+    # prefixes are index range scans. ISBNs failing the checksum have no row
+    # and are only matched exactly on books.isbn. Bulk loads add their keys
+    # in one go, as for the search index (migration 8).
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_isbn_keys (
+            isbn_key TEXT PRIMARY KEY,
+            book_id INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_book_isbn_keys_book ON book_isbn_keys (book_id)')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS book_isbn_keys_insert AFTER INSERT ON books
+        WHEN (SELECT value FROM catalog_meta WHERE key = 'fts_deferred') IS NOT 1 BEGIN
+            INSERT INTO book_isbn_keys (isbn_key, book_id) SELECT isbn_key, new.id FROM ({_isbn_key_sql('new.isbn')});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS book_isbn_keys_update AFTER UPDATE OF isbn ON books BEGIN
+            DELETE FROM book_isbn_keys WHERE book_id = old.id;
+            INSERT INTO book_isbn_keys (isbn_key, book_id) SELECT isbn_key, new.id FROM ({_isbn_key_sql('new.isbn')});
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS book_isbn_keys_delete AFTER DELETE ON books BEGIN
+            DELETE FROM book_isbn_keys WHERE book_id = old.id;
+        END
+    ''')
+    # Books sharing a normalized ISBN keep the key on the oldest one
+    conn.execute(f'''
+        INSERT OR IGNORE INTO book_isbn_keys (isbn_key, book_id)
+        SELECT (SELECT isbn_key FROM ({_isbn_key_sql('books.isbn')})) AS isbn_key, id FROM books
+        WHERE isbn_key IS NOT NULL ORDER BY id
+    ''')
+
+@migration(12, 'borrow and return date indexes')
+def _loan_date_indexes(conn):
+    # Range scans for incremental exports of the loans borrowed or returned
+    # since a time; open loans have no return date, so leave them out
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_borrow_records_borrow_date ON borrow_records (borrow_date)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_return_date
+        ON borrow_records (return_date) WHERE return_date IS NOT NULL
+    ''')
@@ -1,15 +1,20 @@
 """
 Routes Package - Initialize all route blueprints
-"""
 
-from .catalog_routes import catalog_bp
-from .borrowing_routes import borrowing_bp
-from .search_routes import search_bp
-from .api_routes import api_bp
+Blueprint modules (and the services they use) are imported when an app
+registers them, so importing the package stays cheap for CLI jobs and tests.
+"""
 
 def register_blueprints(app):
     """Register all route blueprints with the Flask app."""
+    from .catalog_routes import catalog_bp
+    from .borrowing_routes import borrowing_bp
+    from .search_routes import search_bp
+    from .api_routes import api_bp
+    from .metrics_routes import metrics_bp
+
     app.register_blueprint(catalog_bp)
     app.register_blueprint(borrowing_bp)
     app.register_blueprint(search_bp)
     app.register_blueprint(api_bp)
+    app.register_blueprint(metrics_bp)
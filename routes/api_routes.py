@@ -2,11 +2,33 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from flask import Blueprint, jsonify, request, url_for
+from database import get_books_page, get_book_count, get_book_cache, get_search_cache, iter_all_books
+from services.library_service import (
+    borrow_books_by_patron, calculate_late_fee_for_book, iter_search_books_in_catalog, lookup_books_by_isbn,
+    return_books_by_patron
+)
+from services.catalog_import import FORMATS, import_books, records_from_upload
+from services.export import MIMETYPES, export_chunks, export_filename, gzip_chunks, parse_since
+from services.job_queue import enqueue_late_fee_payment, enqueue_refund, get_job_status
+from .streaming import download_response, json_list_response, ndjson_response, wants_ndjson
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Default and maximum number of results returned by /api/search
+SEARCH_DEFAULT_LIMIT = 100
+SEARCH_MAX_LIMIT = 1000
+
+# Default and maximum page size for /api/books
+BOOKS_DEFAULT_LIMIT = 100
+BOOKS_MAX_LIMIT = 1000
+
+# Most books accepted by one /api/borrow or /api/return request
+BULK_MAX_BOOKS = 50
+
+# Most ISBNs resolved by one /api/isbns request
+ISBN_BATCH_MAX = 500
+
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
 def get_late_fee(patron_id, book_id):
     """
@@ -21,19 +43,190 @@ def search_books_api():
     """
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
+
+    Results are streamed as they are read, and every match is returned
+    unless ?limit or ?offset asks for a page (SEARCH_DEFAULT_LIMIT results
+    by default, at most SEARCH_MAX_LIMIT). With ?format=ndjson (or Accept:
+    application/x-ndjson) they are sent one book per line, and the limit is
+    not capped.
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    offset = max(request.args.get('offset', 0, type=int), 0)
     
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
-    
-    return jsonify({
+    if wants_ndjson():
+        limit = request.args.get('limit', type=int)
+        return ndjson_response(iter_search_books_in_catalog(search_term, search_type,
+                                                            max(limit, 1) if limit else None, offset))
+
+    limit = None
+    if 'limit' in request.args or 'offset' in request.args:
+        limit = min(max(request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+    books = iter_search_books_in_catalog(search_term, search_type, limit, offset)
+    return json_list_response({
         'search_term': search_term,
         'search_type': search_type,
-        'results': books,
-        'count': len(books)
+        'limit': limit,
+        'offset': offset
+    }, 'results', books)
+
+@api_bp.route('/books')
+def list_books_api():
+    """
+    List the catalog as JSON, one keyset-paginated page per request.
+    Follow 'next' until it is null to walk the whole catalog.
+    With ?format=ndjson the whole catalog is streamed, one book per line.
+    """
+    if wants_ndjson():
+        return ndjson_response(iter_all_books())
+
+    cursor = request.args.get('cursor')
+    limit = min(max(request.args.get('limit', BOOKS_DEFAULT_LIMIT, type=int), 1), BOOKS_MAX_LIMIT)
+    books, next_cursor = get_books_page(cursor, limit)
+
+    return jsonify({
+        'books': books,
+        'count': len(books),
+        'total': get_book_count(),
+        'next_cursor': next_cursor,
+        'next': url_for('api.list_books_api', cursor=next_cursor, limit=limit) if next_cursor else None
+    })
+
+@api_bp.route('/borrow', methods=['POST'])
+def borrow_books_api():
+    """
+    Borrow several books at once (self-service kiosk checkout).
+    Body: {"patron_id": "123456", "book_ids": [1, 2, 3]}
+    """
+    return _bulk_loan_response(borrow_books_by_patron)
+
+@api_bp.route('/return', methods=['POST'])
+def return_books_api():
+    """
+    Return several books at once (self-service kiosk return).
+    Body: {"patron_id": "123456", "book_ids": [1, 2, 3]}
+    """
+    return _bulk_loan_response(return_books_by_patron)
+
+def _bulk_loan_response(process):
+    data = request.get_json(silent=True) or {}
+    book_ids = data.get('book_ids')
+    if (not isinstance(book_ids, list) or not book_ids
+            or not all(isinstance(book_id, int) and not isinstance(book_id, bool) for book_id in book_ids)):
+        return jsonify({'error': 'book_ids must be a non-empty list of integers'}), 400
+    if len(book_ids) > BULK_MAX_BOOKS:
+        return jsonify({'error': f'At most {BULK_MAX_BOOKS} books per request'}), 400
+
+    success, message, results = process(str(data.get('patron_id', '')), book_ids)
+    if not results:
+        # Rejected before any book was looked at: bad patron ID or a database failure
+        return jsonify({'success': False, 'message': message, 'results': []}), 500 if 'Database error' in message else 400
+    return jsonify({'success': success, 'message': message, 'results': results})
+
+@api_bp.route('/isbns', methods=['POST'])
+def lookup_isbns_api():
+    """
+    Resolve a batch of barcode scans in one query.
+    Body: {"isbns": ["9780743273565", "0-451-52493-4"]}
+    """
+    data = request.get_json(silent=True) or {}
+    isbns = data.get('isbns')
+    if not isinstance(isbns, list) or not isbns or not all(isinstance(isbn, str) for isbn in isbns):
+        return jsonify({'error': 'isbns must be a non-empty list of strings'}), 400
+    if len(isbns) > ISBN_BATCH_MAX:
+        return jsonify({'error': f'At most {ISBN_BATCH_MAX} ISBNs per request'}), 400
+    return jsonify({'results': lookup_books_by_isbn(isbns)})
+
+@api_bp.route('/import', methods=['POST'])
+def import_books_api():
+    """
+    Bulk-import books from the request body (?format=csv, jsonl or marc).
+    Pass ?checkpoint=<name> to resume an upload that failed part way through.
+    A body that cannot be decoded or parsed gets a 400 with the report of
+    the rows committed before it.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(FORMATS)}"}), 400
+
+    records = records_from_upload(request.stream, fmt)
+    report = import_books(records, checkpoint=request.args.get('checkpoint') or None)
+    return jsonify(report.to_dict()), 400 if report.error else 200
+
+@api_bp.route('/export/<table>')
+def export_api(table):
+    """
+    Stream the books or borrow_records table as a file download.
+
+    ?format=csv (default), ndjson or columnar; ?gzip=1 compresses it on the
+    fly; ?since=<Unix time or ISO 8601 date> exports only the loans
+    borrowed or returned since then.
+    """
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        since = parse_since(request.args['since']) if request.args.get('since') else None
+        chunks = export_chunks(table, fmt, since)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    mimetype = MIMETYPES[fmt]
+    if compress:
+        chunks, mimetype = gzip_chunks(chunks), 'application/gzip'
+    return download_response(chunks, mimetype, export_filename(table, fmt, compress))
+
+@api_bp.route('/cache')
+def cache_stats_api():
+    """Hit, miss and eviction counters for the in-process caches."""
+    search_cache = get_search_cache()
+    return jsonify({
+        'books': get_book_cache().stats(),
+        'search': search_cache.stats() if search_cache is not None else None,
     })
+
+@api_bp.route('/payments', methods=['POST'])
+def queue_payment_api():
+    """
+    Queue payment of the late fees on a book.
+    Returns 202 with the job to poll at /api/jobs/<job_id>.
+    """
+    data = request.get_json(silent=True) or {}
+    book_id = data.get('book_id')
+    if not isinstance(book_id, int):
+        return jsonify({'error': 'book_id must be an integer'}), 400
+
+    success, message, job_id = enqueue_late_fee_payment(str(data.get('patron_id', '')), book_id)
+    return _queued_job_response(success, message, job_id)
+
+@api_bp.route('/refunds', methods=['POST'])
+def queue_refund_api():
+    """
+    Queue a refund of a late fee payment.
+    Returns 202 with the job to poll at /api/jobs/<job_id>.
+    """
+    data = request.get_json(silent=True) or {}
+    amount = data.get('amount')
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        return jsonify({'error': 'amount must be a number'}), 400
+
+    success, message, job_id = enqueue_refund(str(data.get('transaction_id', '')), float(amount))
+    return _queued_job_response(success, message, job_id)
+
+@api_bp.route('/jobs/<int:job_id>')
+def get_job_api(job_id):
+    """Report the status and, once finished, the result of a queued job."""
+    job = get_job_status(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+def _queued_job_response(success, message, job_id):
+    if not success and job_id is not None:
+        # The job awaiting reconciliation blocks a new submission
+        return jsonify({'error': message, 'job_id': job_id}), 409
+    if not success:
+        return jsonify({'error': message}), 400
+    status_url = url_for('api.get_job_api', job_id=job_id)
+    return jsonify({'job_id': job_id, 'message': message, 'status_url': status_url}), 202, {'Location': status_url}
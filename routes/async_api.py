@@ -0,0 +1,262 @@
+"""
+Async API - ASGI application with asyncio versions of the read-only API endpoints
+/api/late_fee and /api/search are served on the event loop, with their
+library_service calls awaited through async_database. Every other request,
+including NDJSON searches, is handed to the Flask app, so one ASGI server
+serves the whole site.
+"""
+
+import asyncio
+import io
+import logging
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.http import parse_accept_header
+
+from async_database import run_in_db_thread
+from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from .api_routes import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+from .streaming import NDJSON_MIMETYPE
+
+logger = logging.getLogger(__name__)
+
+# Threads serving requests passed on to the WSGI app. A streamed response
+# holds its thread until the client has read it, so these are kept apart
+# from the database pool that the async routes wait on.
+WSGI_THREADS = 32
+
+# A handler gets the query args and request headers (lower-case names) plus
+# the path parameters, and returns (status, JSON body), or None to let the
+# Flask app answer instead
+Handler = Callable[..., Awaitable[Optional[Tuple[int, Dict]]]]
+
+async def late_fee(args: Dict[str, str], headers: Dict[str, str], patron_id: str, book_id: str):
+    """Async version of GET /api/late_fee/<patron_id>/<book_id>."""
+    result = await run_in_db_thread(calculate_late_fee_for_book, patron_id, int(book_id))
+    return 501 if 'not implemented' in result.get('status', '') else 200, result
+
+async def search(args: Dict[str, str], headers: Dict[str, str]):
+    """Async version of GET /api/search; NDJSON is left to the streaming Flask route."""
+    accept = parse_accept_header(headers.get('accept'), MIMEAccept)
+    if args.get('format') == 'ndjson' or accept.best == NDJSON_MIMETYPE:
+        return None
+
+    search_term = args.get('q', '').strip()
+    search_type = args.get('type', 'title')
+    offset = max(_int_arg(args, 'offset', 0), 0)
+    if not search_term:
+        return 400, {'error': 'Search term is required'}
+
+    limit = None
+    if 'limit' in args or 'offset' in args:
+        limit = min(max(_int_arg(args, 'limit', SEARCH_DEFAULT_LIMIT), 1), SEARCH_MAX_LIMIT)
+    books = await run_in_db_thread(search_books_in_catalog, search_term, search_type, limit, offset)
+    return 200, {
+        'search_term': search_term,
+        'search_type': search_type,
+        'limit': limit,
+        'offset': offset,
+        'results': books,
+        'count': len(books),
+    }
+
+def _int_arg(args: Dict[str, str], name: str, default: int) -> int:
+    # Same leniency as request.args.get(name, default, type=int)
+    try:
+        return int(args[name])
+    except (KeyError, ValueError):
+        return default
+
+ROUTES: List[Tuple[Pattern, Handler]] = [
+    (re.compile(r'/api/late_fee/(?P<patron_id>[^/]+)/(?P<book_id>\d+)'), late_fee),
+    (re.compile(r'/api/search'), search),
+]
+
+
+class AsyncAPI:
+    """
+    ASGI application serving ROUTES on the event loop and everything else
+    through a WSGI app.
+
+    A WSGI request runs on one of `wsgi_threads` threads of its own from
+    start to finish (pooled connections and Flask contexts are per thread).
+    The request body is received from the event loop as the app reads it,
+    and the response body is passed back chunk by chunk, so uploads and
+    downloads both stay streamed. Slow downloads therefore cannot starve the
+    async routes of database threads.
+    """
+
+    def __init__(self, wsgi_app, routes: List[Tuple[Pattern, Handler]] = ROUTES, wsgi_threads: int = WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.routes = routes
+        self._wsgi_executor = ThreadPoolExecutor(max_workers=wsgi_threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        if scope['method'] in ('GET', 'HEAD'):
+            for pattern, handler in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match is None:
+                    continue
+                if await self._handle(handler, match.groupdict(), scope, send):
+                    return
+                break
+        await self._call_wsgi(scope, receive, send)
+
+    async def _handle(self, handler: Handler, params: Dict[str, str], scope, send) -> bool:
+        args: Dict[str, str] = {}
+        for key, value in parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True):
+            args.setdefault(key, value)
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        try:
+            result = await handler(args, headers, **params)
+        except Exception:
+            logger.exception('Error handling %s', scope['path'])
+            result = 500, {'error': 'Internal Server Error'}
+        if result is None:
+            return False
+
+        status, payload = result
+        body = (self.wsgi_app.json.dumps(payload, separators=(',', ':')) + '\n').encode()
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+        return True
+
+    async def _call_wsgi(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        # Small bound so a slow client holds back the producing thread
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=4)
+        response: Dict = {}
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        def run_wsgi():
+            try:
+                body = io.BufferedReader(_RequestBody(receive, loop))
+                result = self.wsgi_app(_wsgi_environ(scope, body), start_response)
+                try:
+                    for chunk in result:
+                        if chunk:
+                            put(chunk)
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+            finally:
+                put(None)
+
+        producer = loop.run_in_executor(self._wsgi_executor, run_wsgi)
+        started = False
+        try:
+            while True:
+                chunk = await chunks.get()
+                if not started and 'status' in response:
+                    await send({'type': 'http.response.start', 'status': response['status'],
+                                'headers': response['headers']})
+                    started = True
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        except BaseException:
+            # The client went away; keep taking chunks so the thread can finish
+            asyncio.ensure_future(_drain(chunks))
+            raise
+        try:
+            await producer
+        except Exception:
+            logger.exception('Error in WSGI app for %s', scope['path'])
+        if not started:
+            await send({'type': 'http.response.start', 'status': 500, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._wsgi_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def _drain(chunks: asyncio.Queue):
+    while await chunks.get() is not None:
+        pass
+
+class _RequestBody(io.RawIOBase):
+    """
+    wsgi.input for a WSGI thread: reads receive the ASGI request body from
+    the event loop one message at a time, so only the part being parsed is
+    held in memory.
+    """
+
+    def __init__(self, receive, loop: asyncio.AbstractEventLoop):
+        self._receive = receive
+        self._loop = loop
+        self._pending = memoryview(b'')
+        self._more = True
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            self._pending = memoryview(message.get('body', b''))
+            self._more = message.get('more_body', False)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def _wsgi_environ(scope, body: io.BufferedReader) -> Dict:
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # Without a Content-Length the body is read until the client ends it
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
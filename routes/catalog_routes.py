@@ -3,11 +3,14 @@ Catalog Routes - Book catalog related endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
+from database import get_books_page, get_book_count
 from services.library_service import add_book_to_catalog
 
 catalog_bp = Blueprint('catalog', __name__)
 
+# Books shown per catalog page
+CATALOG_PAGE_SIZE = 50
+
 @catalog_bp.route('/')
 def index():
     """Home page redirects to catalog."""
@@ -16,11 +19,14 @@ def index():
 @catalog_bp.route('/catalog')
 def catalog():
     """
-    Display all books in the catalog.
+    Display the catalog one page at a time.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    cursor = request.args.get('cursor')
+    per_page = min(max(request.args.get('per_page', CATALOG_PAGE_SIZE, type=int), 1), 500)
+    books, next_cursor = get_books_page(cursor, per_page)
+    return render_template('catalog.html', books=books, next_cursor=next_cursor,
+                           is_first_page=not cursor, per_page=per_page, total=get_book_count())
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
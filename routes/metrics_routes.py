@@ -0,0 +1,34 @@
+"""
+Metrics Routes - Prometheus scrape endpoint
+"""
+
+from flask import Blueprint, Response
+import metrics
+from database import get_book_cache, get_pool, get_search_cache
+
+metrics_bp = Blueprint('metrics', __name__)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _database_samples():
+    """Pool, book cache and search cache gauges, read at scrape time."""
+    pool = get_pool()
+    yield 'library_db_pool_connections', 'gauge', {}, pool.size
+    yield 'library_db_pool_idle_connections', 'gauge', {}, pool.idle_count
+    stats = get_book_cache().stats()
+    for key in ('hits', 'misses', 'evictions', 'invalidations'):
+        yield 'library_book_cache_events_total', 'counter', {'event': key}, stats[key]
+    search_cache = get_search_cache()
+    if search_cache is not None:
+        stats = search_cache.stats()
+        for key in ('hits', 'misses', 'evictions', 'invalidations'):
+            yield 'library_search_cache_events_total', 'counter', {'event': key}, stats[key]
+        yield 'library_search_cache_entries', 'gauge', {}, stats['size']
+        yield 'library_search_cache_bytes', 'gauge', {}, stats['bytes'] or 0
+
+metrics.REGISTRY.add_collector(_database_samples)
+
+@metrics_bp.route('/metrics')
+def scrape():
+    """Timers, counters and gauges in the Prometheus text format."""
+    return Response(metrics.REGISTRY.render(), content_type=PROMETHEUS_MIMETYPE)
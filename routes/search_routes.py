@@ -7,6 +7,9 @@ from services.library_service import search_books_in_catalog
 
 search_bp = Blueprint('search', __name__)
 
+# Number of results shown per page of /search
+SEARCH_PAGE_SIZE = 50
+
 @search_bp.route('/search')
 def search_books():
     """
@@ -15,14 +18,17 @@ def search_books():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    page = max(request.args.get('page', 1, type=int), 1)
     
     if not search_term:
-        return render_template('search.html', books=[], search_term='', search_type=search_type)
+        return render_template('search.html', books=[], search_term='', search_type=search_type, page=1, has_next=False)
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    # Use business logic function; one extra row tells us whether there is a next page
+    books = search_books_in_catalog(search_term, search_type, SEARCH_PAGE_SIZE + 1, (page - 1) * SEARCH_PAGE_SIZE)
+    has_next = len(books) > SEARCH_PAGE_SIZE
+    books = books[:SEARCH_PAGE_SIZE]
     
     if not books:
         flash('Search functionality is not yet implemented.', 'error')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    return render_template('search.html', books=books, search_term=search_term, search_type=search_type, page=page, has_next=has_next)
@@ -0,0 +1,61 @@
+"""
+Streaming Responses - JSON and NDJSON bodies generated while rows are read
+Used by API endpoints whose results can be too large to build in memory.
+"""
+
+from typing import Dict, Iterable, Iterator
+
+from flask import Response, current_app, request, stream_with_context
+
+# Encoded rows are sent in chunks of about this many bytes
+CHUNK_SIZE = 64 * 1024
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_ndjson() -> bool:
+    """True if the client asked for NDJSON via ?format=ndjson or the Accept header."""
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def ndjson_response(items: Iterable[Dict]) -> Response:
+    """Stream items as newline-delimited JSON, one object per line."""
+    dumps = current_app.json.dumps
+    return _streamed(_chunks(dumps(item) + '\n' for item in items), NDJSON_MIMETYPE)
+
+def json_list_response(fields: Dict, key: str, items: Iterable[Dict], count_key: str = 'count') -> Response:
+    """
+    Stream a JSON object holding `fields`, the items as a list under `key`
+    and, once the items are exhausted, their number under `count_key`.
+    """
+    dumps = current_app.json.dumps
+
+    def body() -> Iterator[str]:
+        head = dumps(fields)
+        yield (head[:-1] + ',' if fields else '{') + dumps(key) + ':['
+        count = 0
+        for item in items:
+            yield (',' if count else '') + dumps(item)
+            count += 1
+        yield f'],{dumps(count_key)}:{count}}}\n'
+
+    return _streamed(_chunks(body()), 'application/json')
+
+def download_response(chunks: Iterable[bytes], mimetype: str, filename: str) -> Response:
+    """Stream already-encoded chunks as a file attachment."""
+    response = _streamed(iter(chunks), mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _chunks(pieces: Iterable[str]) -> Iterator[bytes]:
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+def _streamed(chunks: Iterator[bytes], mimetype: str) -> Response:
+    # The request context (and its pooled connection) stays open until the body is sent
+    return Response(stream_with_context(chunks), mimetype=mimetype)
@@ -0,0 +1,147 @@
+"""
+Async Payment Module - Concurrent access to the payment gateway
+Wraps the blocking PaymentGateway calls so many payments can be in flight at once
+without holding a request thread per payment.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from cache import MISSING, LocalCache
+from services.payment_service import PRE_SUBMIT_ERRORS, PaymentGateway
+
+# Outcomes of calls made with an idempotency key, shared by every client in
+# the process, and the calls still in flight
+IDEMPOTENCY_CACHE_SIZE = 100_000
+IDEMPOTENCY_TTL = 24 * 3600.0
+_completed = LocalCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL)
+_in_flight: Dict[str, concurrent.futures.Future] = {}
+_idempotency_lock = threading.Lock()
+
+
+class AsyncPaymentClient:
+    """
+    asyncio front end for a PaymentGateway.
+
+    Gateway calls run in a dedicated thread pool, at most `max_concurrency` at
+    a time on each event loop. Each attempt is bounded by `timeout` seconds.
+    PaymentGateway takes no idempotency key, and an abandoned attempt keeps
+    running in its thread. For that reason charges and refunds are only
+    retried after PRE_SUBMIT_ERRORS, up to `max_retries` times with
+    exponential backoff; any other error or a timeout is raised at once. A
+    declined payment is an answer, not an error, so it is not retried.
+
+    Calls carrying the same idempotency key are made once per process, by
+    any client: a repeat returns the first call's result, or waits for it
+    if still in flight. Failed calls are not remembered.
+    """
+
+    def __init__(self, gateway: Optional[PaymentGateway] = None, max_concurrency: int = 10,
+                 timeout: float = 5.0, max_retries: int = 3, backoff: float = 0.1):
+        """
+        Args:
+            gateway: gateway to call (a new PaymentGateway by default)
+            max_concurrency: most gateway calls allowed in flight at once
+            timeout: seconds allowed per attempt
+            max_retries: extra attempts after a retryable error or timeout
+            backoff: delay before the first retry, doubled for each further one
+        """
+        self.gateway = gateway or PaymentGateway()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # asyncio primitives belong to one event loop, so each loop gets its own
+        self._semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = (
+            weakref.WeakKeyDictionary())
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='payment')
+
+    async def process_payment(self, patron_id: str, amount: float, description: str = "",
+                              idempotency_key: Optional[str] = None) -> Tuple[bool, str, str]:
+        """
+        Charge a patron through the gateway.
+
+        Returns:
+            tuple: (success: bool, transaction_id: str, message: str), as PaymentGateway.process_payment
+
+        Raises:
+            The error of an attempt that may have reached the gateway, or the
+            last PRE_SUBMIT_ERRORS error once every retry has failed
+        """
+        return await self._once(idempotency_key, PRE_SUBMIT_ERRORS, self.gateway.process_payment,
+                                patron_id=patron_id, amount=amount, description=description)
+
+    async def refund_payment(self, transaction_id: str, amount: float,
+                             idempotency_key: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Refund a previous payment through the gateway.
+
+        Returns:
+            tuple: (success: bool, message: str), as PaymentGateway.refund_payment
+
+        Raises:
+            The error of an attempt that may have reached the gateway, or the
+            last PRE_SUBMIT_ERRORS error once every retry has failed
+        """
+        return await self._once(idempotency_key, PRE_SUBMIT_ERRORS, self.gateway.refund_payment,
+                                transaction_id, amount)
+
+    async def _once(self, idempotency_key, retry_errors, call, *args, **kwargs):
+        if idempotency_key is None:
+            return await self._call_with_retries(retry_errors, call, *args, **kwargs)
+
+        with _idempotency_lock:
+            result = _completed.get(idempotency_key)
+            if result is not MISSING:
+                return result
+            pending = _in_flight.get(idempotency_key)
+            owner = pending is None
+            if owner:
+                pending = _in_flight[idempotency_key] = concurrent.futures.Future()
+        if not owner:
+            # Possibly started on another thread's event loop
+            return await asyncio.shield(asyncio.wrap_future(pending))
+
+        try:
+            result = await self._call_with_retries(retry_errors, call, *args, **kwargs)
+        except BaseException as e:
+            # Failed calls are not remembered, so the key can be tried again later
+            with _idempotency_lock:
+                del _in_flight[idempotency_key]
+            if isinstance(e, asyncio.CancelledError):
+                pending.cancel()
+            else:
+                pending.set_exception(e)
+            raise
+        with _idempotency_lock:
+            _completed.set(idempotency_key, result)
+            del _in_flight[idempotency_key]
+        pending.set_result(result)
+        return result
+
+    async def _call_with_retries(self, retry_errors, call, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    attempt_call = functools.partial(call, *args, **kwargs)
+                    pending = loop.run_in_executor(self._executor, attempt_call)
+                    return await asyncio.wait_for(pending, self.timeout)
+            except retry_errors:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+
+    def close(self):
+        """Shut down the worker threads once no more calls will be made."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,244 @@
+"""
+Catalog Import Module - Bulk loading of books from CSV, JSON Lines or MARC files
+Records are streamed from the source, checked with the R1 rules and inserted
+in large batches, each in one transaction together with a resume checkpoint.
+"""
+
+import csv
+import io
+import json
+import os
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import click
+
+from database import get_import_checkpoint, insert_books, save_import_checkpoint, transaction
+from isbn import normalize_isbn
+from services.library_service import validate_book
+
+IMPORT_BATCH_SIZE = 5000
+
+# Most row errors kept in a report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Raised while reading a source that cannot be parsed any further
+READ_ERRORS = (UnicodeDecodeError, csv.Error)
+
+FORMATS = ('csv', 'jsonl', 'marc')
+
+
+class ImportReport:
+    """
+    Outcome of an import: row counts, the first MAX_REPORTED_ERRORS row errors
+    and, if the source became unreadable part way through, why it stopped.
+    """
+
+    def __init__(self, resumed_from: int = 0):
+        self.resumed_from = resumed_from
+        self.rows = resumed_from
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.error: Optional[str] = None
+
+    def add_error(self, row: int, message: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row, message))
+
+    def to_dict(self) -> Dict:
+        return {
+            'rows': self.rows,
+            'resumed_from': self.resumed_from,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': [{'row': row, 'error': message} for row, message in self.errors],
+            'error': self.error,
+        }
+
+
+def read_csv(stream: IO[str]) -> Iterator[Dict]:
+    """Rows of a CSV file with a title,author,isbn,total_copies header."""
+    return csv.DictReader(stream)
+
+def read_jsonl(stream: IO[str]) -> Iterator[Dict]:
+    """Objects of a JSON Lines file, one book per line. A malformed line yields an error string."""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield f"Invalid JSON: {e}"
+            continue
+        yield record if isinstance(record, dict) else "Each line must be a JSON object."
+
+def read_marc(stream: IO[bytes], default_copies: int = 1) -> Iterator[Dict]:
+    """
+    Books from MARC 21 binary (ISO 2709) records.
+
+    Uses 245 $a$b for the title, 100 $a for the author and the first ISBN
+    in 020 $a. MARC carries no copy count, so every book gets default_copies.
+    """
+    buffer = b''
+    while True:
+        chunk = stream.read(65536)
+        if chunk:
+            buffer += chunk
+        records = buffer.split(b'\x1d')
+        buffer = records.pop()
+        for record in records:
+            if record.strip():
+                yield _marc_book(record, default_copies)
+        if not chunk:
+            break
+    if buffer.strip():
+        yield "Truncated MARC record."
+
+def _marc_book(record: bytes, default_copies: int):
+    try:
+        base = int(record[12:17])
+        directory = record[24:base - 1]
+        fields = {}
+        for start in range(0, len(directory) - 11, 12):
+            entry = directory[start:start + 12]
+            tag = entry[:3].decode()
+            length, offset = int(entry[3:7]), int(entry[7:12])
+            if tag not in fields:
+                fields[tag] = record[base + offset:base + offset + length].rstrip(b'\x1e')
+    except (ValueError, UnicodeDecodeError):
+        return "Malformed MARC record."
+
+    def subfields(tag, codes):
+        parts = fields.get(tag, b'').decode('utf-8', 'replace').split('\x1f')[1:]
+        return ' '.join(part[1:].strip() for part in parts if part[:1] in codes)
+
+    title = subfields('245', 'ab').rstrip(' /:;,.')
+    author = subfields('100', 'a').rstrip(' ,.')
+    isbn = subfields('020', 'a').split(' ')[0].replace('-', '')
+    return {'title': title, 'author': author, 'isbn': isbn, 'total_copies': default_copies}
+
+def open_records(path: str, fmt: Optional[str] = None) -> Tuple[IO, Iterator]:
+    """Open an import file and return (file, records), taking the format from the extension if not given."""
+    fmt = fmt or path.rsplit('.', 1)[-1].lower()
+    if fmt in ('mrc', 'marc'):
+        source = open(path, 'rb')
+        return source, read_marc(source)
+    if fmt in ('json', 'jsonl', 'ndjson'):
+        source = open(path, encoding='utf-8')
+        return source, read_jsonl(source)
+    if fmt == 'csv':
+        source = open(path, encoding='utf-8', newline='')
+        return source, read_csv(source)
+    raise ValueError(f"Unknown import format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+
+
+def import_books(records: Iterable, checkpoint: Optional[str] = None, batch_size: int = IMPORT_BATCH_SIZE,
+                 restart: bool = False) -> ImportReport:
+    """
+    Import books from a stream of records.
+
+    Each record is a dict with title, author, isbn and total_copies, or an
+    error string from the reader. Valid books are inserted batch_size at a
+    time; ISBNs already in the catalog or earlier in the file are counted as
+    duplicates and skipped. If the source cannot be decoded or parsed past
+    some row, the rows before it are committed and the report's error says
+    where reading stopped.
+
+    Args:
+        records: parsed rows, e.g. from read_csv/read_jsonl/read_marc
+        checkpoint: name to save progress under; a later import with the same
+            name skips the rows already committed, unless that import finished,
+            in which case it starts again from the first row
+        batch_size: rows per transaction
+        restart: ignore any saved progress for checkpoint
+
+    Returns:
+        ImportReport; rows are numbered from 1 in source order
+    """
+    resumed_from = 0
+    if checkpoint and not restart:
+        saved = get_import_checkpoint(checkpoint)
+        # A finished import is complete; the file may since have been replaced
+        resumed_from = saved['rows_done'] if saved and not saved['finished'] else 0
+    report = ImportReport(resumed_from)
+
+    seen = set()
+    batch = []
+    try:
+        for row, record in enumerate(records, 1):
+            if row <= resumed_from:
+                continue
+            report.rows = row
+            book, error = _parse_book(record)
+            if error:
+                report.add_error(row, error)
+            elif book[2] in seen:
+                report.duplicates += 1
+            else:
+                seen.add(book[2])
+                batch.append(book)
+            if len(batch) >= batch_size:
+                _commit_batch(batch, report, checkpoint)
+                batch = []
+    except READ_ERRORS as e:
+        report.error = f"Could not read past row {report.rows}: {e}"
+        _commit_batch(batch, report, checkpoint)
+        return report
+    _commit_batch(batch, report, checkpoint, finished=True)
+    return report
+
+def _parse_book(record) -> Tuple[Optional[tuple], Optional[str]]:
+    if isinstance(record, str):
+        return None, record
+    title = str(record.get('title') or '')
+    author = str(record.get('author') or '')
+    isbn = str(record.get('isbn') or '').strip()
+    copies = record.get('total_copies')
+    if isinstance(copies, str) and copies.strip().isdigit():
+        copies = int(copies)
+    error = validate_book(title, author, isbn, copies)
+    if error:
+        return None, error
+    return (title.strip(), author.strip(), normalize_isbn(isbn) or isbn, copies, copies), None
+
+def _commit_batch(batch: List[tuple], report: ImportReport, checkpoint: Optional[str], finished: bool = False):
+    with transaction():
+        inserted = insert_books(batch) if batch else 0
+        if checkpoint:
+            save_import_checkpoint(checkpoint, report.rows, finished)
+    report.inserted += inserted
+    report.duplicates += len(batch) - inserted
+
+
+@click.command('import-books')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Rows per transaction.')
+@click.option('--restart', is_flag=True, help='Start from the first row instead of resuming.')
+def import_books_command(path, fmt, batch_size, restart):
+    """Import books from a CSV, JSON Lines or MARC file, resuming an interrupted import of PATH."""
+    source, records = open_records(path, fmt)
+    with source:
+        report = import_books(records, checkpoint=os.path.abspath(path), batch_size=batch_size, restart=restart)
+    if report.resumed_from:
+        click.echo(f"Resumed after row {report.resumed_from}.")
+    click.echo(f"{report.rows} rows: {report.inserted} inserted, {report.duplicates} duplicates, "
+               f"{report.invalid} invalid.")
+    for row, message in report.errors:
+        click.echo(f"  row {row}: {message}", err=True)
+    if report.error:
+        raise click.ClickException(report.error)
+
+def records_from_upload(stream: IO[bytes], fmt: str) -> Iterator:
+    """Records from an uploaded request body."""
+    if fmt == 'marc':
+        return read_marc(stream)
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'jsonl':
+        return read_jsonl(text)
+    if fmt == 'csv':
+        return read_csv(text)
+    raise ValueError(f"Unknown import format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
@@ -0,0 +1,121 @@
+"""
+Export Module - Streaming extracts of the books and borrow_records tables
+Rows are read from one SQLite cursor a batch at a time and encoded as CSV,
+NDJSON or columnar NDJSON as they arrive, optionally gzip-compressed on the
+fly, so memory stays flat however large the table is. Loans can be exported
+incrementally: only those borrowed or returned since a given time. Dates
+are exported as stored, in Unix seconds.
+"""
+
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+import click
+
+from database import EXPORT_COLUMNS, iter_export_batches, to_epoch
+
+# Rows read and encoded together; also the row group size of 'columnar'
+EXPORT_BATCH_SIZE = 5000
+
+# csv: header line then one line per row. ndjson: one object per row.
+# columnar: one object per batch mapping each column to its list of values,
+# like the row groups of a Parquet file, which compresses far better
+FORMATS = ('csv', 'ndjson', 'columnar')
+
+TABLES = tuple(EXPORT_COLUMNS)
+
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson', 'columnar': 'application/x-ndjson'}
+
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'columnar': 'columns.ndjson'}
+
+
+def parse_since(value: str) -> int:
+    """
+    Unix time of a since= value: Unix seconds, or an ISO 8601 date or local
+    date and time such as 2024-05-01 or 2024-05-01T06:00. Raises ValueError.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return to_epoch(datetime.fromisoformat(value))
+
+def export_filename(table: str, fmt: str, compress: bool = False) -> str:
+    return f"{table}.{EXTENSIONS[fmt]}" + ('.gz' if compress else '')
+
+def export_chunks(table: str, fmt: str, since: Optional[int] = None,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Encoded export of table, one chunk per batch of rows. The table and
+    format are checked before any row is read; unknown ones raise ValueError.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown table '{table}'. Use one of: {', '.join(TABLES)}.")
+    if since is not None and table != 'borrow_records':
+        raise ValueError("since= only applies to borrow_records; books are always exported in full.")
+    encode = {'csv': _csv_batches, 'ndjson': _ndjson_batches, 'columnar': _columnar_batches}[fmt]
+    return encode(EXPORT_COLUMNS[table], iter_export_batches(table, since, batch_size))
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a stream of chunks into one gzip member as they are produced."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def _csv_batches(columns: tuple, batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header of an empty export
+        yield buffer.getvalue().encode()
+
+def _ndjson_batches(columns: tuple, batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for rows in batches:
+        yield ''.join(dumps(dict(zip(columns, row))) + '\n' for row in rows).encode()
+
+def _columnar_batches(columns: tuple, batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for rows in batches:
+        yield (dumps(dict(zip(columns, map(list, zip(*rows))))) + '\n').encode()
+
+
+@click.command('export')
+@click.argument('table', type=click.Choice(TABLES))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('--since', help='Only loans borrowed or returned since this Unix time or ISO 8601 date.')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True),
+              help='File to write instead of standard output.')
+def export_command(table, fmt, since, compress, output):
+    """Stream TABLE (books or borrow_records) as CSV, NDJSON or columnar NDJSON."""
+    try:
+        chunks = export_chunks(table, fmt, parse_since(since) if since else None)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    if compress:
+        chunks = gzip_chunks(chunks)
+    stream = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+        else:
+            stream.flush()
@@ -0,0 +1,283 @@
+"""
+Job Queue Module - Durable background jobs for slow gateway work
+Payment and refund requests are stored in the jobs table and run by a pool of
+worker threads, so the HTTP request that asks for them can return at once.
+
+Delivery is at least once: a job is leased to one worker at a time, and a
+lease that runs out (the worker died or hung) puts the job back in the queue.
+Jobs with the same dedup key are stored once, so a retried request does not
+charge or refund twice. A job is only run again after a gateway error that
+proves the request never reached the gateway; after any other error, a
+timeout included, the charge or refund may have gone through, so the job is
+set aside as 'reconcile' for someone to check against the gateway.
+"""
+
+import threading
+import traceback
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from database import (
+    claim_job, enqueue_job, finish_job, get_job, get_patron_borrowed_books, record_job_result,
+    requeue_expired_jobs, retry_job
+)
+from services.library_service import pay_late_fees, refund_late_fee_payment
+
+if TYPE_CHECKING:
+    from services.payment_service import PaymentGateway
+
+PAY_LATE_FEES = 'pay_late_fees'
+REFUND_LATE_FEE = 'refund_late_fee_payment'
+
+# Handlers take (payload, gateway) and return a JSON-serializable result dict.
+# Raising means "try again later". A result with success False marks the job
+# failed; submitting the same work again then queues it anew. A result with
+# reconcile True marks it 'reconcile': it is neither retried nor resubmitted.
+JOB_HANDLERS: Dict[str, Callable[[Dict, Optional['PaymentGateway']], Dict]] = {}
+
+_running = threading.local()
+
+def current_job() -> Optional[Dict]:
+    """The job the calling worker thread is running (with its attempts and saved result), if any."""
+    return getattr(_running, 'job', None)
+
+def job_handler(kind: str):
+    """Register a function as the handler for a job kind."""
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+class _RecordingGateway:
+    """
+    Gateway wrapper that keeps the error a gateway call raised, which
+    library_service only reports as a message, and saves a successful charge
+    on the running job the moment the gateway returns, before anything else
+    can raise, so a retry of the job reports that charge instead of making
+    another.
+    """
+
+    def __init__(self, gateway: Optional['PaymentGateway'], job: Optional[Dict]):
+        if gateway is None:
+            from services.payment_service import PaymentGateway
+            gateway = PaymentGateway()
+        self.gateway = gateway
+        self.job = job
+        self.error: Optional[Exception] = None
+
+    def process_payment(self, patron_id: str, amount: float, description: str = ""):
+        try:
+            success, transaction_id, message = self.gateway.process_payment(
+                patron_id=patron_id, amount=amount, description=description)
+        except Exception as e:
+            self.error = e
+            raise
+        if success and self.job is not None:
+            record_job_result(self.job['id'], self.job['attempts'], {
+                'success': True, 'message': f"Payment successful! {message}", 'transaction_id': transaction_id
+            })
+        return success, transaction_id, message
+
+    def refund_payment(self, transaction_id: str, amount: float):
+        try:
+            return self.gateway.refund_payment(transaction_id, amount)
+        except Exception as e:
+            self.error = e
+            raise
+
+def _gateway_error_result(gateway: _RecordingGateway, result: Dict) -> Dict:
+    """
+    Raise to retry the job if the gateway call failed before it was sent;
+    otherwise the outcome is unknown and the job is set aside for reconciliation.
+    """
+    from services.payment_service import PRE_SUBMIT_ERRORS
+    if isinstance(gateway.error, PRE_SUBMIT_ERRORS):
+        raise RuntimeError(result['message']) from gateway.error
+    return {**result, 'reconcile': True}
+
+@job_handler(PAY_LATE_FEES)
+def _run_late_fee_payment(payload: Dict, gateway: Optional['PaymentGateway']) -> Dict:
+    job = current_job()
+    if job is not None and job['result'] and job['result'].get('transaction_id'):
+        # An earlier attempt was charged but did not finish
+        return job['result']
+    gateway = _RecordingGateway(gateway, job)
+    success, message, transaction_id = pay_late_fees(payload['patron_id'], payload['book_id'], gateway)
+    result = {'success': success, 'message': message, 'transaction_id': transaction_id}
+    if message.startswith("Payment processing error"):
+        return _gateway_error_result(gateway, result)
+    return result
+
+@job_handler(REFUND_LATE_FEE)
+def _run_refund(payload: Dict, gateway: Optional['PaymentGateway']) -> Dict:
+    gateway = _RecordingGateway(gateway, None)
+    success, message = refund_late_fee_payment(payload['transaction_id'], payload['amount'], gateway)
+    result = {'success': success, 'message': message}
+    if message.startswith("Refund processing error"):
+        return _gateway_error_result(gateway, result)
+    return result
+
+def enqueue_late_fee_payment(patron_id: str, book_id: int) -> Tuple[bool, str, Optional[int]]:
+    """
+    Queue payment of the late fees on one book.
+
+    Jobs are deduplicated per loan (the open loan's due date), so paying the
+    fee on one loan does not block paying a later loan of the same book.
+
+    Returns:
+        tuple: (success: bool, message: str, job_id: Optional[int])
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+
+    loan = next((book for book in get_patron_borrowed_books(patron_id) if book['book_id'] == book_id), None)
+    due_date = loan['due_date'].isoformat() if loan else 'no-loan'
+    job_id, created = enqueue_job(PAY_LATE_FEES, {'patron_id': patron_id, 'book_id': book_id},
+                                  dedup_key=f"{PAY_LATE_FEES}:{patron_id}:{book_id}:{due_date}")
+    if created:
+        return True, "Payment queued.", job_id
+    if get_job(job_id)['status'] == 'reconcile':
+        return False, "An earlier payment attempt may have reached the gateway; reconcile it first.", job_id
+    return True, "Payment already queued.", job_id
+
+def enqueue_refund(transaction_id: str, amount: float) -> Tuple[bool, str, Optional[int]]:
+    """
+    Queue a refund of a late fee payment. One refund is queued per transaction ID.
+
+    Returns:
+        tuple: (success: bool, message: str, job_id: Optional[int])
+    """
+    if not transaction_id or not transaction_id.startswith("txn_"):
+        return False, "Invalid transaction ID.", None
+
+    if amount <= 0:
+        return False, "Refund amount must be greater than 0.", None
+
+    if amount > 15.00:  # Maximum late fee per book
+        return False, "Refund amount exceeds maximum late fee.", None
+
+    job_id, created = enqueue_job(REFUND_LATE_FEE, {'transaction_id': transaction_id, 'amount': amount},
+                                  dedup_key=f"{REFUND_LATE_FEE}:{transaction_id}")
+    if created:
+        return True, "Refund queued.", job_id
+    if get_job(job_id)['status'] == 'reconcile':
+        return False, "An earlier refund attempt may have reached the gateway; reconcile it first.", job_id
+    return True, "Refund already queued.", job_id
+
+def get_job_status(job_id: int) -> Optional[Dict]:
+    """Get the public view of a job: its kind, status, attempts, result and error."""
+    job = get_job(job_id)
+    if not job:
+        return None
+    return {key: job[key] for key in ('id', 'kind', 'status', 'attempts', 'result', 'error',
+                                      'created_at', 'updated_at')}
+
+
+class JobWorkerPool:
+    """
+    Threads that claim and run queued jobs until stopped.
+
+    A job that raises is retried after `retry_delay` seconds, doubled on each
+    attempt, and marked failed after `max_attempts` attempts. Handlers only
+    raise for gateway errors that prove nothing was sent.
+    """
+
+    def __init__(self, workers: int = 4, lease_seconds: float = 30.0, poll_interval: float = 0.2,
+                 max_attempts: int = 5, retry_delay: float = 1.0,
+                 gateway: Optional['PaymentGateway'] = None):
+        """
+        Args:
+            workers: number of worker threads
+            lease_seconds: how long a job may run before it is handed to another worker
+            poll_interval: seconds an idle worker waits before looking for work again
+            max_attempts: attempts before a job that keeps raising is marked failed
+            retry_delay: delay before the first retry of a job that raised
+            gateway: gateway handed to the handlers (each builds a PaymentGateway if None)
+        """
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.gateway = gateway
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads, first recovering jobs left running by a crashed process."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        requeue_expired_jobs()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop taking new jobs and wait for running ones to finish."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_pending(self) -> int:
+        """Run queued jobs in the calling thread until none are runnable. Returns the number run."""
+        ran = 0
+        while self.run_one():
+            ran += 1
+        return ran
+
+    def run_one(self) -> bool:
+        """Claim and run a single job. Returns False if there was nothing to run."""
+        job = claim_job(self.lease_seconds)
+        if job is None:
+            return False
+
+        attempt = job['attempts']
+        handler = JOB_HANDLERS.get(job['kind'])
+        if handler is None:
+            finish_job(job['id'], attempt, 'failed', error=f"No handler for job kind '{job['kind']}'")
+            return True
+        _running.job = job
+        try:
+            result = handler(job['payload'], self.gateway)
+        except Exception:
+            error = traceback.format_exc(limit=5)
+            if attempt >= self.max_attempts:
+                finish_job(job['id'], attempt, 'failed', error=error)
+            else:
+                retry_job(job['id'], attempt, self.retry_delay * (2 ** (attempt - 1)), error)
+            return True
+        finally:
+            _running.job = None
+        if result.get('reconcile'):
+            status = 'reconcile'
+        else:
+            status = 'done' if result.get('success', True) else 'failed'
+        finish_job(job['id'], attempt, status, result=result)
+        return True
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_one():
+                    continue
+                requeue_expired_jobs()
+            except Exception:
+                # A database hiccup must not kill the worker; try again after the pause
+                traceback.print_exc()
+            self._stopping.wait(self.poll_interval)
+
+
+if __name__ == '__main__':
+    # Run workers as their own process: python -m services.job_queue
+    import time
+    from database import init_database
+    init_database()
+    pool = JobWorkerPool()
+    pool.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -3,14 +3,26 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+import sqlite3
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+import metrics
 from database import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books, get_patron_borrowed_books
+    update_borrow_record_return_date, get_all_books, get_patron_borrowed_books,
+    get_patron_loan_summaries, iter_late_fee_totals, iter_search_books, search_books, transaction,
+    get_books_by_ids, insert_borrow_records, update_books_availability,
+    update_borrow_records_return_date, fuzzy_search_books, get_books_by_isbns, search_books_by_isbn_prefix,
+    cached_search
 )
-from services.payment_service import PaymentGateway
+from fuzzy_search import words
+from isbn import isbn_prefix, normalize_isbn
+
+if TYPE_CHECKING:
+    # Imported where used, so loading the service layer skips asyncio and the gateway client
+    from services.async_payment import AsyncPaymentClient
+    from services.payment_service import PaymentGateway
 
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
@@ -20,30 +32,17 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     Args:
         title: Book title (max 200 chars)
         author: Book author (max 100 chars)
-        isbn: 13-digit ISBN
+        isbn: 13-digit ISBN, or a valid ISBN-10/hyphenated ISBN, stored as its ISBN-13
         total_copies: Number of copies (positive integer)
         
     Returns:
         tuple: (success: bool, message: str)
     """
     # Input validation
-    if not title or not title.strip():
-        return False, "Title is required."
-    
-    if len(title.strip()) > 200:
-        return False, "Title must be less than 200 characters."
-    
-    if not author or not author.strip():
-        return False, "Author is required."
-    
-    if len(author.strip()) > 100:
-        return False, "Author must be less than 100 characters."
-    
-    if len(isbn) != 13:
-        return False, "ISBN must be exactly 13 digits."
-    
-    if not isinstance(total_copies, int) or total_copies <= 0:
-        return False, "Total copies must be a positive integer."
+    error = validate_book(title, author, isbn, total_copies)
+    if error:
+        return False, error
+    isbn = normalize_isbn(isbn) or isbn
     
     # Check for duplicate ISBN
     existing = get_book_by_isbn(isbn)
@@ -57,6 +56,37 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     else:
         return False, "Database error occurred while adding the book."
 
+def validate_book(title: str, author: str, isbn: str, total_copies: int) -> Optional[str]:
+    """
+    Check a new book's fields against the R1 rules.
+    Shared by add_book_to_catalog and the bulk catalog import.
+
+    Returns:
+        The first validation error message, or None if the book is valid
+    """
+    if not title or not title.strip():
+        return "Title is required."
+    
+    if len(title.strip()) > 200:
+        return "Title must be less than 200 characters."
+    
+    if not author or not author.strip():
+        return "Author is required."
+    
+    if len(author.strip()) > 100:
+        return "Author must be less than 100 characters."
+    
+    # 13 plain digits pass even with a bad check digit, so existing catalog
+    # numbers still load; any other form must be an ISBN that normalize_isbn
+    # accepts. (The original rule only checked for 13 characters.)
+    if not (len(isbn) == 13 and isbn.isdigit()) and normalize_isbn(isbn) is None:
+        return "ISBN must be 13 digits, or a valid ISBN-10 or ISBN-13 with or without hyphens."
+    
+    if not isinstance(total_copies, int) or total_copies <= 0:
+        return "Total copies must be a positive integer."
+    
+    return None
+
 def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
@@ -73,33 +103,41 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is available
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found."
-    
-    if book['available_copies'] <= 0:
-        return False, "This book is currently not available."
-    
-    # Check patron's current borrowed books count
-    current_borrowed = get_patron_borrow_count(patron_id)
-    
-    if current_borrowed > 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
-    
-    # Create borrow record
-    borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
-    
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
-        return False, "Database error occurred while creating borrow record."
-    
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
+    # The checks and both writes run as one transaction, so two desks cannot
+    # both take the last copy
+    try:
+        with transaction() as tx:
+            # Check if book exists and is available
+            book = get_book_by_id(book_id)
+            if not book:
+                return False, "Book not found."
+
+            if book['available_copies'] <= 0:
+                return False, "This book is currently not available."
+
+            # Check patron's current borrowed books count
+            current_borrowed = get_patron_borrow_count(patron_id)
+
+            if current_borrowed > 5:
+                return False, "You have reached the maximum borrowing limit of 5 books."
+
+            # Create borrow record
+            borrow_date = datetime.now()
+            due_date = borrow_date + timedelta(days=14)
+
+            # Insert borrow record and update availability
+            borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+            if not borrow_success:
+                tx.rollback()
+                return False, "Database error occurred while creating borrow record."
+
+            availability_success = update_book_availability(book_id, -1)
+            if not availability_success:
+                tx.rollback()
+                return False, "Database error occurred while updating book availability."
+    except sqlite3.Error:
+        return False, "Database error occurred while processing the borrow."
+
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
 def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
@@ -119,37 +157,168 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is borrowed by patron
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found."
-    
-    borrowed_books = get_patron_borrowed_books(patron_id)
-    for item in borrowed_books:
-        if item['book_id']==book_id:
-            break
-    else:
-        return False, "Book not borrowed by patron."
-    
-    # Calculate late fee
-    late_fee = calculate_late_fee_for_book(patron_id, book_id)
-    if "successfully" not in late_fee['status'].lower():
-        return False, late_fee['status']
-    
-    # Update Available Copies
-    return_success = update_book_availability(book_id,1)
-    if not return_success:
-        return False, "Database error occurred while updating book availability."
-    
-    # Record return date
-    return_date = datetime.now()
-    record_success = update_borrow_record_return_date(patron_id,book_id,return_date)
-    if not record_success:
-        return False, "Database error occured while updating book return date."
+    try:
+        with transaction() as tx:
+            # Check if book exists and is borrowed by patron
+            book = get_book_by_id(book_id)
+            if not book:
+                return False, "Book not found."
+
+            borrowed_books = get_patron_borrowed_books(patron_id)
+            for item in borrowed_books:
+                if item['book_id']==book_id:
+                    break
+            else:
+                return False, "Book not borrowed by patron."
+
+            # Calculate late fee
+            late_fee = calculate_late_fee_for_book(patron_id, book_id)
+            if "successfully" not in late_fee['status'].lower():
+                return False, late_fee['status']
+
+            # Update Available Copies
+            return_success = update_book_availability(book_id,1)
+            if not return_success:
+                tx.rollback()
+                return False, "Database error occurred while updating book availability."
+
+            # Record return date
+            return_date = datetime.now()
+            record_success = update_borrow_record_return_date(patron_id,book_id,return_date)
+            if not record_success:
+                tx.rollback()
+                return False, "Database error occured while updating book return date."
+    except sqlite3.Error:
+        return False, "Database error occurred while processing the return."
 
-    
     return True, f'Successfully returned "{book["title"]}" on {return_date.strftime("%Y-%m-%d")}. ${late_fee["fee_amount"]:,.2f} owed in late fees.'
 
+def borrow_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Borrow a stack of books at once, e.g. from a self-service kiosk.
+
+    Each book gets the same outcome borrow_book_by_patron would give if the
+    books were borrowed one after another (a book listed twice is borrowed
+    once), but the books, the patron's loans and the writes are each handled
+    in one statement inside one transaction.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books to borrow
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-book dicts
+        with 'book_id', 'success' and 'message'); success is True only if
+        every book was borrowed
+    """
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+
+    if not book_ids:
+        return False, "No books to borrow.", []
+
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=14)
+    results = [{'book_id': book_id, 'success': False} for book_id in book_ids]
+    try:
+        with transaction() as tx:
+            books = get_books_by_ids(book_ids)
+            current_borrowed = get_patron_loan_summaries([patron_id])[patron_id]['borrow_count']
+
+            borrowing = []
+            for result in results:
+                book = books.get(result['book_id'])
+                if not book:
+                    result['message'] = "Book not found."
+                elif result['book_id'] in borrowing:
+                    result['message'] = "This book is already in this checkout."
+                elif book['available_copies'] <= 0:
+                    result['message'] = "This book is currently not available."
+                elif current_borrowed + len(borrowing) > 5:
+                    result['message'] = "You have reached the maximum borrowing limit of 5 books."
+                else:
+                    borrowing.append(result['book_id'])
+                    result.update(success=True, message=f'Successfully borrowed "{book["title"]}". '
+                                                         f'Due date: {due_date.strftime("%Y-%m-%d")}.')
+
+            if borrowing:
+                if not insert_borrow_records(patron_id, borrowing, borrow_date, due_date):
+                    tx.rollback()
+                    return False, "Database error occurred while creating borrow records.", []
+                if not update_books_availability(borrowing, -1):
+                    tx.rollback()
+                    return False, "Database error occurred while updating book availability.", []
+    except sqlite3.Error:
+        return False, "Database error occurred while processing the borrow.", []
+
+    if len(borrowing) == len(results):
+        return True, f"Borrowed {len(borrowing)} book(s). Due date: {due_date.strftime('%Y-%m-%d')}.", results
+    return False, f"Borrowed {len(borrowing)} of {len(results)} book(s).", results
+
+def return_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Return a stack of books at once, e.g. at a self-service kiosk.
+
+    The patron's loans are read once, each book's late fee is worked out from
+    them, and the returns are written with one statement per table, all in
+    one transaction.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books being returned
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-book dicts
+        with 'book_id', 'success', 'message' and 'fee_amount'); success is
+        True only if every book was returned
+    """
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+
+    if not book_ids:
+        return False, "No books to return.", []
+
+    return_date = datetime.now()
+    results = [{'book_id': book_id, 'success': False, 'fee_amount': 0.00} for book_id in book_ids]
+    try:
+        with transaction() as tx:
+            books = get_books_by_ids(book_ids)
+            loans = {item['book_id']: item
+                     for item in get_patron_loan_summaries([patron_id])[patron_id]['borrowed_books']}
+
+            returning = []
+            for result in results:
+                book = books.get(result['book_id'])
+                if not book:
+                    result['message'] = "Book not found."
+                elif result['book_id'] in returning:
+                    result['message'] = "This book is already in this return."
+                elif result['book_id'] not in loans:
+                    result['message'] = "Book not borrowed by patron."
+                else:
+                    returning.append(result['book_id'])
+                    fee_amount = late_fee_for_loan(loans[result['book_id']]['days_overdue'])['fee_amount']
+                    result.update(success=True, fee_amount=fee_amount,
+                                  message=f'Successfully returned "{book["title"]}" on {return_date.strftime("%Y-%m-%d")}. '
+                                          f'${fee_amount:,.2f} owed in late fees.')
+
+            if returning:
+                if not update_books_availability(returning, 1):
+                    tx.rollback()
+                    return False, "Database error occurred while updating book availability.", []
+                if not update_borrow_records_return_date(patron_id, returning, return_date):
+                    tx.rollback()
+                    return False, "Database error occurred while updating book return dates.", []
+    except sqlite3.Error:
+        return False, "Database error occurred while processing the return.", []
+
+    total_fees = sum(result['fee_amount'] for result in results)
+    if len(returning) == len(results):
+        return True, f"Returned {len(returning)} book(s). ${total_fees:,.2f} owed in late fees.", results
+    return False, f"Returned {len(returning)} of {len(results)} book(s). ${total_fees:,.2f} owed in late fees.", results
+
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     """
     Calculate late fees for a specific book.
@@ -177,8 +346,7 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     borrowed_books = get_patron_borrowed_books(patron_id)
     for item in borrowed_books:
         if item['book_id']==book_id:
-            due_date = item['due_date']
-            overdue_status = item['is_overdue']
+            days_overdue = item['days_overdue']
             break
     else:
         return {
@@ -187,29 +355,68 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
             'status': 'Late fee calculation failed: book not borrowed by patron.'
         }
     
-    fee_amount = 0.00
-    days_overdue = 0
-    # Establish the late fee and days overdue
-    if overdue_status is True:
-        current_date = datetime.now()
-        days_overdue = (current_date - due_date).days
-        if days_overdue <= 7:
-            fee_amount = days_overdue*0.50
-        else:
-            fee_amount = 3.50 + ((days_overdue-7)*1.00)
-        if fee_amount > 15.00:
-            fee_amount = 15.00
+    return late_fee_for_loan(days_overdue)
+
+def late_fee_for_days(days_overdue: int) -> float:
+    """
+    Late fee owed for a loan overdue by the given number of days (R5):
+    $0.50/day for the first 7 days, $1.00/day after that, capped at $15.00.
+    """
+    if days_overdue <= 0:
+        return 0.00
+    if days_overdue <= 7:
+        fee_amount = days_overdue*0.50
+    else:
+        fee_amount = 3.50 + ((days_overdue-7)*1.00)
+    if fee_amount > 15.00:
+        fee_amount = 15.00
+    return fee_amount
+
+def late_fee_for_loan(days_overdue: int) -> Dict:
+    """
+    Build the R5 late fee result for one loan.
+
+    Args:
+        days_overdue: whole days past the due date, as computed by the database layer
 
+    Returns:
+        dict with 'fee_amount', 'days_overdue' and 'status', as calculate_late_fee_for_book
+    """
     return {
-        'fee_amount': fee_amount,
+        'fee_amount': late_fee_for_days(days_overdue),
         'days_overdue': days_overdue,
         'status': 'Late fee calculation completed successfully.'
     }
 
+def assess_late_fees(now: Optional[datetime] = None, batch_size: int = 10000) -> Dict[str, Dict]:
+    """
+    Price every open loan in the system at once, for the nightly fee run.
+
+    Fees are computed inside SQLite over a single streamed query rather than
+    one calculate_late_fee_for_book call per loan, and match it exactly for
+    the same `now`.
+
+    Args:
+        now: time to price loans at (defaults to the current time)
+        batch_size: rows fetched from the cursor at a time
+
+    Returns:
+        dict mapping patron ID to {'total_late_fees': float, 'overdue_books': int},
+        for patrons who owe something
+    """
+    now = now or datetime.now()
+    return {
+        patron_id: {'total_late_fees': total, 'overdue_books': books}
+        for patron_id, total, books in iter_late_fee_totals(now, batch_size)
+    }
+
         
 
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+# Search types accepted by search_books_in_catalog
+SEARCH_TYPES = ('title', 'author', 'fuzzy', 'isbn', 'isbn_prefix')
+
+def search_books_in_catalog(search_term: str, search_type: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
     """
     Search for books in the catalog.
     Implement R6 as per requirements
@@ -217,25 +424,75 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     Args:
         search_term: string for the function to search through the database
         search_type: a string that specifies the type of identifier that the function must search with
+        limit: maximum number of results to return (None for all)
+        offset: number of results to skip, for paging
 
     Returns:
-        List of book structures
+        List of book structures, best matches first for title/author/fuzzy searches
     """
+    if search_type not in SEARCH_TYPES:
+        return []
+    # Popular searches are served from the search cache until the catalog changes
+    key = (search_type, _search_cache_key(search_term, search_type), limit, offset)
+    return cached_search(key, lambda: _search_catalog(search_term, search_type, limit, offset))
+
+def _search_cache_key(search_term: str, search_type: str) -> str:
+    """The term normalized so that spellings giving the same results share a cache entry."""
+    if search_type in ('title', 'author'):
+        # LIKE and the trigram index ignore the case of ASCII letters only
+        return search_term.lower() if search_term.isascii() else search_term
+    if search_type == 'fuzzy':
+        return ' '.join(words(search_term))
+    if search_type == 'isbn':
+        return normalize_isbn(search_term) or search_term
+    return isbn_prefix(search_term) or ''
+
+def _search_catalog(search_term: str, search_type: str, limit: Optional[int], offset: int) -> List[Dict]:
     if (search_type == 'title') or (search_type == 'author'):
-        returnlist = []
-        all_books = get_all_books()
-        for book in all_books:
-            if search_term.lower() in book[search_type].lower():
-                returnlist.append(book)
-        return returnlist
+        if not search_term:
+            return []
+        return search_books(search_term, search_type, limit, offset)
+
+    elif search_type == 'fuzzy':
+        # Title and author words, tolerating a typo or two per word
+        return fuzzy_search_books(search_term, limit, offset)
 
     elif search_type == 'isbn':   
         book = get_book_by_isbn(search_term)
-        if book != None:
+        if book != None and offset == 0:
             return [book]
+
+    elif search_type == 'isbn_prefix':
+        # e.g. '978-0-306' for every book from one publisher
+        return search_books_by_isbn_prefix(search_term, limit, offset)
     
     return []
 
+def lookup_books_by_isbn(isbns: List[str]) -> List[Dict]:
+    """
+    Resolve a batch of scanned or typed ISBNs with one query.
+
+    Args:
+        isbns: ISBN-10s or ISBN-13s, with or without hyphens
+
+    Returns:
+        One dict per ISBN, in the order given, with 'isbn', 'found' and (if found) 'book'
+    """
+    books = get_books_by_isbns(isbns)
+    return [{'isbn': isbn, 'found': True, 'book': books[isbn]} if isbn in books else {'isbn': isbn, 'found': False}
+            for isbn in isbns]
+
+def iter_search_books_in_catalog(search_term: str, search_type: str, limit: Optional[int] = None,
+                                 offset: int = 0) -> Iterator[Dict]:
+    """
+    Like search_books_in_catalog, but yields books as they are read from the
+    database, so large title/author results can be streamed to the client.
+    Searches with a limit are served through the search cache instead.
+    """
+    if search_type in ('title', 'author') and search_term and limit is None:
+        return iter_search_books(search_term, search_type, limit, offset)
+    return iter(search_books_in_catalog(search_term, search_type, limit, offset))
+
 def get_patron_status_report(patron_id: str) -> Dict:
     """
     Get status report for a patron.
@@ -251,19 +508,43 @@ def get_patron_status_report(patron_id: str) -> Dict:
     # Verify patron ID
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return {'status':'Failed! Invalid patron ID.'}
-    
-    returndict = {'borrow_count':0,'borrowed_books':[],'total_late_fees':0.00}
 
-    # Get the borrowed books
-    borrowed_books = get_patron_borrowed_books(patron_id)
+    # Loans, titles and the loan count all come back from one query
+    summary = get_patron_loan_summaries([patron_id])[patron_id]
+    return _build_status_report(summary)
+
+def get_patron_status_reports(patron_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Get status reports for many patrons at once, e.g. for nightly statements.
+    All patrons' loans are fetched in a single query.
 
-    #Assign late fees to books currently and store in a borrowed_books index. Calculate total late fees in the process (This might get a little messy)
+    Args:
+      patron_ids: list of 6-digit library card IDs
+
+    Return:
+        A dictionary mapping each patron ID to its get_patron_status_report result
+    """
+    reports = {}
+    valid_ids = []
+    for patron_id in patron_ids:
+        if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+            reports[patron_id] = {'status':'Failed! Invalid patron ID.'}
+        else:
+            valid_ids.append(patron_id)
+
+    for patron_id, summary in get_patron_loan_summaries(valid_ids).items():
+        reports[patron_id] = _build_status_report(summary)
+    return reports
+
+def _build_status_report(summary: Dict) -> Dict:
+    """Price each open loan in a loan summary and total the fees (R7)."""
+    returndict = {'borrow_count':0,'borrowed_books':[],'total_late_fees':0.00}
+
+    #Assign late fees to books currently and store in a borrowed_books index. Calculate total late fees in the process
     gatherer=[]
     late_fee_tally=0.00
-    for book in borrowed_books:
-        late_fee = calculate_late_fee_for_book(patron_id,book['book_id'])
-        if "successfully" not in late_fee['status'].lower():
-            return {'status':'Failed! Error in late fee calculation.'}
+    for book in summary['borrowed_books']:
+        late_fee = late_fee_for_loan(book['days_overdue'])
         book['late_fee']=late_fee
         late_fee_tally+=late_fee['fee_amount']
         gatherer.append(book)
@@ -271,13 +552,13 @@ def get_patron_status_report(patron_id: str) -> Dict:
     returndict['total_late_fees']=late_fee_tally
 
     # Add the borrow count
-    returndict['borrow_count']=get_patron_borrow_count(patron_id)
+    returndict['borrow_count']=summary['borrow_count']
 
     returndict['status'] = 'Successfully generated patron report!'
 
     return returndict
 
-def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+def pay_late_fees(patron_id: str, book_id: int, payment_gateway: 'PaymentGateway' = None) -> Tuple[bool, str, Optional[str]]:
     """
     Process payment for late fees using external payment gateway.
     
@@ -321,6 +602,7 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     
     # Use provided gateway or create new one
     if payment_gateway is None:
+        from services.payment_service import PaymentGateway
         payment_gateway = PaymentGateway()
     
     # Process payment through external gateway
@@ -342,7 +624,76 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         return False, f"Payment processing error: {str(e)}", None
 
 
-def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
+def pay_all_late_fees(patron_id: str, payment_gateway: 'PaymentGateway' = None,
+                      client: 'AsyncPaymentClient' = None) -> Tuple[bool, str, List[Dict]]:
+    """
+    Pay the late fees on every overdue book a patron has, submitting all the
+    payments to the gateway concurrently instead of one after another.
+
+    Args:
+        patron_id: 6-digit library card ID
+        payment_gateway: Payment gateway instance (injectable for testing)
+        client: AsyncPaymentClient to submit through (built around payment_gateway if omitted)
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-book dicts with
+        'book_id', 'amount', 'success', 'message' and 'transaction_id')
+    """
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", []
+
+    summary = get_patron_loan_summaries([patron_id])[patron_id]
+    owed = []
+    for book in summary['borrowed_books']:
+        fee_amount = late_fee_for_loan(book['days_overdue'])['fee_amount']
+        if fee_amount > 0:
+            owed.append((book, fee_amount))
+
+    if not owed:
+        return False, "No late fees to pay.", []
+
+    import asyncio
+    from services.async_payment import AsyncPaymentClient
+
+    own_client = client is None
+    if own_client:
+        client = AsyncPaymentClient(payment_gateway)
+    try:
+        results = asyncio.run(_submit_late_fee_payments(client, patron_id, owed))
+    finally:
+        if own_client:
+            client.close()
+    paid = sum(1 for result in results if result['success'])
+    if paid == len(results):
+        return True, f"Paid late fees on {paid} book(s).", results
+    return False, f"Paid late fees on {paid} of {len(results)} book(s).", results
+
+async def _submit_late_fee_payments(client: 'AsyncPaymentClient', patron_id: str, owed: List) -> List[Dict]:
+    """Submit one gateway payment per overdue book concurrently and collect the outcomes."""
+    async def pay(book, fee_amount):
+        result = {'book_id': book['book_id'], 'amount': fee_amount, 'success': False, 'transaction_id': None}
+        try:
+            success, transaction_id, message = await client.process_payment(
+                patron_id=patron_id,
+                amount=fee_amount,
+                description=f"Late fees for '{book['title']}'",
+                idempotency_key=f"late_fee:{patron_id}:{book['book_id']}:{book['due_date'].isoformat()}"
+            )
+        except Exception as e:
+            result['message'] = f"Payment processing error: {str(e)}"
+            return result
+        if success:
+            result.update(success=True, transaction_id=transaction_id, message=f"Payment successful! {message}")
+        else:
+            result['message'] = f"Payment failed: {message}"
+        return result
+
+    import asyncio
+    return list(await asyncio.gather(*(pay(book, fee_amount) for book, fee_amount in owed)))
+
+
+def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: 'PaymentGateway' = None) -> Tuple[bool, str]:
     """
     Refund a late fee payment (e.g., if book was returned on time but fees were charged in error).
     
@@ -368,6 +719,7 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     
     # Use provided gateway or create new one
     if payment_gateway is None:
+        from services.payment_service import PaymentGateway
         payment_gateway = PaymentGateway()
     
     # Process refund through external gateway
@@ -381,4 +733,8 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
             return False, f"Refund failed: {message}"
             
     except Exception as e:
-        return False, f"Refund processing error: {str(e)}"
\ No newline at end of file
+        return False, f"Refund processing error: {str(e)}"
+
+
+# Per-function timers for /metrics; a flag check per call while metrics are off
+metrics.instrument_module(__name__, exclude=('late_fee_for_days', 'late_fee_for_loan'))
@@ -0,0 +1,30 @@
+"""
+Patron Stats Module - Maintenance commands for the patron_stats counters
+The counters are kept up to date by triggers on borrow_records; these
+commands verify them and rebuild them after manual edits or restores.
+"""
+
+import click
+
+from database import check_patron_stats, rebuild_patron_stats
+
+
+@click.group('patron-stats')
+def patron_stats_command():
+    """Check or rebuild the per-patron loan counters."""
+
+@patron_stats_command.command('check')
+def check_command():
+    """Report patrons whose open-loan counter disagrees with borrow_records."""
+    mismatches = check_patron_stats()
+    for row in mismatches:
+        click.echo(f"{row['patron_id']}: counter {row['open_loans']}, actual {row['actual']}")
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} patron(s) out of sync; run 'flask patron-stats rebuild'.")
+    click.echo("patron_stats is consistent with borrow_records.")
+
+@patron_stats_command.command('rebuild')
+def rebuild_command():
+    """Recompute every patron's counters and late fees from borrow_records."""
+    patrons = rebuild_patron_stats()
+    click.echo(f"Rebuilt counters for {patrons} patron(s).")
@@ -10,6 +10,11 @@ since we cannot make actual payment API calls during testing.
 from typing import Dict, Tuple
 import time
 
+# Errors that prove a request never reached the gateway, so sending it again
+# cannot charge or refund twice. Anything else, a timeout included, may have
+# been submitted.
+PRE_SUBMIT_ERRORS: Tuple[type, ...] = (ConnectionRefusedError,)
+
 
 class PaymentGateway:
     """
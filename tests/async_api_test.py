@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+import pytest
+import async_database
+from app import create_app
+from database import insert_book, insert_borrow_record
+from routes.async_api import AsyncAPI
+
+@pytest.fixture
+def flask_app(temp_db):
+    for n in range(1, 4):
+        insert_book(f"River Book {n}", "Author", f"{9780000000000 + n}", 2, 2)
+    due = datetime.now() - timedelta(days=3)
+    insert_borrow_record("123456", 1, due - timedelta(days=14), due)
+    return create_app({'DATABASE': temp_db, 'SAMPLE_DATA': False})
+
+async def call(app, method, path, query=b'', headers=(), body=b''):
+    """Run one request through an ASGI app; returns (status, headers, body)."""
+    sent = []
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'headers': list(headers),
+             'root_path': '', 'scheme': 'http', 'server': ('testserver', 80), 'http_version': '1.1'}
+    await app(scope, receive, send)
+    start = sent[0]
+    assert start['type'] == 'http.response.start'
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+def request(app, *args, **kwargs):
+    return asyncio.run(call(app, *args, **kwargs))
+
+def test_late_fee_matches_flask_route(flask_app):
+    app = AsyncAPI(flask_app)
+    status, headers, body = request(app, 'GET', '/api/late_fee/123456/1')
+    expected = flask_app.test_client().get('/api/late_fee/123456/1')
+    assert status == expected.status_code == 200
+    assert headers[b'content-type'] == b'application/json'
+    assert json.loads(body) == expected.get_json()
+    assert json.loads(body)['fee_amount'] == 1.50
+
+def test_search_matches_flask_route(flask_app):
+    app = AsyncAPI(flask_app)
+    status, _, body = request(app, 'GET', '/api/search', b'q=river&type=title&limit=2&offset=x')
+    expected = flask_app.test_client().get('/api/search?q=river&type=title&limit=2&offset=x').get_json()
+    assert status == 200
+    assert json.loads(body) == expected
+    assert request(app, 'GET', '/api/search', b'q=')[0] == 400
+
+def test_other_routes_fall_through_to_flask(flask_app):
+    app = AsyncAPI(flask_app)
+    status, headers, body = request(app, 'GET', '/api/search', b'q=river&format=ndjson')
+    assert status == 200
+    assert headers[b'content-type'] == b'application/x-ndjson'
+    assert len(body.splitlines()) == 3
+
+    status, _, body = request(app, 'POST', '/api/borrow', headers=[(b'content-type', b'application/json')],
+                              body=json.dumps({'patron_id': '654321', 'book_ids': [2]}).encode())
+    assert status == 200
+    assert json.loads(body)['success'] is True
+    assert request(app, 'GET', '/catalog')[0] == 200
+    assert request(app, 'GET', '/no/such/page')[0] == 404
+
+def test_many_requests_in_flight(flask_app):
+    app = AsyncAPI(flask_app)
+
+    async def burst():
+        return await asyncio.gather(*(call(app, 'GET', f'/api/late_fee/123456/{n % 3 + 1}') for n in range(500)))
+
+    results = asyncio.run(burst())
+    assert all(status == 200 for status, _, _ in results)
+    assert sum(json.loads(body)['fee_amount'] for _, _, body in results) == pytest.approx(167 * 1.50)
+
+def test_wsgi_requests_do_not_wait_for_database_threads(flask_app):
+    """A request passed on to Flask is served while every database thread is busy"""
+    app = AsyncAPI(flask_app)
+    async_database.configure_executor(1)
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(async_database.run_in_db_thread(release.wait, 10))
+        try:
+            status, _, _ = await asyncio.wait_for(call(app, 'GET', '/catalog'), 5)
+        finally:
+            release.set()
+        await blocker
+        return status
+
+    try:
+        assert asyncio.run(scenario()) == 200
+    finally:
+        async_database.configure_executor()
+
+def test_upload_is_streamed_to_flask(flask_app):
+    """The request body reaches the WSGI app as it arrives, not read up front"""
+    rows = ''.join(f"Upload {n},Author,{9781000000000 + n},1\n" for n in range(2000)).encode()
+    body = b"title,author,isbn,total_copies\n" + rows
+    chunks = [body[i:i + 4096] for i in range(0, len(body), 4096)]
+    received = []
+
+    async def receive():
+        received.append(len(received))
+        return {'type': 'http.request', 'body': chunks[len(received) - 1],
+                'more_body': len(received) < len(chunks)}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/import', 'query_string': b'format=csv',
+             'headers': [(b'content-type', b'text/csv')], 'root_path': '', 'server': ('testserver', 80)}
+    asyncio.run(AsyncAPI(flask_app)(scope, receive, send))
+    assert sent[0]['status'] == 200
+    assert json.loads(b''.join(m.get('body', b'') for m in sent[1:]))['inserted'] == 2000
+    assert len(received) == len(chunks)
+
+    def read_a_little(environ, start_response):
+        environ['wsgi.input'].read(10)
+        start_response('200 OK', [])
+        return [b'ok']
+
+    received.clear()
+    asyncio.run(AsyncAPI(read_a_little)(scope, receive, send))
+    assert len(received) == 1  # the rest of the body was never pulled
+
+def test_async_database_mirrors_helpers(flask_app):
+    async def lookups():
+        return await asyncio.gather(async_database.get_book_by_id(2), async_database.get_patron_borrow_count("123456"))
+
+    book, borrowed = asyncio.run(lookups())
+    assert book['title'] == "River Book 2"
+    assert borrowed == 1
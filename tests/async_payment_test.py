@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta
+from database import insert_book, insert_borrow_record
+from services.async_payment import AsyncPaymentClient
+from services.library_service import pay_all_late_fees
+
+class FakeGateway:
+    """Local stand-in for PaymentGateway with configurable latency and failures"""
+
+    def __init__(self, latency=0.0, failures=0, hang=0.0, error=ConnectionRefusedError):
+        self.latency = latency
+        self.failures = failures
+        self.hang = hang
+        self.error = error
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def process_payment(self, patron_id, amount, description=""):
+        call = self._attempt()
+        if amount > 1000:
+            return False, "", "Payment declined: amount exceeds limit"
+        return True, f"txn_{patron_id}_{call}", f"Payment of ${amount:.2f} processed successfully"
+
+    def refund_payment(self, transaction_id, amount):
+        self._attempt()
+        return True, f"Refund of ${amount:.2f} processed successfully"
+
+    def _attempt(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.hang if call <= self.failures and self.hang else self.latency)
+            if call <= self.failures and not self.hang:
+                raise self.error("gateway unavailable")
+            return call
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+def test_payments_run_concurrently():
+    """Twenty 0.1s payments finish in far less than two seconds"""
+    gateway = FakeGateway(latency=0.1)
+    client = AsyncPaymentClient(gateway, max_concurrency=20)
+    async def pay_all():
+        return await asyncio.gather(*(client.process_payment("123456", 1.0) for _ in range(20)))
+
+    start = time.perf_counter()
+    results = asyncio.run(pay_all())
+    assert time.perf_counter() - start < 0.6
+    assert all(success for success, _, _ in results)
+
+def test_concurrency_is_bounded():
+    """No more than max_concurrency gateway calls are ever in flight"""
+    gateway = FakeGateway(latency=0.02)
+    client = AsyncPaymentClient(gateway, max_concurrency=3)
+    async def pay_all():
+        await asyncio.gather(*(client.process_payment("123456", 1.0) for _ in range(12)))
+
+    asyncio.run(pay_all())
+    assert gateway.max_in_flight == 3
+
+def test_errors_are_retried_with_backoff():
+    """A charge the gateway refused to connect for is retried until it succeeds"""
+    gateway = FakeGateway(failures=2)
+    client = AsyncPaymentClient(gateway, max_retries=3, backoff=0.01)
+
+    success, txn, message = asyncio.run(client.process_payment("123456", 1.0))
+    assert success is True
+    assert gateway.calls == 3
+
+def test_gives_up_after_max_retries():
+    """The last error is raised once every retry has failed"""
+    gateway = FakeGateway(failures=10)
+    client = AsyncPaymentClient(gateway, max_retries=2, backoff=0.001)
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(client.process_payment("123456", 1.0))
+    assert gateway.calls == 3
+
+def test_charge_that_may_have_been_submitted_is_not_retried():
+    """An error mid-request or a timeout could hide a completed charge, so it is raised as is"""
+    gateway = FakeGateway(failures=1, error=ConnectionResetError)
+    client = AsyncPaymentClient(gateway, backoff=0.001)
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(client.process_payment("123456", 1.0))
+    assert gateway.calls == 1
+
+    gateway = FakeGateway(failures=1, hang=0.3)
+    client = AsyncPaymentClient(gateway, timeout=0.05, backoff=0.001)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.process_payment("123456", 1.0))
+    assert gateway.calls == 1
+
+def test_refund_that_may_have_been_submitted_is_not_retried():
+    """Refunds follow the charge rule: a timeout is raised, a refused connection retried"""
+    gateway = FakeGateway(failures=1, hang=0.3)
+    client = AsyncPaymentClient(gateway, timeout=0.05, backoff=0.001)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.refund_payment("txn_1", 1.0))
+    assert gateway.calls == 1
+
+    gateway = FakeGateway(failures=1)
+    client = AsyncPaymentClient(gateway, backoff=0.001)
+    success, message = asyncio.run(client.refund_payment("txn_1", 1.0))
+    assert success is True
+    assert gateway.calls == 2
+
+def test_client_can_be_used_from_several_event_loops():
+    """Each event loop gets its own concurrency limit"""
+    gateway = FakeGateway(latency=0.02)
+    client = AsyncPaymentClient(gateway, max_concurrency=2)
+    async def pay_all():
+        await asyncio.gather(*(client.process_payment("123456", 1.0) for _ in range(4)))
+
+    asyncio.run(pay_all())
+    asyncio.run(pay_all())
+    assert gateway.calls == 8
+    assert gateway.max_in_flight == 2
+
+def test_declined_payment_is_not_retried():
+    """A decline is the gateway's answer and is returned as is"""
+    gateway = FakeGateway()
+    client = AsyncPaymentClient(gateway)
+
+    success, txn, message = asyncio.run(client.process_payment("123456", 5000.0))
+    assert success is False
+    assert gateway.calls == 1
+
+def test_idempotency_key_charges_once():
+    """Concurrent and repeated calls with one key reach the gateway once"""
+    gateway = FakeGateway(latency=0.05)
+    client = AsyncPaymentClient(gateway)
+    async def pay_twice():
+        first = await asyncio.gather(*(client.process_payment("123456", 1.0, idempotency_key=key) for _ in range(3)))
+        again = await client.process_payment("123456", 1.0, idempotency_key=key)
+        return first, again
+
+    key = f"k1:{time.time()}"
+    first, again = asyncio.run(pay_twice())
+    assert gateway.calls == 1
+    assert len({result[1] for result in first}) == 1
+    assert again == first[0]
+
+def test_idempotency_holds_across_clients():
+    """A key paid through one client is not charged again by a new client on a new event loop"""
+    gateway = FakeGateway()
+    key = f"k2:{time.time()}"
+    first = asyncio.run(AsyncPaymentClient(gateway).process_payment("123456", 1.0, idempotency_key=key))
+    again = asyncio.run(AsyncPaymentClient(gateway).process_payment("123456", 1.0, idempotency_key=key))
+
+    assert again == first
+    assert gateway.calls == 1
+
+def test_pay_all_late_fees_twice_charges_once(temp_db):
+    """Calling pay_all_late_fees again for the same loans does not charge them again"""
+    now = datetime.now()
+    insert_book("Overdue Book", "Fee Author", "0000000000001", 1, 1)
+    insert_borrow_record("123456", 1, now - timedelta(days=20), now - timedelta(days=6))
+    gateway = FakeGateway()
+
+    first = pay_all_late_fees("123456", gateway)
+    assert pay_all_late_fees("123456", gateway) == first
+    assert gateway.calls == 1
+
+def test_pay_all_late_fees_pays_every_overdue_book(temp_db):
+    """Every overdue book gets its own payment, submitted together"""
+    now = datetime.now()
+    for i in range(1, 5):
+        insert_book(f"Overdue Book {i}", "Fee Author", f"{i:013d}", 1, 1)
+        insert_borrow_record("123456", i, now - timedelta(days=20 + i), now - timedelta(days=6 + i))
+    insert_book("On Time Book", "Fee Author", "0000000000009", 1, 1)
+    insert_borrow_record("123456", 5, now, now + timedelta(days=14))
+    gateway = FakeGateway(latency=0.1)
+
+    start = time.perf_counter()
+    success, message, results = pay_all_late_fees("123456", gateway)
+    assert time.perf_counter() - start < 0.35
+    assert success is True
+    assert sorted(result['book_id'] for result in results) == [1, 2, 3, 4]
+    assert all(result['transaction_id'].startswith("txn_") for result in results)
+
+def test_pay_all_late_fees_nothing_owed(temp_db):
+    """A patron without overdue books is not sent to the gateway"""
+    gateway = FakeGateway()
+    success, message, results = pay_all_late_fees("123456", gateway)
+
+    assert success is False
+    assert gateway.calls == 0
+
+def test_pay_all_late_fees_invalid_patron():
+    """An invalid patron ID is rejected up front"""
+    success, message, results = pay_all_late_fees("12", FakeGateway())
+
+    assert success is False
+    assert "invalid patron id" in message.lower()
@@ -0,0 +1,106 @@
+import threading
+import pytest
+from cache import InMemorySharedBackend, LocalCache, ReadThroughCache
+import database
+from database import get_book_by_id, get_book_by_isbn, get_book_cache, insert_book, transaction, update_book_availability
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_lru_evicts_least_recently_used():
+    cache = ReadThroughCache(LocalCache(max_entries=2))
+    cache.get_or_load('a', lambda: 1)
+    cache.get_or_load('b', lambda: 2)
+    cache.get_or_load('a', lambda: 1)  # a is now most recent
+    cache.get_or_load('c', lambda: 3)
+
+    assert cache.get_or_load('a', lambda: 'reloaded') == 1
+    assert cache.get_or_load('b', lambda: 'reloaded') == 'reloaded'
+    stats = cache.stats()
+    assert stats['evictions'] == 2
+    assert stats['size'] == 2
+    assert (stats['hits'], stats['misses']) == (2, 4)
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ReadThroughCache(LocalCache(ttl=10, clock=clock))
+    cache.get_or_load('a', lambda: 1)
+    clock.now = 11
+    assert cache.get_or_load('a', lambda: 2) == 2
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache = ReadThroughCache()
+
+    def slow_loader():
+        cache.invalidate('a')  # a writer changes the row while we read it
+        return 'old'
+
+    assert cache.get_or_load('a', slow_loader) == 'old'
+    assert cache.get_or_load('a', lambda: 'new') == 'new'
+
+def test_lookups_are_served_from_cache(temp_db):
+    database.add_sample_data()
+    cache = get_book_cache()
+    get_book_by_isbn("9780743273565")
+    before = cache.stats()['misses']
+
+    for _ in range(3):
+        assert get_book_by_isbn("9780743273565")['title'] == 'The Great Gatsby'
+        assert get_book_by_id(1)['id'] == 1
+    assert cache.stats()['misses'] == before
+
+def test_update_and_insert_invalidate(temp_db):
+    database.add_sample_data()
+    assert get_book_by_id(1)['available_copies'] == 3
+    assert update_book_availability(1, -1)
+    assert get_book_by_id(1)['available_copies'] == 2
+
+    assert get_book_by_isbn("9780000000002") is None
+    assert get_book_by_id(4) is None
+    assert insert_book("New", "Author", "9780000000002", 1, 1)
+    assert get_book_by_isbn("9780000000002")['id'] == 4
+    assert get_book_by_id(4)['title'] == "New"
+
+def test_transaction_reads_its_own_writes_and_rollback_leaves_cache_clean(temp_db):
+    database.add_sample_data()
+    assert get_book_by_id(1)['available_copies'] == 3
+    with transaction() as tx:
+        update_book_availability(1, -1)
+        assert get_book_by_id(1)['available_copies'] == 2
+        tx.rollback()
+    assert get_book_by_id(1)['available_copies'] == 3
+
+def test_uncommitted_write_is_not_cached_by_other_threads(temp_db):
+    database.add_sample_data()
+    seen = []
+    with transaction():
+        update_book_availability(1, -1)
+        reader = threading.Thread(target=lambda: seen.append(get_book_by_id(1)['available_copies']))
+        reader.start()
+        reader.join()
+    assert seen == [3]
+    assert get_book_by_id(1)['available_copies'] == 2
+
+def test_returned_books_are_copies(temp_db):
+    database.add_sample_data()
+    get_book_by_id(1)['title'] = 'changed'
+    assert get_book_by_id(1)['title'] == 'The Great Gatsby'
+
+def test_shared_backend_is_seen_by_every_worker(temp_db):
+    """Two caches over one shared backend: an invalidation in one reaches the other"""
+    database.add_sample_data()
+    backend = InMemorySharedBackend()
+    database.configure_book_cache(backend=backend)
+    assert get_book_by_id(1)['available_copies'] == 3
+    worker_b = database.configure_book_cache(backend=backend)
+    assert get_book_by_id(1)['available_copies'] == 3
+    assert worker_b.stats()['hits'] == 1
+
+    update_book_availability(1, -1)  # through worker_b
+    database.configure_book_cache(backend=backend)  # back to a fresh worker
+    assert get_book_by_id(1)['available_copies'] == 2
+    database.configure_book_cache()
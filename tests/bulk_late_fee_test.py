@@ -0,0 +1,65 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from database import insert_book, insert_borrow_record, update_borrow_record_return_date
+from services.library_service import assess_late_fees, calculate_late_fee_for_book, late_fee_for_loan
+
+NOW = datetime(2025, 3, 1, 12, 0, 0, 500000)
+
+@pytest.fixture
+def loans(temp_db):
+    insert_book("Bulk Book", "Bulk Author", "0000000000001", 1000, 1000)
+    rng = random.Random(327)
+    due_dates = {}
+    for n in range(300):
+        patron_id = f"{100000 + n % 40}"
+        due = NOW - timedelta(days=rng.randint(-14, 40), microseconds=rng.randint(-2000000, 2000000))
+        insert_borrow_record(patron_id, 1, due - timedelta(days=14), due)
+        due_dates.setdefault(patron_id, []).append(due)
+    # Due exactly N days ago to the microsecond, and a returned overdue loan
+    insert_borrow_record("200000", 1, NOW - timedelta(days=21), NOW - timedelta(days=7))
+    due_dates["200000"] = [NOW - timedelta(days=7)]
+    insert_borrow_record("300000", 1, NOW - timedelta(days=30), NOW - timedelta(days=16))
+    update_borrow_record_return_date("300000", 1, NOW)
+    return due_dates
+
+def scalar_totals(due_dates):
+    # Loan dates are stored to the second, so price the loans as stored
+    now = NOW.replace(microsecond=0)
+    totals = {}
+    for patron_id, dues in due_dates.items():
+        fees = [late_fee_for_loan(max((now - due.replace(microsecond=0)).days, 0)) for due in dues]
+        owed = [fee for fee in fees if fee['fee_amount'] > 0]
+        if owed:
+            totals[patron_id] = {
+                'total_late_fees': sum(fee['fee_amount'] for fee in owed),
+                'overdue_books': len(owed)
+            }
+    return totals
+
+def test_bulk_fees_match_scalar_calculation(loans):
+    """The SQL fee engine gives exactly the per-loan R5 results"""
+    assert assess_late_fees(NOW) == scalar_totals(loans)
+
+def test_bulk_fees_match_per_book_calculation(temp_db):
+    """Each patron total is the sum of calculate_late_fee_for_book over their loans"""
+    now = datetime.now()
+    for book_id, days in enumerate((3, 10, 40), 1):
+        insert_book(f"Book {book_id}", "Author", f"{book_id:013d}", 1, 1)
+        insert_borrow_record("400000", book_id, now - timedelta(days=days + 14), now - timedelta(days=days, hours=1))
+    fees = [calculate_late_fee_for_book("400000", book_id)['fee_amount'] for book_id in (1, 2, 3)]
+
+    assert fees == [1.50, 6.50, 15.00]
+    assert assess_late_fees(now)["400000"] == {'total_late_fees': sum(fees), 'overdue_books': 3}
+
+def test_bulk_fees_exact_day_boundary(loans):
+    """A loan due exactly seven days ago is charged for seven days"""
+    assert assess_late_fees(NOW)["200000"] == {'total_late_fees': 3.50, 'overdue_books': 1}
+
+def test_bulk_fees_skip_returned_loans(loans):
+    """Returned loans never accrue fees"""
+    assert "300000" not in assess_late_fees(NOW)
+
+def test_bulk_fees_small_batches(loans):
+    """Streaming in tiny batches gives the same totals"""
+    assert assess_late_fees(NOW, batch_size=3) == assess_late_fees(NOW)
@@ -0,0 +1,63 @@
+import pytest
+from datetime import datetime, timedelta
+from database import get_book_by_id, get_patron_borrow_count, insert_book, insert_borrow_record
+from services.library_service import (
+    borrow_book_by_patron, borrow_books_by_patron, return_book_by_patron, return_books_by_patron
+)
+
+@pytest.fixture
+def shelf(temp_db):
+    for n in range(1, 9):
+        insert_book(f"Book {n}", "Author", f"{9780000000000 + n}", 2, 2)
+    insert_book("Out", "Author", "9780000000100", 1, 0)  # id 9
+    return temp_db
+
+def test_bulk_borrow_reports_each_book(shelf):
+    success, message, results = borrow_books_by_patron("123456", [1, 2, 2, 9, 999])
+
+    assert not success
+    assert message == "Borrowed 2 of 5 book(s)."
+    assert [r['success'] for r in results] == [True, True, False, False, False]
+    assert [r['message'] for r in results[2:]] == [
+        "This book is already in this checkout.", "This book is currently not available.", "Book not found."]
+    assert get_book_by_id(1)['available_copies'] == 1
+    assert get_patron_borrow_count("123456") == 2
+
+def test_bulk_borrow_matches_sequential_limit(shelf):
+    """The limit cuts in at the same book as ten single borrows would"""
+    _, _, bulk = borrow_books_by_patron("111111", list(range(1, 9)))
+    single = [borrow_book_by_patron("222222", book_id)[0] for book_id in range(1, 9)]
+    assert [r['success'] for r in bulk] == single
+    assert bulk[-1]['message'] == "You have reached the maximum borrowing limit of 5 books."
+
+def test_bulk_return_charges_late_fees(shelf):
+    due = datetime.now() - timedelta(days=3)
+    insert_borrow_record("123456", 1, due - timedelta(days=14), due)
+    borrow_books_by_patron("123456", [2])
+
+    success, message, results = return_books_by_patron("123456", [1, 2, 3])
+    assert not success
+    assert message == "Returned 2 of 3 book(s). $1.50 owed in late fees."
+    assert [r['fee_amount'] for r in results] == [1.50, 0.00, 0.00]
+    assert results[2]['message'] == "Book not borrowed by patron."
+    assert get_patron_borrow_count("123456") == 0
+    assert get_book_by_id(2)['available_copies'] == 2
+    assert return_book_by_patron("123456", 2) == (False, "Book not borrowed by patron.")
+
+def test_invalid_requests(shelf):
+    assert borrow_books_by_patron("12", [1]) == (False, "Invalid patron ID. Must be exactly 6 digits.", [])
+    assert return_books_by_patron("123456", []) == (False, "No books to return.", [])
+
+def test_bulk_api(shelf):
+    from app import create_app
+    client = create_app({'DATABASE': shelf}).test_client()
+
+    response = client.post('/api/borrow', json={'patron_id': '123456', 'book_ids': [1, 2]})
+    assert response.status_code == 200
+    assert response.get_json()['success']
+
+    response = client.post('/api/return', json={'patron_id': '123456', 'book_ids': [1, 2]})
+    assert response.get_json()['message'] == "Returned 2 book(s). $0.00 owed in late fees."
+
+    assert client.post('/api/borrow', json={'patron_id': '123456', 'book_ids': '1'}).status_code == 400
+    assert client.post('/api/borrow', json={'patron_id': 'x', 'book_ids': [1]}).status_code == 400
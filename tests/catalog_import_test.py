@@ -0,0 +1,127 @@
+import io
+import json
+import pytest
+from database import get_book_by_isbn, get_book_count, get_import_checkpoint, insert_book, search_books
+from services.catalog_import import import_books, read_csv, read_jsonl, read_marc
+
+CSV = """title,author,isbn,total_copies
+Dune,Frank Herbert,9780441172719,2
+Emma,Jane Austen,9780141439587,1
+,No Title,9780000000003,1
+Dune Again,Frank Herbert,9780441172719,1
+Short,ISBN,123,1
+Ulysses,James Joyce,9780199535675,zero
+"""
+
+def marc_record(fields):
+    """Build a MARC 21 binary record from (tag, data) pairs"""
+    directory, body = b'', b''
+    for tag, data in fields:
+        data = data.encode() + b'\x1e'
+        directory += f'{tag}{len(data):04d}{len(body):05d}'.encode()
+        body += data
+    base = 24 + len(directory) + 1
+    length = base + len(body) + 1
+    leader = f'{length:05d}nam a22{base:05d} a 4500'.encode()
+    return leader + directory + b'\x1e' + body + b'\x1d'
+
+def test_csv_import_validates_and_dedupes(temp_db):
+    report = import_books(read_csv(io.StringIO(CSV)), batch_size=2)
+
+    assert (report.rows, report.inserted, report.duplicates, report.invalid) == (6, 2, 1, 3)
+    assert [row for row, _ in report.errors] == [3, 5, 6]
+    assert report.errors[0][1] == "Title is required."
+    assert get_book_by_isbn("9780441172719")['total_copies'] == 2
+    assert get_book_count() == 2
+
+def test_imported_books_are_searchable(temp_db):
+    import_books(read_csv(io.StringIO(CSV)))
+    insert_book("Dune Messiah", "Frank Herbert", "9780593098233", 1, 1)
+    assert [book['title'] for book in search_books("dune", "title")] == ["Dune", "Dune Messiah"]
+    assert [book['title'] for book in search_books("austen", "author")] == ["Emma"]
+
+def test_existing_isbns_are_skipped(temp_db):
+    import_books(read_csv(io.StringIO(CSV)))
+    report = import_books(read_csv(io.StringIO(CSV)))
+    assert report.inserted == 0
+    assert report.duplicates == 3
+
+def test_jsonl_reports_bad_lines(temp_db):
+    lines = [json.dumps({'title': 'Dune', 'author': 'Frank Herbert', 'isbn': '9780441172719', 'total_copies': 1}),
+             '{not json', '[1, 2]', '']
+    report = import_books(read_jsonl(io.StringIO('\n'.join(lines))))
+    assert report.inserted == 1
+    assert report.invalid == 2
+
+def test_marc_records_are_mapped(temp_db):
+    data = marc_record([('001', 'x1'), ('020', '\x1fa978-0-441-17271-9 (pbk.)'),
+                        ('100', '1 \x1faHerbert, Frank.'), ('245', '10\x1faDune /\x1fcFrank Herbert.')])
+    data += b'00010'  # truncated trailing record
+    records = list(read_marc(io.BytesIO(data)))
+    assert records[0] == {'title': 'Dune', 'author': 'Herbert, Frank', 'isbn': '9780441172719', 'total_copies': 1}
+    assert records[1] == "Truncated MARC record."
+
+def test_failed_import_resumes_after_last_committed_batch(temp_db):
+    rows = [{'title': f'Book {n}', 'author': 'A', 'isbn': f'{n:013d}', 'total_copies': 1} for n in range(10)]
+
+    def failing():
+        for n, row in enumerate(rows):
+            if n == 7:
+                raise IOError("connection lost")
+            yield row
+
+    with pytest.raises(IOError):
+        import_books(failing(), checkpoint='books.csv', batch_size=3)
+    assert get_import_checkpoint('books.csv')['rows_done'] == 6
+    assert get_book_count() == 6
+
+    report = import_books(iter(rows), checkpoint='books.csv', batch_size=3)
+    assert report.resumed_from == 6
+    assert (report.inserted, report.duplicates) == (4, 0)
+    assert get_import_checkpoint('books.csv')['finished'] == 1
+
+def test_finished_import_starts_again(temp_db):
+    """Re-importing a file under a finished checkpoint reads every row of the new contents"""
+    rows = [{'title': f'Book {n}', 'author': 'A', 'isbn': f'{n:013d}', 'total_copies': 1} for n in range(4)]
+    import_books(iter(rows[:2]), checkpoint='books.csv')
+    report = import_books(iter(rows), checkpoint='books.csv')
+
+    assert report.resumed_from == 0
+    assert (report.rows, report.inserted, report.duplicates) == (4, 2, 2)
+    assert get_book_count() == 4
+
+def test_undecodable_upload_keeps_rows_before_it(temp_db):
+    """A body that stops decoding gets a 400 with the report of the rows committed"""
+    from app import create_app
+    client = create_app({'DATABASE': temp_db}).test_client()
+    # Well past the text decoder's read size, so rows are parsed before the bad bytes
+    good = ''.join(f"Book {n},Author,{n:013d},1\n" for n in range(1, 501))
+    body = ("title,author,isbn,total_copies\n" + good).encode() + "Café,A,9780000000027,1\n".encode('latin-1')
+
+    response = client.post('/api/import?format=csv&checkpoint=upload', data=body)
+    assert response.status_code == 400
+    report = response.get_json()
+    assert report['error'].startswith("Could not read past row")
+    assert report['inserted'] == report['rows'] == get_book_count() > 0
+    checkpoint = get_import_checkpoint('upload')
+    assert (checkpoint['rows_done'], checkpoint['finished']) == (report['rows'], 0)
+
+def test_import_invalidates_cached_misses(temp_db):
+    assert get_book_by_isbn("9780441172719") is None
+    import_books(read_csv(io.StringIO(CSV)))
+    assert get_book_by_isbn("9780441172719")['title'] == 'Dune'
+
+def test_import_api_and_cli(temp_db, tmp_path):
+    from app import create_app
+    app = create_app({'DATABASE': temp_db})
+
+    response = app.test_client().post('/api/import?format=csv', data=CSV.encode())
+    assert response.status_code == 200
+    assert response.get_json()['inserted'] == 2
+    assert app.test_client().post('/api/import?format=xml', data=b'').status_code == 400
+
+    path = tmp_path / "more.jsonl"
+    path.write_text(json.dumps({'title': 'Emma 2', 'author': 'J', 'isbn': '9780000000011', 'total_copies': 1}))
+    result = app.test_cli_runner().invoke(args=['import-books', str(path)])
+    assert result.exit_code == 0, result.output
+    assert "1 inserted" in result.output
@@ -0,0 +1,73 @@
+import pytest
+from database import insert_book, get_books_page, get_book_count, get_db_connection, decode_cursor
+from app import create_app
+
+@pytest.fixture
+def catalog(temp_db):
+    for i in range(7):
+        insert_book(f"Book {i}", "Page Author", f"{i:013d}", 1, 1)
+    # Two books with the same title must both be listed exactly once
+    insert_book("Book 3", "Other Author", "9999999999999", 1, 1)
+    return temp_db
+
+def test_pages_cover_catalog_once_in_order(catalog):
+    """Walking every page yields each book once, ordered by (title, id)"""
+    seen = []
+    cursor = None
+    while True:
+        books, cursor = get_books_page(cursor, 3)
+        seen.extend((book['title'], book['id']) for book in books)
+        if cursor is None:
+            break
+
+    assert len(seen) == 8
+    assert seen == sorted(seen)
+
+def test_last_page_has_no_cursor(catalog):
+    """A page that reaches the end of the catalog returns no next cursor"""
+    books, cursor = get_books_page(None, 8)
+
+    assert len(books) == 8
+    assert cursor is None
+
+def test_malformed_cursor_starts_from_beginning(catalog):
+    """A garbage cursor is treated as the first page"""
+    books, cursor = get_books_page("not-a-cursor", 2)
+
+    assert decode_cursor("not-a-cursor") is None
+    assert books[0]['title'] == "Book 0"
+
+def test_book_count_tracks_inserts(catalog):
+    """The maintained counter matches the table without a COUNT(*)"""
+    assert get_book_count() == 8
+    insert_book("Book 8", "Page Author", "0000000000008", 1, 1)
+    assert get_book_count() == 9
+
+def test_page_query_uses_title_index(catalog):
+    """Seeking past a cursor is an index search, not a table scan"""
+    conn = get_db_connection()
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM books WHERE (title, id) > (?, ?) ORDER BY title, id LIMIT 3", ("Book 2", 3)
+    ).fetchall()
+    conn.close()
+
+    assert "idx_books_title" in plan[0][3]
+
+def test_api_books_follows_next_links(catalog):
+    """/api/books pages can be walked by following 'next'"""
+    client = create_app({'DATABASE': catalog}).test_client()
+    response = client.get('/api/books?limit=5').get_json()
+    assert response['total'] == 8
+    assert response['count'] == 5
+
+    response = client.get(response['next']).get_json()
+    assert response['count'] == 3
+    assert response['next'] is None
+
+def test_catalog_page_links_to_next_page(catalog):
+    """/catalog renders one page with a link to the next"""
+    client = create_app({'DATABASE': catalog}).test_client()
+    html = client.get('/catalog?per_page=5').get_data(as_text=True)
+
+    assert "8 titles" in html
+    assert "cursor=" in html
@@ -0,0 +1,120 @@
+import pytest
+import database
+from database import (configure_catalog_snapshot, get_books_page, get_db_connection, insert_book,
+                      insert_books, search_books, transaction, update_book_availability)
+
+def walk(limit=3):
+    seen, cursor = [], None
+    while True:
+        books, cursor = get_books_page(cursor, limit)
+        seen.extend(books)
+        if cursor is None:
+            return seen
+
+@pytest.fixture
+def snapshot(temp_db):
+    for i in range(7):
+        insert_book(f"Book {i}", "Snap Author", f"{i:013d}", 2, 2)
+    insert_book("Book 3", "Other Author", "ISBN-X", 1, 1)
+    snapshot = configure_catalog_snapshot()
+    yield snapshot
+    configure_catalog_snapshot(False)
+
+def test_pages_match_sql(snapshot):
+    """Pages served from the snapshot are the same as the SQL pages"""
+    from_snapshot = walk()
+    configure_catalog_snapshot(False)
+
+    assert from_snapshot == walk()
+    assert [book['isbn'] for book in from_snapshot if book['title'] == "Book 3"] == ["0000000000003", "ISBN-X"]
+    assert snapshot.builds == 1
+
+def test_refresh_reads_only_changed_books(snapshot):
+    """Borrows and new books are patched in without a rebuild"""
+    walk()
+    update_book_availability(1, -1)
+    insert_book("Aardvark", "Snap Author", "1111111111111", 1, 1)
+
+    books = walk()
+    assert books[0]['title'] == "Aardvark"
+    assert next(book for book in books if book['id'] == 1)['available_copies'] == 1
+    assert snapshot.builds == 1
+    assert snapshot.refreshes == 1
+
+def test_renamed_book_moves_in_listing_order(snapshot):
+    """A title change re-sorts the book, and the search text follows it"""
+    assert search_books("zz", "title") == []
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Zzz' WHERE id = 2")
+    conn.commit()
+    conn.close()
+
+    assert [book['title'] for book in walk()][-1] == "Zzz"
+    assert [book['id'] for book in search_books("zz", "title")] == [2]
+    assert snapshot.builds == 1
+
+def test_deleted_book_triggers_rebuild(snapshot):
+    """A deleted book drops out of the listing"""
+    walk()
+    conn = get_db_connection()
+    conn.execute("DELETE FROM books WHERE id = 4")
+    conn.commit()
+    conn.close()
+
+    assert 4 not in [book['id'] for book in walk()]
+    assert snapshot.builds == 2
+
+def test_bulk_insert_is_stamped_once(snapshot):
+    """insert_books records every new book as changed in one statement"""
+    walk()
+    insert_books([(f"Bulk {n}", "Bulk Author", f"{9790000000000 + n}", 1, 1) for n in range(5)])
+
+    assert len(walk()) == 13
+    conn = get_db_connection()
+    seqs = {row[0] for row in conn.execute("SELECT change_seq FROM book_changes WHERE book_id > 8")}
+    conn.close()
+    assert len(seqs) == 1
+
+def test_short_search_matches_like_scan(snapshot):
+    """One- and two-letter searches give the same books as the SQL LIKE scan"""
+    results = {(term, field): search_books(term, field) for term in ("k", "OK", "th", "%")
+               for field in ("title", "author")}
+    paged = search_books("k", "title", limit=2, offset=3)
+    configure_catalog_snapshot(False)
+
+    for (term, field), books in results.items():
+        assert sorted(book['id'] for book in books) == sorted(book['id'] for book in search_books(term, field))
+    assert [book['title'] for book in paged] == ["Book 3", "Book 3"]
+
+def test_transaction_sees_its_own_writes(snapshot):
+    """Inside a transaction, pages come from the database"""
+    walk()
+    with transaction():
+        insert_book("Aardvark", "Snap Author", "1111111111111", 1, 1)
+        assert get_books_page(None, 1)[0][0]['title'] == "Aardvark"
+        assert snapshot.refreshes == 0
+
+def test_configure_pool_clears_snapshot(snapshot, tmp_path):
+    """Pointing the pool at another database discards the snapshot"""
+    walk()
+    database.configure_pool(str(tmp_path / "other.db"))
+    database.init_database()
+
+    assert get_books_page()[0] == []
+
+def test_refresh_queries_use_indexes(snapshot):
+    """An incremental refresh seeks book_changes by change number instead of scanning"""
+    walk()
+    update_book_availability(1, -1)
+    statements = []
+    conn = get_db_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        snapshot.refresh(conn)
+    finally:
+        conn.set_trace_callback(None)
+    plans = [row[3] for statement in statements for row in conn.execute("EXPLAIN QUERY PLAN " + statement)]
+    conn.close()
+
+    assert len(statements) == 2
+    assert not [detail for detail in plans if detail.startswith("SCAN")]
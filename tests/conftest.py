@@ -0,0 +1,16 @@
+import pytest
+import database
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    """Bring the working database up to the current schema, as CI does before testing"""
+    database.init_database()
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """Point the connection pool at a fresh, initialised database for one test"""
+    path = str(tmp_path / "library_test.db")
+    database.configure_pool(path)
+    database.init_database()
+    yield path
+    database.configure_pool()
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import pytest
+import database
+from database import ConnectionPool
+from app import create_app
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_size=2, timeout=0.2)
+    yield pool
+    pool.close()
+
+def test_pool_reuses_released_connection(pool):
+    """A released connection is handed out again instead of opening a new one"""
+    conn = pool.acquire()
+    conn.close()
+    again = pool.acquire()
+    again.close()
+
+    assert again is conn
+    assert pool.size == 1
+
+def test_pool_nested_acquire_same_thread(pool):
+    """Nested acquisitions on one thread share a single connection"""
+    outer = pool.acquire()
+    inner = pool.acquire()
+    inner.close()
+
+    assert inner is outer
+    assert pool.idle_count == 0
+    outer.close()
+    assert pool.idle_count == 1
+
+def test_pool_threads_get_distinct_connections(pool):
+    """Different threads never share a checked-out connection"""
+    conn = pool.acquire()
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(pool.acquire()))
+    thread.start()
+    thread.join()
+
+    assert seen[0] is not conn
+    assert pool.size == 2
+
+def test_pool_exhausted_times_out(pool):
+    """Acquiring past max_size waits for the timeout and then raises"""
+    errors = []
+    def hold_connection():
+        try:
+            pool.acquire()
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+    for _ in range(3):
+        thread = threading.Thread(target=hold_connection)
+        thread.start()
+        thread.join()
+
+    assert pool.size == 2
+    assert len(errors) == 1
+    assert "timed out" in str(errors[0]).lower()
+
+def test_pool_applies_pragmas(pool):
+    """WAL and synchronous=NORMAL are set when a connection is opened"""
+    conn = pool.acquire()
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.close()
+
+    assert journal_mode == "wal"
+    assert synchronous == 1
+
+def test_pool_rolls_back_uncommitted_work(pool):
+    """Work left uncommitted is rolled back when the connection is released"""
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+
+    conn = pool.acquire()
+    count = conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+    conn.close()
+    assert count == 0
+
+def test_pool_replaces_unhealthy_connection(pool):
+    """A connection failing its health check is discarded and replaced"""
+    pool.health_check_interval = 0
+    conn = pool.acquire()
+    conn.close()
+    sqlite3.Connection.close(conn)
+
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert fresh.execute("SELECT 1").fetchone()[0] == 1
+    fresh.close()
+
+def test_create_app_configures_pool(tmp_path):
+    """The app factory builds the pool from config and releases it on teardown"""
+    app = create_app({'DATABASE': str(tmp_path / "app.db"), 'DB_POOL_SIZE': 3})
+    pool = app.extensions['db_pool']
+    try:
+        assert pool is database.get_pool()
+        assert pool.max_size == 3
+        with app.app_context():
+            pool.acquire()
+        assert pool.idle_count == pool.size
+    finally:
+        database.configure_pool()
+
+def test_failing_helpers_release_their_connection(tmp_path):
+    """A helper whose query raises still hands its connection back to the pool"""
+    pool = database.configure_pool(str(tmp_path / "empty.db"))  # no tables, so every query fails
+    try:
+        for helper, args in [(database.get_book_count, ()), (database.get_books_page, (None, 2)),
+                             (database.get_books_by_ids, ([1],)), (database.get_patron_borrow_count, ("123456",)),
+                             (database.get_catalog_version, ()), (database.get_job, (1,))]:
+            with pytest.raises(sqlite3.OperationalError):
+                helper(*args)
+            assert pool.thread_connection() is None, helper.__name__
+        assert pool.idle_count == pool.size
+    finally:
+        database.configure_pool()
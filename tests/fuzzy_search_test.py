@@ -0,0 +1,110 @@
+import random
+import pytest
+from database import configure_catalog_snapshot, insert_book
+from fuzzy_search import FuzzyIndex, edit_distance, rank_books
+from services.library_service import search_books_in_catalog
+from app import create_app
+
+@pytest.fixture(params=[True, False], ids=["snapshot", "scan"])
+def catalog(temp_db, request):
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("Great Expectations", "Charles Dickens", "9780141439563", 2, 2)
+    insert_book("A Tale of Two Cities", "Charles Dickens", "9780141439600", 1, 1)
+    insert_book("1984", "George Orwell", "9780451524935", 1, 1)
+    insert_book("Animal Farm", "George Orwell", "9780451526342", 1, 1)
+    configure_catalog_snapshot(request.param)
+    yield temp_db
+    configure_catalog_snapshot(False)
+
+def titles(books):
+    return [book['title'] for book in books]
+
+def test_edit_distance_is_bounded():
+    """Distances past the limit are reported as no match; adjacent swaps cost one edit"""
+    assert edit_distance("fitzgerld", "fitzgerald", 2) == 1
+    assert edit_distance("goerge", "george", 1) == 1
+    assert edit_distance("dickens", "dockers", 1) is None
+
+def test_misspelled_author_is_found(catalog):
+    """A typo in an author name still finds the book"""
+    assert titles(search_books_in_catalog("Fitzgerld", "fuzzy")) == ["The Great Gatsby"]
+
+def test_every_word_must_match(catalog):
+    """Each query word must be close to a title or author word"""
+    assert titles(search_books_in_catalog("animl orwel", "fuzzy")) == ["Animal Farm"]
+    assert search_books_in_catalog("animal dickens", "fuzzy") == []
+
+def test_closer_matches_rank_first(catalog):
+    """Exact words outrank typos, even when the typo's title sorts first"""
+    insert_book("A Stale Loaf", "Someone Else", "9780000000001", 1, 1)
+
+    assert titles(search_books_in_catalog("tale", "fuzzy")) == ["A Tale of Two Cities", "A Stale Loaf"]
+
+def test_ties_are_paged_in_title_order(catalog):
+    """Equally close matches come in title order, and limit/offset page through them"""
+    assert titles(search_books_in_catalog("great", "fuzzy")) == ["Great Expectations", "The Great Gatsby"]
+    assert titles(search_books_in_catalog("great", "fuzzy", limit=1, offset=1)) == ["The Great Gatsby"]
+
+def test_short_words_must_match_exactly(catalog):
+    """Words under three letters tolerate no typos"""
+    assert search_books_in_catalog("tw", "fuzzy") == []
+    assert titles(search_books_in_catalog("two", "fuzzy")) == ["A Tale of Two Cities"]
+
+def test_index_follows_new_books():
+    """Books added after the index is built are found"""
+    index = FuzzyIndex()
+    index.add(0, "Dune", "Frank Herbert")
+    assert index.matches("herbrt") == {1: {0}}
+    index.add(1, "Children of Dune", "Frank Herbert")
+    assert index.matches("herbrt") == {1: {0, 1}}
+
+def test_index_agrees_with_scan_on_swaps_and_short_words():
+    """Every book a full scan finds is found by the index, including for
+    swapped letters and 3-4 letter words that share no trigram with the original"""
+    books = [{'id': 0, 'title': "The Cat", 'author': "Ann Lee"},
+             {'id': 1, 'title': "Dune", 'author': "Frank Herbert"},
+             {'id': 2, 'title': "Tale of Two Cities", 'author': "Charles Dickens"}]
+    index = FuzzyIndex()
+    for book in books:
+        index.add(book['id'], book['title'], book['author'])
+
+    def scanned(query):
+        return {book['id'] for book in rank_books(query, books)}
+
+    assert index.matches("teh") == {1: {0}}
+    assert index.matches("cot") == {1: {0}}
+    assert index.matches("dnue") == {1: {1}}
+
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = {word for book in books for word in (book['title'] + " " + book['author']).lower().split()}
+    for word in sorted(vocabulary):
+        for _ in range(20):
+            chars = list(word)
+            i = rng.randrange(len(chars))
+            edit = rng.choice(("swap", "substitute", "insert", "delete"))
+            if edit == "swap" and i + 1 < len(chars):
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+            elif edit == "substitute":
+                chars[i] = rng.choice(letters)
+            elif edit == "insert":
+                chars.insert(i, rng.choice(letters))
+            elif len(chars) > 3:
+                del chars[i]
+            query = "".join(chars)
+            indexed = set().union(*index.matches(query).values())
+            assert indexed == scanned(query), query
+
+def test_snapshot_index_sees_inserts(catalog):
+    """A book inserted after a fuzzy search is found by the next one"""
+    search_books_in_catalog("dickens", "fuzzy")
+    insert_book("Bleak House", "Charles Dickens", "9780141439723", 1, 1)
+
+    assert len(search_books_in_catalog("dikens", "fuzzy")) == 3
+
+def test_api_fuzzy_search(catalog):
+    """/api/search accepts type=fuzzy"""
+    client = create_app({'DATABASE': catalog, 'CATALOG_SNAPSHOT': False}).test_client()
+    response = client.get('/api/search?q=orwel&type=fuzzy').get_json()
+
+    assert titles(response['results']) == ["1984", "Animal Farm"]
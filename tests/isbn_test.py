@@ -0,0 +1,73 @@
+import pytest
+from database import get_book_by_isbn, get_books_by_isbns, insert_book, insert_books, search_books_by_isbn_prefix
+from isbn import normalize_isbn
+from services.library_service import add_book_to_catalog, lookup_books_by_isbn, search_books_in_catalog
+from app import create_app
+
+@pytest.fixture
+def catalog(temp_db):
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("1984", "George Orwell", "9780451524935", 1, 1)
+    insert_book("Animal Farm", "George Orwell", "9780451526342", 1, 1)
+    # Fails the checksum: matched exactly, never normalized
+    insert_book("Legacy Record", "Unknown", "1234567890123", 1, 1)
+    return temp_db
+
+def test_normalize_isbn():
+    """ISBN-10s become their 978 ISBN-13; hyphens are ignored; bad check digits are rejected"""
+    assert normalize_isbn("0-306-40615-2") == "9780306406157"
+    assert normalize_isbn("080442957x") == "9780804429573"
+    assert normalize_isbn("978-0-306-40615-7") == "9780306406157"
+    assert normalize_isbn("0306406153") is None
+    assert normalize_isbn("1234567890123") is None
+
+def test_lookup_accepts_any_form(catalog):
+    """ISBN-10, hyphenated and plain forms find the same book"""
+    for isbn in ("0451524934", "0-451-52493-4", "978-0-451-52493-5", "9780451524935"):
+        assert get_book_by_isbn(isbn)['title'] == "1984"
+    assert get_book_by_isbn("1234567890123")['title'] == "Legacy Record"
+    assert get_book_by_isbn("123-4567890123") is None
+
+def test_add_book_stores_isbn13(catalog):
+    """An ISBN-10 is accepted and stored as its ISBN-13; the other form is then a duplicate"""
+    assert add_book_to_catalog("Dune", "Frank Herbert", "0-441-17271-7", 1)[0]
+    assert get_book_by_isbn("9780441172719")['isbn'] == "9780441172719"
+
+    assert add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 1) == \
+        (False, "A book with this ISBN already exists.")
+    assert add_book_to_catalog("Dune", "Frank Herbert", "0-441-17271-8", 1) == \
+        (False, "ISBN must be 13 digits, or a valid ISBN-10 or ISBN-13 with or without hyphens.")
+
+def test_normalized_key_is_unique(catalog):
+    """Two books cannot share a normalized ISBN, whatever form it is stored in"""
+    assert not insert_book("Dupe", "Someone", "978-0-451-52493-5", 1, 1)
+
+def test_prefix_search_is_a_range(catalog):
+    """A publisher prefix lists its books in ISBN order"""
+    books = search_books_by_isbn_prefix("978-0-451")
+    assert [book['title'] for book in books] == ["1984", "Animal Farm"]
+    assert search_books_in_catalog("978-0-451", "isbn_prefix", limit=1, offset=1)[0]['title'] == "Animal Farm"
+    assert search_books_by_isbn_prefix("978-0-452") == []
+    assert search_books_by_isbn_prefix("orwell") == []
+
+def test_batch_lookup(catalog):
+    """A barcode batch resolves every form in one call, keyed by the input"""
+    books = get_books_by_isbns(["0451524934", "9780743273565", "1234567890123", "9780000000002"])
+    assert {isbn: book['title'] for isbn, book in books.items()} == {
+        "0451524934": "1984", "9780743273565": "The Great Gatsby", "1234567890123": "Legacy Record"}
+
+def test_bulk_insert_indexes_keys(catalog):
+    """Books loaded with insert_books get keys too"""
+    insert_books([("Dune", "Frank Herbert", "9780441172719", 1, 1)])
+    assert get_book_by_isbn("0-441-17271-7")['title'] == "Dune"
+
+def test_api_isbn_batch(catalog):
+    """POST /api/isbns reports each scan in order"""
+    client = create_app({'DATABASE': catalog}).test_client()
+    response = client.post('/api/isbns', json={'isbns': ["0-7432-7356-7", "0000000000"]})
+
+    results = response.get_json()['results']
+    assert [result['found'] for result in results] == [True, False]
+    assert results[0]['book']['title'] == "The Great Gatsby"
+    assert client.post('/api/isbns', json={'isbns': []}).status_code == 400
+    assert lookup_books_by_isbn(["0-7432-7356-7"])[0]['isbn'] == "0-7432-7356-7"
@@ -0,0 +1,192 @@
+import time
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from database import (claim_job, enqueue_job, get_db_connection, get_job, insert_book, insert_borrow_record,
+                      requeue_expired_jobs)
+from services import job_queue
+from services.job_queue import (
+    JobWorkerPool, enqueue_late_fee_payment, enqueue_refund, get_job_status, job_handler
+)
+from services.payment_service import PaymentGateway
+
+def _overdue_loan(patron_id, days=10):
+    insert_book("Queued Book", "Author", "9780000000101", 1, 0)
+    due = datetime.now() - timedelta(days=days)
+    insert_borrow_record(patron_id, 1, due - timedelta(days=14), due)
+
+def test_payment_job_runs_through_worker(temp_db):
+    """A queued payment is charged once by a worker and its result is recorded"""
+    _overdue_loan("123456")
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_1", "ok")
+
+    success, _, job_id = enqueue_late_fee_payment("123456", 1)
+    assert success
+    assert get_job_status(job_id)['status'] == 'queued'
+
+    assert JobWorkerPool(gateway=gateway).run_pending() == 1
+    job = get_job_status(job_id)
+    assert job['status'] == 'done'
+    assert job['result']['transaction_id'] == "txn_1"
+    gateway.process_payment.assert_called_once()
+
+def test_duplicate_refund_is_queued_once(temp_db):
+    """Refunds are deduplicated by transaction ID"""
+    _, _, first = enqueue_refund("txn_123", 5.0)
+    _, message, second = enqueue_refund("txn_123", 5.0)
+    assert first == second
+    assert message == "Refund already queued."
+
+def test_invalid_requests_are_not_queued(temp_db):
+    assert enqueue_late_fee_payment("12", 1) == (False, "Invalid patron ID. Must be exactly 6 digits.", None)
+    assert enqueue_refund("bad", 5.0)[0] is False
+    assert enqueue_refund("txn_1", 20.0)[0] is False
+
+def test_gateway_error_is_retried_until_success(temp_db):
+    """An error proving the charge was never sent is retried"""
+    _overdue_loan("123456")
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = [ConnectionRefusedError("down"), (True, "txn_2", "ok")]
+    _, _, job_id = enqueue_late_fee_payment("123456", 1)
+
+    pool = JobWorkerPool(gateway=gateway, retry_delay=0)
+    pool.run_pending()
+    job = get_job_status(job_id)
+    assert job['status'] == 'done'
+    assert job['attempts'] == 2
+
+def test_declined_payment_fails_and_can_be_resubmitted(temp_db):
+    _overdue_loan("123456")
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (False, "", "declined")
+    _, _, job_id = enqueue_late_fee_payment("123456", 1)
+    JobWorkerPool(gateway=gateway).run_pending()
+    assert get_job_status(job_id)['status'] == 'failed'
+
+    _, message, again = enqueue_late_fee_payment("123456", 1)
+    assert again == job_id
+    assert message == "Payment queued."
+    assert get_job_status(job_id)['status'] == 'queued'
+
+def test_expired_lease_is_recovered(temp_db):
+    """A job whose worker died mid-run is handed out again, and the stale worker cannot finish it"""
+    job_id, _ = enqueue_job('noop_test', {})
+    stale = claim_job(lease_seconds=-1)
+    assert claim_job(lease_seconds=30) is None
+
+    assert requeue_expired_jobs() == 1
+    fresh = claim_job(lease_seconds=30)
+    assert fresh['id'] == job_id
+    assert fresh['attempts'] == stale['attempts'] + 1
+
+def test_worker_threads_drain_queue(temp_db):
+    ran = []
+
+    @job_handler('record_test')
+    def record(payload, gateway):
+        ran.append(payload['n'])
+        return {'success': True}
+
+    for n in range(20):
+        enqueue_job('record_test', {'n': n})
+    pool = JobWorkerPool(workers=4, poll_interval=0.01)
+    pool.start()
+    try:
+        deadline = time.time() + 5
+        while len(ran) < 20 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        pool.stop()
+    assert sorted(ran) == list(range(20))
+    assert all(get_job(n)['status'] == 'done' for n in range(1, 21))
+
+def test_payment_api_returns_job_at_once(temp_db):
+    from app import create_app
+    client = create_app({'DATABASE': temp_db}).test_client()
+
+    response = client.post('/api/refunds', json={'transaction_id': 'txn_9', 'amount': 3.5})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert response.headers['Location'].endswith(f'/api/jobs/{job_id}')
+
+    status = client.get(f'/api/jobs/{job_id}')
+    assert status.get_json()['status'] == 'queued'
+    assert client.post('/api/payments', json={'patron_id': '123456'}).status_code == 400
+    assert client.get('/api/jobs/999').status_code == 404
+
+def test_later_loan_of_same_book_can_be_paid(temp_db):
+    """Payment jobs are keyed on the loan, so a paid fee does not block the next loan's"""
+    _overdue_loan("123456")
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_1", "ok")
+    _, _, first = enqueue_late_fee_payment("123456", 1)
+    JobWorkerPool(gateway=gateway).run_pending()
+
+    conn = get_db_connection()
+    conn.execute("UPDATE borrow_records SET return_date = borrow_date + 86400")
+    conn.commit()
+    conn.close()
+    due = datetime.now() - timedelta(days=3)
+    insert_borrow_record("123456", 1, due - timedelta(days=14), due)
+
+    _, message, second = enqueue_late_fee_payment("123456", 1)
+    assert (message, second != first) == ("Payment queued.", True)
+
+def test_charge_is_not_repeated_when_handler_fails_after_it(temp_db, monkeypatch):
+    """A charge is saved on the job before anything can raise; the retry reports it"""
+    _overdue_loan("123456")
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_7", "ok")
+    real = job_queue.pay_late_fees
+
+    def pay_then_crash(*args):
+        real(*args)
+        monkeypatch.setattr(job_queue, 'pay_late_fees', real)
+        raise RuntimeError("crashed after charging")
+
+    monkeypatch.setattr(job_queue, 'pay_late_fees', pay_then_crash)
+    _, _, job_id = enqueue_late_fee_payment("123456", 1)
+    JobWorkerPool(gateway=gateway, retry_delay=0).run_pending()
+
+    job = get_job_status(job_id)
+    assert (job['status'], job['attempts'], job['result']['transaction_id']) == ('done', 2, "txn_7")
+    gateway.process_payment.assert_called_once()
+
+def test_charge_that_may_have_been_sent_is_not_retried(temp_db):
+    """The gateway takes the charge and then times out: the job waits for reconciliation"""
+    _overdue_loan("123456")
+    charges = []
+
+    def charge_then_time_out(patron_id, amount, description=""):
+        charges.append(amount)
+        raise TimeoutError("no response")
+
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = charge_then_time_out
+    _, _, job_id = enqueue_late_fee_payment("123456", 1)
+    JobWorkerPool(gateway=gateway, retry_delay=0).run_pending()
+
+    job = get_job_status(job_id)
+    assert (job['status'], job['attempts'], job['result']['reconcile']) == ('reconcile', 1, True)
+    assert len(charges) == 1
+    assert enqueue_late_fee_payment("123456", 1)[0] is False
+
+def test_refund_that_may_have_been_sent_is_not_retried(temp_db):
+    from app import create_app
+    refunds = []
+
+    def refund_then_fail(transaction_id, amount):
+        refunds.append(transaction_id)
+        raise ConnectionResetError("connection reset")
+
+    gateway = Mock(spec=PaymentGateway)
+    gateway.refund_payment.side_effect = refund_then_fail
+    _, _, job_id = enqueue_refund("txn_5", 4.0)
+    JobWorkerPool(gateway=gateway, retry_delay=0).run_pending()
+
+    assert get_job_status(job_id)['status'] == 'reconcile'
+    assert refunds == ["txn_5"]
+    response = create_app({'DATABASE': temp_db}).test_client().post(
+        '/api/refunds', json={'transaction_id': 'txn_5', 'amount': 4.0})
+    assert (response.status_code, response.get_json()['job_id']) == (409, job_id)
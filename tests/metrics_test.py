@@ -0,0 +1,67 @@
+import logging
+import pytest
+import metrics
+from app import create_app
+from database import get_book_by_id, insert_book, iter_all_books
+from services.library_service import borrow_book_by_patron
+
+@pytest.fixture
+def registry():
+    metrics.REGISTRY.reset()
+    yield metrics.REGISTRY
+    metrics.disable()
+    metrics.REGISTRY.reset()
+
+def function_calls(registry, module, function):
+    histogram = registry.histogram('library_function_duration_seconds', function=function, module=module)
+    return histogram.count if histogram else 0
+
+def test_nothing_recorded_while_disabled(temp_db, registry):
+    get_book_by_id(1)
+    assert function_calls(registry, 'database', 'get_book_by_id') == 0
+    assert 'library_sql_duration_seconds' not in registry.render()
+
+def test_functions_and_statements_are_timed(temp_db, registry):
+    metrics.enable()
+    insert_book("Timed Book", "Author", "9780000000001", 1, 1)
+    borrow_book_by_patron("123456", 1)
+    assert function_calls(registry, 'services.library_service', 'borrow_book_by_patron') == 1
+    assert function_calls(registry, 'database', 'insert_book') == 1
+    assert registry.histogram('library_sql_duration_seconds', statement='SELECT * FROM books WHERE id = ?').count >= 1
+
+def test_generator_is_timed_when_exhausted(temp_db, registry):
+    metrics.enable()
+    books = iter_all_books()
+    assert function_calls(registry, 'database', 'iter_all_books') == 0
+    list(books)
+    assert function_calls(registry, 'database', 'iter_all_books') == 1
+
+def test_errors_are_counted(temp_db, registry):
+    metrics.enable()
+    with pytest.raises(TypeError):
+        get_book_by_id()
+    assert registry.counter('library_function_errors_total', function='get_book_by_id', module='database') == 1
+
+def test_slow_queries_are_logged(temp_db, registry, caplog):
+    metrics.enable(slow_query_seconds=0)
+    with caplog.at_level(logging.WARNING, logger='library.metrics'):
+        get_book_by_id(1)
+    assert any('Slow query' in message for message in caplog.messages)
+    assert registry.counter('library_sql_slow_queries_total') >= 1
+
+def test_metrics_endpoint(temp_db, registry):
+    client = create_app({'DATABASE': temp_db, 'METRICS_ENABLED': True}).test_client()
+    response = client.get('/api/books?limit=5')
+    assert any(value.startswith('db;dur=') for value in response.headers.getlist('Server-Timing'))
+
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    body = response.get_data(as_text=True)
+    assert '# TYPE library_http_request_duration_seconds histogram' in body
+    assert 'library_http_request_duration_seconds_count{endpoint="api.list_books_api",method="GET",status="200"} 1' in body
+    assert 'library_function_duration_seconds_count{function="get_books_page",module="database"} 1' in body
+    assert 'library_db_pool_connections ' in body
+
+def test_app_without_metrics_adds_no_span(temp_db, registry):
+    client = create_app({'DATABASE': temp_db}).test_client()
+    assert 'Server-Timing' not in client.get('/api/books').headers
@@ -0,0 +1,47 @@
+import sqlite3
+import pytest
+import migrations
+from migrations import MIGRATIONS, get_schema_version, run_migrations
+
+def test_migrations_apply_in_order(tmp_path):
+    """A new database gets every migration once, recorded in schema_version"""
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+    applied = run_migrations(conn)
+
+    assert applied == [step.version for step in MIGRATIONS]
+    assert applied == sorted(applied)
+    assert get_schema_version(conn) == MIGRATIONS[-1].version
+
+def test_migrations_are_idempotent(tmp_path):
+    """Running the migrations again applies nothing"""
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+    run_migrations(conn)
+
+    assert run_migrations(conn) == []
+
+def test_migrations_upgrade_existing_database(tmp_path):
+    """A database created before the migration runner keeps its rows and gains the indexes"""
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+    migrations._initial_schema(conn)
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES ('Old Book', 'Old Author', '1111111111111', 1, 1)")
+    conn.commit()
+
+    run_migrations(conn)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    assert conn.execute("SELECT title FROM books").fetchone()[0] == 'Old Book'
+    assert conn.execute("SELECT value FROM catalog_meta WHERE key = 'book_count'").fetchone()[0] == 1
+    assert 'idx_borrow_records_open_patron' in indexes
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    """A migration that raises leaves neither its changes nor its version behind"""
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (x INTEGER)")
+        raise RuntimeError("boom")
+    monkeypatch.setattr(migrations, 'MIGRATIONS', MIGRATIONS + [migrations.Migration(999, 'broken', broken)])
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+
+    with pytest.raises(RuntimeError):
+        run_migrations(conn)
+    assert get_schema_version(conn) == MIGRATIONS[-1].version
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
@@ -0,0 +1,62 @@
+import pytest
+import database
+from datetime import datetime, timedelta
+from database import insert_book, insert_borrow_record
+from services.library_service import (
+    get_patron_status_report, get_patron_status_reports, calculate_late_fee_for_book, late_fee_for_days
+)
+
+@pytest.fixture
+def loans(temp_db):
+    now = datetime.now()
+    for i in range(1, 4):
+        insert_book(f"Report Book {i}", "Report Author", f"{i:013d}", 5, 5)
+    # Due 3 days ago, 10 days ago and in the future
+    insert_borrow_record("111111", 1, now - timedelta(days=17), now - timedelta(days=3))
+    insert_borrow_record("111111", 2, now - timedelta(days=24), now - timedelta(days=10))
+    insert_borrow_record("111111", 3, now - timedelta(days=1), now + timedelta(days=13))
+    insert_borrow_record("222222", 1, now - timedelta(days=60), now - timedelta(days=46))
+    return temp_db
+
+def count_queries(func, *args):
+    statements = []
+    conn = database.get_db_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        result = func(*args)
+    finally:
+        conn.set_trace_callback(None)
+        conn.close()
+    return result, len([s for s in statements if s.lstrip().upper().startswith("SELECT")])
+
+def test_report_uses_one_query(loans):
+    """A report with several loans costs a single SELECT"""
+    report, queries = count_queries(get_patron_status_report, "111111")
+
+    assert report['borrow_count'] == 3
+    assert queries == 1
+
+def test_report_fees_match_r5(loans):
+    """Per-book fees in the report equal calculate_late_fee_for_book"""
+    report = get_patron_status_report("111111")
+
+    for book in report['borrowed_books']:
+        expected = calculate_late_fee_for_book("111111", book['book_id'])
+        assert book['late_fee']['fee_amount'] == expected['fee_amount']
+        assert book['late_fee']['days_overdue'] == expected['days_overdue']
+    assert report['total_late_fees'] == 1.50 + 6.50
+
+def test_batch_reports_match_single_reports(loans):
+    """The batch variant returns the same report as asking one patron at a time"""
+    reports, queries = count_queries(get_patron_status_reports, ["111111", "222222", "333333", "12"])
+
+    assert queries == 1
+    assert reports["111111"]['total_late_fees'] == get_patron_status_report("111111")['total_late_fees']
+    assert reports["222222"]['total_late_fees'] == 15.00
+    assert reports["333333"]['borrow_count'] == 0
+    assert 'invalid patron id' in reports["12"]['status'].lower()
+
+@pytest.mark.parametrize("days, fee", [(0, 0.00), (1, 0.50), (7, 3.50), (8, 4.50), (18, 14.50), (19, 15.00), (400, 15.00)])
+def test_late_fee_schedule(days, fee):
+    """The shared fee schedule is $0.50/day to 7 days, then $1.00/day, capped at $15"""
+    assert late_fee_for_days(days) == fee
@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime, timedelta
+from database import (
+    check_patron_stats, get_db_connection, get_patron_borrow_count, get_patron_stats,
+    insert_book, insert_borrow_record, rebuild_patron_stats
+)
+from services.library_service import (
+    borrow_book_by_patron, borrow_books_by_patron, get_patron_status_report, return_book_by_patron,
+    return_books_by_patron
+)
+
+@pytest.fixture
+def shelf(temp_db):
+    for n in range(1, 6):
+        insert_book(f"Book {n}", "Author", f"{9780000000000 + n}", 3, 3)
+    return temp_db
+
+def test_counter_follows_borrows_and_returns(shelf):
+    borrow_book_by_patron("123456", 1)
+    borrow_books_by_patron("123456", [2, 3])
+    assert get_patron_borrow_count("123456") == 3
+
+    return_book_by_patron("123456", 1)
+    return_books_by_patron("123456", [2])
+    assert get_patron_stats("123456")['open_loans'] == 1
+    assert get_patron_status_report("123456")['borrow_count'] == 1
+    assert check_patron_stats() == []
+
+def test_overdue_loans_are_priced(shelf):
+    due = datetime.now() - timedelta(days=10)
+    insert_borrow_record("123456", 1, due - timedelta(days=14), due)
+    insert_borrow_record("123456", 2, datetime.now(), datetime.now() + timedelta(days=14))
+
+    stats = get_patron_stats("123456")
+    assert (stats['open_loans'], stats['overdue_loans'], stats['outstanding_fees']) == (2, 1, 6.50)
+
+    return_book_by_patron("123456", 1)
+    stats = get_patron_stats("123456")
+    assert (stats['open_loans'], stats['overdue_loans'], stats['outstanding_fees']) == (1, 0, 0.0)
+
+def test_unknown_patron_has_no_loans(shelf):
+    assert get_patron_borrow_count("999999") == 0
+    assert get_patron_stats("999999")['open_loans'] == 0
+
+def test_check_finds_and_rebuild_repairs_drift(shelf):
+    borrow_books_by_patron("123456", [1, 2])
+    borrow_book_by_patron("654321", 3)
+    conn = get_db_connection()
+    conn.execute("UPDATE patron_stats SET open_loans = 7 WHERE patron_id = '123456'")
+    conn.execute("DELETE FROM patron_stats WHERE patron_id = '654321'")
+    conn.execute("INSERT INTO patron_stats (patron_id, open_loans) VALUES ('111111', 2)")
+    conn.commit()
+    conn.close()
+
+    assert sorted((r['patron_id'], r['open_loans'], r['actual']) for r in check_patron_stats()) == [
+        ('111111', 2, 0), ('123456', 7, 2), ('654321', 0, 1)]
+    assert rebuild_patron_stats() == 2
+    assert check_patron_stats() == []
+    assert get_patron_borrow_count("123456") == 2
+
+def test_cli(shelf):
+    from app import create_app
+    runner = create_app({'DATABASE': shelf}).test_cli_runner()
+    borrow_book_by_patron("123456", 1)
+
+    assert runner.invoke(args=['patron-stats', 'check']).exit_code == 0
+    conn = get_db_connection()
+    conn.execute("UPDATE patron_stats SET open_loans = 0")
+    conn.commit()
+    conn.close()
+    result = runner.invoke(args=['patron-stats', 'check'])
+    assert result.exit_code == 1
+    assert "counter 0, actual" in result.output
+
+    assert runner.invoke(args=['patron-stats', 'rebuild']).exit_code == 0
+    assert runner.invoke(args=['patron-stats', 'check']).exit_code == 0
@@ -0,0 +1,78 @@
+import pytest
+import database
+from datetime import datetime
+
+def iter_late_fee_totals(now):
+    return list(database.iter_late_fee_totals(now))
+
+def export_loans_since(since):
+    return list(database.iter_export_batches('borrow_records', since))
+
+# Hot-path helpers and the arguments to call them with. Every statement they
+# run must be answered from an index; a bare SCAN means a missing index.
+HOT_QUERIES = [
+    (database.get_book_by_id, (1,)),
+    (database.get_book_by_isbn, ("9780743273565",)),
+    (database.get_patron_borrowed_books, ("123456",)),
+    (database.get_patron_borrow_count, ("123456",)),
+    (database.get_patron_stats, ("123456",)),
+    (database.get_patron_loan_summaries, (["123456", "654321"],)),
+    (database.get_books_page, (None, 2)),
+    (database.get_books_page, (database.encode_cursor("1984", 3), 2)),
+    (database.get_book_count, ()),
+    (database.search_books, ("gatsby", "title", 10)),
+    (iter_late_fee_totals, (datetime.now(),)),
+    (database.update_book_availability, (1, -1)),
+    (database.update_borrow_record_return_date, ("123456", 3, datetime.now())),
+    (database.get_books_by_ids, ([1, 2],)),
+    (database.get_books_by_isbns, (["9780743273565", "0-451-52493-4"],)),
+    (database.search_books_by_isbn_prefix, ("978-0-7432", 10)),
+    (database.update_books_availability, ([1, 2], -1)),
+    (database.update_borrow_records_return_date, ("123456", [3], datetime.now())),
+    (database.claim_job, (30,)),
+    (database.requeue_expired_jobs, ()),
+    (database.get_job, (1,)),
+    (export_loans_since, (database.to_epoch(datetime.now()),)),
+]
+
+def capture_statements(helper, args):
+    """Run a helper on this thread's pooled connection and record its SQL"""
+    statements = []
+    conn = database.get_db_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        helper(*args)
+    finally:
+        conn.set_trace_callback(None)
+        conn.close()
+    return [s for s in statements if s.lstrip().split()[0].upper() in ('SELECT', 'WITH', 'UPDATE', 'DELETE')]
+
+def full_scans(statement):
+    """Plan steps that read a whole table rather than seeking an index"""
+    conn = database.get_db_connection()
+    plan = conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+    conn.close()
+    scans = []
+    for row in plan:
+        detail = row[3]
+        if not detail.startswith("SCAN"):
+            continue
+        if "VIRTUAL TABLE INDEX" in detail:
+            continue
+        # Walking an index in order under a LIMIT reads only one page
+        if "USING" in detail and "INDEX" in detail and "LIMIT" in statement.upper():
+            continue
+        scans.append(detail)
+    return scans
+
+@pytest.mark.parametrize("helper, args", HOT_QUERIES, ids=lambda value: getattr(value, '__name__', ''))
+def test_hot_queries_do_not_scan(temp_db, helper, args):
+    """No hot query in database.py falls back to a full table scan"""
+    # Plan the SQL paths, not reads answered by the catalog snapshot
+    database.configure_catalog_snapshot(False)
+    database.add_sample_data()
+    statements = capture_statements(helper, args)
+
+    assert statements
+    for statement in statements:
+        assert full_scans(statement) == [], statement
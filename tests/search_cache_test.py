@@ -0,0 +1,102 @@
+import pytest
+from app import create_app
+from cache import MISSING, LocalCache, VersionedCache
+from database import (configure_search_cache, get_catalog_version, get_db_connection, insert_book, transaction,
+                      update_book_availability)
+from services.library_service import search_books_in_catalog
+
+@pytest.fixture
+def search_cache(temp_db):
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("Great Expectations", "Charles Dickens", "9780141439563", 2, 2)
+    insert_book("1984", "George Orwell", "9780451524935", 1, 1)
+    cache = configure_search_cache()
+    yield cache
+    configure_search_cache()
+
+def test_byte_budget_evicts_least_recently_used():
+    store = LocalCache(max_entries=10, max_bytes=100, sizeof=len)
+    store.set('a', 'x' * 40)
+    store.set('b', 'y' * 40)
+    store.set('c', 'z' * 40)
+    store.set('huge', 'w' * 101)  # over the budget on its own: not stored
+
+    assert store.get('a') is MISSING
+    assert store.get('huge') is MISSING
+    assert (len(store), store.bytes, store.evictions) == (2, 80, 1)
+
+def test_new_version_drops_every_entry():
+    cache = VersionedCache()
+    cache.get_or_load(1, 'a', lambda: 'old')
+    assert cache.get_or_load(1, 'a', lambda: 'reloaded') == 'old'
+    assert cache.get_or_load(2, 'a', lambda: 'new') == 'new'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations'], stats['version']) == (1, 2, 1, 2)
+
+def test_stale_version_bypasses_the_cache():
+    cache = VersionedCache()
+    cache.get_or_load(2, 'a', lambda: 'new')
+    assert cache.get_or_load(1, 'a', lambda: 'old') == 'old'
+    assert cache.get_or_load(2, 'a', lambda: 'reloaded') == 'new'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations'], stats['version']) == (1, 2, 0, 2)
+
+def test_repeated_searches_are_served_from_cache(search_cache):
+    """Searches differing only in ASCII case or spacing share an entry"""
+    first = search_books_in_catalog("great", "title")
+    assert search_books_in_catalog("GREAT", "title") == first
+    assert search_books_in_catalog("  dikens ", "fuzzy") == search_books_in_catalog("Dikens", "fuzzy")
+    assert search_books_in_catalog("0-451-52493-4", "isbn") == search_books_in_catalog("9780451524935", "isbn")
+
+    stats = search_cache.stats()
+    assert (stats['hits'], stats['misses']) == (3, 3)
+
+def test_pages_are_cached_separately(search_cache):
+    assert [book['title'] for book in search_books_in_catalog("great", "title", 1, 0)] == ["Great Expectations"]
+    assert [book['title'] for book in search_books_in_catalog("great", "title", 1, 1)] == ["The Great Gatsby"]
+    assert search_cache.stats()['misses'] == 2
+
+def test_writes_bump_the_catalog_version(search_cache):
+    """insert_book, borrows and direct SQL edits all retire cached results"""
+    assert search_books_in_catalog("1984", "title")[0]['available_copies'] == 1
+    version = get_catalog_version()
+
+    update_book_availability(3, -1)
+    assert search_books_in_catalog("1984", "title")[0]['available_copies'] == 0
+    insert_book("Great Gatsby Notes", "Study Guides", "9780000000001", 1, 1)
+    assert len(search_books_in_catalog("great", "title")) == 3
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Nineteen Eighty-Four' WHERE id = 3")
+    conn.commit()
+    conn.close()
+    assert search_books_in_catalog("1984", "title") == []
+
+    assert get_catalog_version() > version
+    assert search_cache.stats()['invalidations'] >= 3
+
+def test_cached_results_cannot_be_edited(search_cache):
+    search_books_in_catalog("great", "title")[0]['title'] = "Changed"
+    assert search_books_in_catalog("great", "title")[0]['title'] == "Great Expectations"
+
+def test_transaction_bypasses_cache(search_cache):
+    search_books_in_catalog("orwell", "author")
+    with transaction():
+        insert_book("Animal Farm", "George Orwell", "9780451526342", 1, 1)
+        assert len(search_books_in_catalog("orwell", "author")) == 2
+    assert search_cache.stats()['hits'] == 0
+
+def test_cache_stats_endpoint(search_cache, temp_db):
+    client = create_app({'DATABASE': temp_db, 'SEARCH_CACHE_BYTES': 1 << 20}).test_client()
+    client.get('/api/search?q=great&type=title&limit=10')
+    client.get('/api/search?q=Great&type=title&limit=10')
+
+    stats = client.get('/api/cache').get_json()['search']
+    assert (stats['hits'], stats['misses'], stats['size'], stats['max_bytes']) == (1, 1, 1, 1 << 20)
+    assert 0 < stats['bytes'] <= 1 << 20
+    assert stats['hit_rate'] == 0.5
+
+def test_size_zero_disables_cache(temp_db):
+    client = create_app({'DATABASE': temp_db, 'SEARCH_CACHE_SIZE': 0}).test_client()
+    assert client.get('/api/cache').get_json()['search'] is None
+    assert client.get('/api/search?q=anything&type=title').status_code == 200
+    configure_search_cache()
@@ -0,0 +1,92 @@
+import pytest
+from database import insert_book, search_books, get_db_connection
+from services.library_service import search_books_in_catalog
+from app import create_app
+
+@pytest.fixture
+def catalog(temp_db):
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("Great Expectations", "Charles Dickens", "9780141439563", 2, 2)
+    insert_book("A Tale of Two Cities", "Charles Dickens", "9780141439600", 1, 1)
+    insert_book("1984", "George Orwell", "9780451524935", 1, 1)
+    return temp_db
+
+def test_search_index_substring_match(catalog):
+    """Substrings in the middle of a word are found, case-insensitively"""
+    results = search_books_in_catalog("XPECT", "title")
+
+    assert [book['title'] for book in results] == ["Great Expectations"]
+
+def test_search_index_prefix_matches_rank_first(catalog):
+    """Titles starting with the term come before titles merely containing it"""
+    results = search_books_in_catalog("great", "title")
+
+    assert [book['title'] for book in results] == ["Great Expectations", "The Great Gatsby"]
+
+def test_search_index_author_search(catalog):
+    """Author searches only look at the author column"""
+    results = search_books_in_catalog("dickens", "author")
+
+    assert len(results) == 2
+    assert search_books_in_catalog("dickens", "title") == []
+
+def test_search_index_limit_and_offset(catalog):
+    """Results can be paged with limit and offset"""
+    first = search_books_in_catalog("dickens", "author", limit=1)
+    second = search_books_in_catalog("dickens", "author", limit=1, offset=1)
+
+    assert len(first) == 1 and len(second) == 1
+    assert first[0]['id'] != second[0]['id']
+
+def test_search_index_short_term_falls_back(catalog):
+    """Terms too short for trigrams still match as substrings"""
+    results = search_books_in_catalog("19", "title")
+
+    assert results[0]['title'] == "1984"
+
+def test_search_index_quotes_are_literal(catalog):
+    """FTS syntax in the search term is matched literally, not parsed"""
+    assert search_books_in_catalog('Great" OR "1984', "title") == []
+
+def test_search_index_stays_in_sync(catalog):
+    """Books added after the index was built are searchable immediately"""
+    insert_book("Great Apes", "Will Self", "9780802135315", 1, 1)
+
+    assert any(book['title'] == "Great Apes" for book in search_books("apes", "title"))
+
+def test_search_index_uses_fts(catalog):
+    """Long terms are answered from the books_fts index"""
+    conn = get_db_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)  # search_books shares this thread's connection
+    try:
+        search_books("great", "title")
+    finally:
+        conn.set_trace_callback(None)
+    # Statements run inside FTS5 itself are traced as '-- ...' comments
+    (statement,) = [sql for sql in statements if 'books_fts' in sql and not sql.startswith('--')]
+    plan = conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+    conn.close()
+
+    assert any("VIRTUAL TABLE" in row[3] for row in plan)
+    assert "SCAN b" not in [row[3] for row in plan]  # books are looked up by rowid
+
+def test_api_search_paging(catalog):
+    """/api/search passes limit and offset through"""
+    client = create_app({'DATABASE': catalog}).test_client()
+    response = client.get('/api/search?q=dickens&type=author&limit=1&offset=1')
+
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 1
+    assert response.get_json()['offset'] == 1
+
+def test_api_search_returns_every_match_unless_paged(catalog):
+    """Without limit or offset every match is returned, as before paging was added"""
+    for n in range(110):
+        insert_book(f"Dickens Reader {n}", "Charles Dickens", f"{9781000000000 + n}", 1, 1)
+    client = create_app({'DATABASE': catalog}).test_client()
+
+    body = client.get('/api/search?q=dickens&type=author').get_json()
+    assert body['count'] == 112
+    assert body['limit'] is None
+    assert client.get('/api/search?q=dickens&type=author&offset=0').get_json()['count'] == 100
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import database
+from migrations import MIGRATIONS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous ceiling for the first-party modules' own import time, in microseconds
+IMPORT_BUDGET_US = 100_000
+
+def imported_modules(statement):
+    """Run a statement in a fresh interpreter under -X importtime; returns {module: self time in us}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'self [us]' not in line:
+            self_us, _, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = int(self_us)
+    return modules
+
+def test_import_app_is_lean():
+    modules = imported_modules('import app')
+    for deferred in ('asyncio', 'services.async_payment', 'services.payment_service', 'routes.api_routes',
+                     'services.catalog_import', 'services.export', 'services.patron_stats'):
+        assert deferred not in modules
+    first_party = [name for name in modules
+                   if name.split('.')[0] in ('app', 'database', 'metrics', 'cache', 'migrations', 'routes', 'services')]
+    assert sum(modules[name] for name in first_party) < IMPORT_BUDGET_US
+
+def test_database_layer_does_not_load_flask():
+    assert 'flask' not in imported_modules('import services.library_service')
+
+def test_up_to_date_schema_is_checked_in_one_query(temp_db):
+    statements = []
+    conn = database.get_db_connection()
+    conn.set_trace_callback(statements.append)
+    database.init_database()
+    conn.set_trace_callback(None)
+    conn.close()
+    assert statements == ['PRAGMA user_version']
+
+def test_user_version_is_caught_up_on_older_databases(temp_db):
+    conn = database.get_db_connection()
+    conn.execute('PRAGMA user_version = 0')
+    database.init_database()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == MIGRATIONS[-1].version
+    conn.close()
+
+def test_sample_data_is_opt_in(tmp_path):
+    from app import create_app
+    try:
+        create_app({'DATABASE': str(tmp_path / "plain.db")})
+        assert database.get_book_count() == 0
+        create_app({'DATABASE': str(tmp_path / "demo.db"), 'SAMPLE_DATA': True})
+        assert database.get_book_count() == 3
+    finally:
+        database.configure_pool()
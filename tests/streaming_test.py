@@ -0,0 +1,49 @@
+import json
+import pytest
+import database
+from app import create_app
+from database import insert_books, iter_search_books
+
+@pytest.fixture
+def client(temp_db):
+    insert_books([(f"Book {n:04d}", "Same Author" if n % 2 else "Other Writer", f"{9780000000000 + n}", 1, 1)
+                  for n in range(1, 1201)])
+    return create_app({'DATABASE': temp_db}).test_client()
+
+def test_search_json_is_streamed_with_same_shape(client):
+    response = client.get('/api/search?q=same&type=author&limit=1000')
+    assert response.is_streamed
+    body = response.get_json()
+    assert body['count'] == 600
+    assert len(body['results']) == 600
+    assert (body['search_term'], body['search_type'], body['limit'], body['offset']) == ('same', 'author', 1000, 0)
+
+def test_search_json_with_no_results(client):
+    body = client.get('/api/search?q=nobody&type=author').get_json()
+    assert body['results'] == []
+    assert body['count'] == 0
+
+def test_search_ndjson_returns_every_match(client):
+    response = client.get('/api/search?q=book&type=title&format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1200
+    assert json.loads(lines[0])['title'].startswith('Book')
+
+    response = client.get('/api/search?q=same&type=author&limit=5', headers={'Accept': 'application/x-ndjson'})
+    assert len(response.get_data(as_text=True).splitlines()) == 5
+
+def test_catalog_ndjson(client):
+    lines = client.get('/api/books?format=ndjson').get_data(as_text=True).splitlines()
+    titles = [json.loads(line)['title'] for line in lines]
+    assert titles == sorted(titles)
+    assert len(titles) == 1200
+
+def test_abandoned_stream_returns_connection(client):
+    """Closing a half-read result hands the pooled connection back"""
+    pool = database.get_pool()
+    books = iter_search_books("book", "title", batch_size=10)
+    next(books)
+    assert pool.thread_connection() is not None
+    books.close()
+    assert pool.thread_connection() is None
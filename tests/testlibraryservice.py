@@ -26,7 +26,7 @@ def test_add_book_long_title():
 
 def test_add_book_invalid_isbn():
     result = add_book_to_catalog("Title", "Author", "123", 5)
-    assert result == (False, "ISBN must be exactly 13 digits.")
+    assert result == (False, "ISBN must be 13 digits, or a valid ISBN-10 or ISBN-13 with or without hyphens.")
 
 def test_add_book_negative_copies():
     result = add_book_to_catalog("Title", "Author", "1234567890123", -1)
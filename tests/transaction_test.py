@@ -0,0 +1,69 @@
+import threading
+import pytest
+import database
+from database import transaction, insert_book, get_book_by_id, get_patron_borrow_count, update_book_availability
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+def test_transaction_commits_once_on_exit(temp_db):
+    """Writes inside a unit of work become visible only when the block exits"""
+    with transaction():
+        insert_book("Tx Book", "Tx Author", "1000000000001", 1, 1)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(database.get_all_books()))
+        thread.start()
+        thread.join()
+        assert other[0] == []
+
+    assert get_book_by_id(1)['title'] == "Tx Book"
+
+def test_transaction_rolls_back_on_exception(temp_db):
+    """An exception inside the block undoes every write in it"""
+    with pytest.raises(RuntimeError):
+        with transaction():
+            insert_book("Tx Book", "Tx Author", "1000000000001", 1, 1)
+            raise RuntimeError("boom")
+
+    assert database.get_all_books() == []
+
+def test_update_book_availability_never_goes_negative(temp_db):
+    """The conditional decrement refuses to take a copy that is not there"""
+    insert_book("Tx Book", "Tx Author", "1000000000001", 1, 1)
+
+    assert update_book_availability(1, -1) == True
+    assert update_book_availability(1, -1) == False
+    assert get_book_by_id(1)['available_copies'] == 0
+
+def test_borrow_failure_rolls_back_borrow_record(temp_db, mocker):
+    """A failed availability update leaves no orphan borrow record"""
+    insert_book("Tx Book", "Tx Author", "1000000000001", 1, 1)
+    mocker.patch('services.library_service.update_book_availability', return_value=False)
+    success, message = borrow_book_by_patron("123456", 1)
+
+    assert success == False
+    assert get_patron_borrow_count("123456") == 0
+
+def test_concurrent_borrowers_cannot_oversell(temp_db):
+    """Many desks racing for the last copy produce exactly one loan"""
+    insert_book("Last Copy", "Tx Author", "1000000000001", 1, 1)
+    results = []
+    def desk(patron_id):
+        results.append(borrow_book_by_patron(patron_id, 1)[0])
+    threads = [threading.Thread(target=desk, args=(f"{100000 + i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert get_book_by_id(1)['available_copies'] == 0
+
+def test_borrow_then_return_round_trip(temp_db):
+    """Borrow and return each commit their record and availability change together"""
+    insert_book("Tx Book", "Tx Author", "1000000000001", 2, 2)
+    borrow_book_by_patron("123456", 1)
+    assert get_book_by_id(1)['available_copies'] == 1
+
+    success, message = return_book_by_patron("123456", 1)
+    assert success == True
+    assert get_book_by_id(1)['available_copies'] == 2
+    assert get_patron_borrow_count("123456") == 0
@@ -0,0 +1,43 @@
+import importlib
+import sys
+import database
+from app import create_app
+
+def test_production_config_from_env(tmp_path, monkeypatch):
+    path = str(tmp_path / "prod.db")
+    monkeypatch.setenv("LIBRARY_DATABASE", path)
+    monkeypatch.setenv("LIBRARY_DB_POOL_SIZE", "3")
+    monkeypatch.setenv("LIBRARY_METRICS", "no")
+    monkeypatch.delitem(sys.modules, "wsgi", raising=False)
+    try:
+        wsgi = importlib.import_module("wsgi")
+        assert wsgi.app.config['DATABASE'] == path
+        assert wsgi.app.config['DB_POOL_SIZE'] == 3
+        assert wsgi.app.config['METRICS_ENABLED'] is False
+        # Migrated but not seeded
+        assert database.get_book_count() == 0
+    finally:
+        sys.modules.pop("wsgi", None)
+        database.configure_pool()
+
+def test_startup_can_skip_migrations(tmp_path):
+    path = str(tmp_path / "bare.db")
+    app = create_app({'DATABASE': path, 'INIT_DATABASE': False, 'SAMPLE_DATA': False})
+    try:
+        conn = database.get_db_connection()
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'books'").fetchone() is None
+        conn.close()
+
+        result = app.test_cli_runner().invoke(args=['init-db', '--sample-data'])
+        assert result.exit_code == 0
+        assert database.get_book_count() == 3
+    finally:
+        database.configure_pool()
+
+def test_close_idle_keeps_pool_usable(temp_db):
+    pool = database.get_pool()
+    database.get_book_count()
+    assert pool.idle_count == 1
+    pool.close_idle()
+    assert (pool.size, pool.idle_count) == (0, 0)
+    assert database.get_book_count() == 0
@@ -0,0 +1,46 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Settings are read from LIBRARY_* environment variables (see ENV_SETTINGS).
+Sample data is off unless LIBRARY_SAMPLE_DATA=1. gunicorn.conf.py preloads
+this module, so migrations run once in the master process before workers
+fork; servers that import it in every worker should set
+LIBRARY_INIT_DATABASE=0 and run `flask --app wsgi init-db` on deploy.
+"""
+
+import os
+from typing import Dict, Mapping
+
+from app import create_app
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Environment variable -> (app config key, parser)
+ENV_SETTINGS = {
+    'LIBRARY_DATABASE': ('DATABASE', str),
+    'LIBRARY_DB_POOL_SIZE': ('DB_POOL_SIZE', int),
+    'LIBRARY_DB_BUSY_TIMEOUT': ('DB_BUSY_TIMEOUT', float),
+    'LIBRARY_BOOK_CACHE_TTL': ('BOOK_CACHE_TTL', float),
+    'LIBRARY_CATALOG_SNAPSHOT': ('CATALOG_SNAPSHOT', _flag),
+    'LIBRARY_SEARCH_CACHE_SIZE': ('SEARCH_CACHE_SIZE', int),
+    'LIBRARY_SEARCH_CACHE_BYTES': ('SEARCH_CACHE_BYTES', int),
+    'LIBRARY_INIT_DATABASE': ('INIT_DATABASE', _flag),
+    'LIBRARY_SAMPLE_DATA': ('SAMPLE_DATA', _flag),
+    'LIBRARY_METRICS': ('METRICS_ENABLED', _flag),
+    'LIBRARY_SLOW_QUERY_MS': ('SLOW_QUERY_MS', float),
+}
+
+def config_from_env(environ: Mapping[str, str] = os.environ) -> Dict:
+    """App config overrides for a production process."""
+    config = {}
+    for name, (key, parse) in ENV_SETTINGS.items():
+        if name in environ:
+            config[key] = parse(environ[name])
+    return config
+
+
+app = create_app(config_from_env())